@@ -0,0 +1,373 @@
+import argparse
+import base64
+import glob
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any
+
+from src.processing.chunking import Chunk, MarkdownChunker
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_CRAWL_DIR = os.path.join(BENCHMARK_DIR, "data")
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Metrics compared against the baseline, and whether a higher value is better
+COMPARED_METRICS = {
+    "pages_per_second": True,
+    "tokens_per_second": True,
+    "peak_rss_mb": False,
+    "token_count_calls_per_page": False,
+    "encodes_per_page": False,
+    "size_checks_settled": True,
+}
+# Chunk memory metrics compared against the baseline
+COMPARED_MEMORY_METRICS = {"chunk_objects_mb": False}
+
+WORDS = (
+    "the client sends a request to the api and the server returns a response with tokens embeddings documents "
+    "chunks vectors index query model retrieval context window latency throughput cache config"
+).split()
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _page(n: int, markdown: str) -> dict[str, Any]:
+    return {"markdown": markdown, "metadata": {"sourceURL": f"https://bench.example.com/{n}", "title": f"Page {n}"}}
+
+
+def long_code_fences(rng: random.Random, pages: int) -> list[dict[str, Any]]:
+    """
+    Generate pages made of prose and code fences of up to several thousand lines.
+
+    Args:
+        rng (random.Random): Seeded random generator.
+        pages (int): Number of pages to generate.
+
+    Returns:
+        list[dict[str, Any]]: The pages in the raw crawl format.
+    """
+    result = []
+    for n in range(pages):
+        parts = [f"# Module {n}", _paragraph(rng, 60)]
+        for block in range(4):
+            lines = [
+                f"def handler_{block}_{i}(request):\n    return request.args[{i}]" for i in range(rng.randint(50, 1500))
+            ]
+            parts += [f"## Listing {block}", _paragraph(rng, 40), "```python", *lines, "```"]
+        result.append(_page(n, "\n\n".join(parts)))
+    return result
+
+
+def deep_headers(rng: random.Random, pages: int) -> list[dict[str, Any]]:
+    """
+    Generate pages with deep header trees and many short sections.
+
+    Args:
+        rng (random.Random): Seeded random generator.
+        pages (int): Number of pages to generate.
+
+    Returns:
+        list[dict[str, Any]]: The pages in the raw crawl format.
+    """
+    result = []
+    for n in range(pages):
+        parts = [f"# Reference {n}"]
+        for h2 in range(8):
+            parts += [f"## Chapter {h2} [link](https://bench.example.com/{h2})", _paragraph(rng, 20)]
+            for h3 in range(6):
+                parts += [f"### Section {h2}.{h3} `code`", _paragraph(rng, rng.randint(5, 60))]
+                for h4 in range(3):
+                    parts += [f"#### Detail {h2}.{h3}.{h4}", f"- {_paragraph(rng, 8)}", f"- {_paragraph(rng, 8)}"]
+        result.append(_page(n, "\n\n".join(parts)))
+    return result
+
+
+def huge_lines(rng: random.Random, pages: int) -> list[dict[str, Any]]:
+    """
+    Generate pages whose content is dominated by single lines of tens of thousands of words.
+
+    Args:
+        rng (random.Random): Seeded random generator.
+        pages (int): Number of pages to generate.
+
+    Returns:
+        list[dict[str, Any]]: The pages in the raw crawl format.
+    """
+    return [
+        _page(n, f"# Dump {n}\n\n{_paragraph(rng, 30)}\n\n{_paragraph(rng, rng.randint(5_000, 30_000))}\n\nEnd.")
+        for n in range(pages)
+    ]
+
+
+def base64_images(rng: random.Random, pages: int) -> list[dict[str, Any]]:
+    """
+    Generate pages with large inline base64 images, HTML image tags and image references.
+
+    Args:
+        rng (random.Random): Seeded random generator.
+        pages (int): Number of pages to generate.
+
+    Returns:
+        list[dict[str, Any]]: The pages in the raw crawl format.
+    """
+    result = []
+    for n in range(pages):
+        parts = [f"# Gallery {n}"]
+        for image in range(6):
+            payload = base64.b64encode(rng.randbytes(rng.randint(2_000, 60_000))).decode("ascii")
+            parts += [
+                _paragraph(rng, 50),
+                f"![diagram {image}](data:image/png;base64,{payload})",
+                f'<img src="https://bench.example.com/{image}.png" alt="figure {image}">',
+                f"[figure-{image}]: https://bench.example.com/{image}.svg",
+            ]
+        result.append(_page(n, "\n\n".join(parts)))
+    return result
+
+
+CORPORA = {
+    "long_code_fences": long_code_fences,
+    "deep_headers": deep_headers,
+    "huge_lines": huge_lines,
+    "base64_images": base64_images,
+}
+
+
+def load_sample_crawl(filepath: str) -> list[dict[str, Any]]:
+    """
+    Load the pages of a checked-in raw crawl file.
+
+    Args:
+        filepath (str): Path of a crawl file in the Firecrawl format (`{"data": [...]}`).
+
+    Returns:
+        list[dict[str, Any]]: The pages of the crawl.
+    """
+    with open(filepath, encoding="utf-8") as f:
+        return json.load(f)["data"]
+
+
+def run_corpus(name: str, pages: int, seed: int = 0) -> dict[str, Any]:
+    """
+    Chunk one corpus and measure throughput, peak RSS and tokenizer usage.
+
+    Run it in a fresh process (as `run_suite` does) for the peak RSS to reflect this corpus only.
+
+    Args:
+        name (str): A synthetic corpus name from CORPORA, or the path of a sample crawl file.
+        pages (int): Number of pages to generate for synthetic corpora.
+        seed (int): Seed of the synthetic corpus generator. Defaults to 0.
+
+    Returns:
+        dict[str, Any]: The metrics of the run.
+    """
+    corpus = CORPORA[name](random.Random(seed), pages) if name in CORPORA else load_sample_crawl(name)
+    chunker = MarkdownChunker(input_filename=f"benchmark-{os.path.basename(name)}")
+    token_count_calls = itertools.count()
+    encode_calls = itertools.count()  # Also counts the texts of batches encoded in threads
+
+    calculate_tokens = chunker._calculate_tokens
+    encode_ordinary = chunker.tokenizer.encode_ordinary
+
+    def counting_calculate_tokens(text: str) -> int:
+        next(token_count_calls)
+        return calculate_tokens(text)
+
+    def counting_encode_ordinary(text: str) -> list[int]:
+        next(encode_calls)
+        return encode_ordinary(text)
+
+    chunker._calculate_tokens = counting_calculate_tokens
+    chunker.tokenizer.encode_ordinary = counting_encode_ordinary
+
+    start_time = time.perf_counter()
+    chunks = tokens = 0
+    try:
+        for chunk in chunker.iter_chunks(corpus):
+            chunks += 1
+            tokens += chunk.token_count
+    finally:
+        # The encoding is shared by every component of the process
+        del chunker.tokenizer.encode_ordinary
+    seconds = time.perf_counter() - start_time
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1 << 20) if sys.platform == "darwin" else peak_rss / (1 << 10)
+    page_count = len(corpus)
+    return {
+        "pages": page_count,
+        "input_mb": round(sum(len(page["markdown"]) for page in corpus) / 1e6, 2),
+        "chunks": chunks,
+        "tokens": tokens,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(page_count / seconds, 2),
+        "tokens_per_second": round(tokens / seconds),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "token_count_calls_per_page": round(next(token_count_calls) / page_count, 1),
+        "encodes_per_page": round(next(encode_calls) / page_count, 1),
+        "size_checks_settled": round(chunker.size_precheck.settled_rate, 3),
+    }
+
+
+def measure_chunk_memory(chunk_count: int = 100_000, crawl_files: list[str] | None = None) -> dict[str, Any]:
+    """
+    Measure with tracemalloc the memory held by chunks as `Chunk` objects and as the nested dicts they replaced.
+
+    The chunks of the sample crawl files are repeated up to `chunk_count`. Both representations share the texts, URLs
+    and IDs, so the difference is the per-chunk overhead: slots and an interned header tuple against three dicts per
+    chunk (the `to_dict` shape the chunker used internally before).
+
+    Args:
+        chunk_count (int): Number of chunks to hold. Defaults to 100_000.
+        crawl_files (list[str] | None): Crawl files to take chunks from. Defaults to benchmarks/data/*.json.
+
+    Returns:
+        dict[str, Any]: The number of chunks and the megabytes held by each representation.
+    """
+    if crawl_files is None:
+        crawl_files = sorted(glob.glob(os.path.join(SAMPLE_CRAWL_DIR, "*.json")))
+    pages = [page for filepath in crawl_files for page in load_sample_crawl(filepath)]
+    chunks = list(MarkdownChunker(input_filename="benchmark-memory.json").iter_chunks(pages))
+    sources = [chunks[i % len(chunks)] for i in range(chunk_count)]
+
+    def traced_mb(build: Callable[[], list]) -> float:
+        tracemalloc.start()
+        try:
+            held = build()
+            size, _ = tracemalloc.get_traced_memory()
+            del held
+        finally:
+            tracemalloc.stop()
+        return round(size / 1e6, 1)
+
+    return {
+        "chunks": chunk_count,
+        "chunk_objects_mb": traced_mb(
+            lambda: [Chunk(c.headers, c.text, c.token_count, c.source_url, c.page_title, c.chunk_id) for c in sources]
+        ),
+        "chunk_dicts_mb": traced_mb(lambda: [c.to_dict() for c in sources]),
+    }
+
+
+def run_suite(pages: int, crawl_files: list[str], corpora: list[str] | None = None) -> dict[str, dict[str, Any]]:
+    """
+    Run every corpus in its own spawned process and collect the results.
+
+    Args:
+        pages (int): Number of pages per synthetic corpus.
+        crawl_files (list[str]): Paths of sample crawl files to benchmark as well.
+        corpora (list[str] | None): Synthetic corpora to run. Defaults to all of them.
+
+    Returns:
+        dict[str, dict[str, Any]]: Metrics keyed by corpus name (or crawl file name).
+    """
+    results = {}
+    names = [*(corpora if corpora is not None else CORPORA), *crawl_files]
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            results[os.path.basename(name)] = executor.submit(run_corpus, name, pages).result()
+    return results
+
+
+def compare_to_baseline(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    tolerance: float,
+    compared_metrics: dict[str, bool] = COMPARED_METRICS,
+) -> list[str]:
+    """
+    Print each compared metric next to its baseline value and return the regressions.
+
+    Metrics missing from a baseline recorded before they were added are reported and skipped.
+
+    Args:
+        results (dict[str, dict[str, Any]]): Metrics of the current run.
+        baseline (dict[str, dict[str, Any]]): Metrics of the baseline run.
+        tolerance (float): Relative change tolerated before a metric counts as a regression.
+        compared_metrics (dict[str, bool]): The metrics to compare and whether a higher value is better. Defaults to
+            COMPARED_METRICS.
+
+    Returns:
+        list[str]: Descriptions of the metrics that regressed beyond the tolerance.
+    """
+    regressions = []
+    for corpus, metrics in results.items():
+        if corpus not in baseline:
+            print(f"{corpus}: no baseline")
+            continue
+        for metric, higher_is_better in compared_metrics.items():
+            if metric not in baseline[corpus]:
+                print(f"{corpus:<28} {metric:<28} {'no baseline':>12}")
+                continue
+            current, previous = metrics[metric], baseline[corpus][metric]
+            change = (current - previous) / previous if previous else 0.0
+            regressed = -change > tolerance if higher_is_better else change > tolerance
+            marker = "  REGRESSION" if regressed else ""
+            print(f"{corpus:<28} {metric:<28} {previous:>12} -> {current:>12} ({change:+.1%}){marker}")
+            if regressed:
+                regressions.append(f"{corpus} {metric}: {previous} -> {current} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    """
+    Run the chunking benchmark suite and compare it to, or save it as, the baseline.
+
+    Usage:
+        python -m benchmarks.chunking_benchmark [--pages N] [--save-baseline] [--fail-on-regression]
+    """
+    parser = argparse.ArgumentParser(description="Benchmark MarkdownChunker on synthetic and sample crawl corpora.")
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic corpus")
+    parser.add_argument("--corpus", action="append", choices=sorted(CORPORA), help="synthetic corpus to run")
+    parser.add_argument("--crawl-files", nargs="*", help="raw crawl files to run (default: benchmarks/data/*.json)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare to or save")
+    parser.add_argument("--save-baseline", action="store_true", help="save this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change tolerated before a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 on regressions")
+    args = parser.parse_args()
+
+    crawl_files = args.crawl_files
+    if crawl_files is None:
+        crawl_files = sorted(glob.glob(os.path.join(SAMPLE_CRAWL_DIR, "*.json")))
+    results = run_suite(args.pages, crawl_files, args.corpus)
+    print(json.dumps(results, indent=2))
+    chunk_memory = measure_chunk_memory(crawl_files=crawl_files or None)
+    print(json.dumps({"chunk_memory": chunk_memory}, indent=2))
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"pages": args.pages, "results": results, "chunk_memory": chunk_memory}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["pages"] != args.pages:
+        print(f"Baseline was recorded with --pages {baseline['pages']}; throughput numbers are not comparable")
+    regressions = compare_to_baseline(results, baseline["results"], args.tolerance)
+    memory_baseline = {"chunk_memory": baseline["chunk_memory"]} if "chunk_memory" in baseline else {}
+    regressions += compare_to_baseline(
+        {"chunk_memory": chunk_memory}, memory_baseline, args.tolerance, COMPARED_MEMORY_METRICS
+    )
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import time
+from collections.abc import Callable
+from typing import Any
+
+from benchmarks.chunking_benchmark import SAMPLE_CRAWL_DIR, _page, base64_images, huge_lines, load_sample_crawl
+from src.processing.chunking import MarkdownChunker
+
+# Boilerplate patterns of the chunker before `clean_page`, kept verbatim as the reference
+ORIGINAL_BOILERPLATE_PATTERNS = [
+    r"\[Anthropic home page.*\]\(/.*\)",
+    r"^English$",
+    r"^Search\.\.\.$",
+    r"^Ctrl K$",
+    r"^Search$",
+    r"^Navigation$",
+    r"^\[.*\]\(/.*\)$",
+    r"^On this page$",
+    r"^\* \* \*$",
+]
+
+
+def original_clean_page(content: str) -> str:
+    """
+    Clean page content with the regex passes the chunker used before `clean_page`, compiled on every call.
+
+    Args:
+        content (str): The raw markdown content of a page.
+
+    Returns:
+        str: The cleaned content.
+    """
+    content = re.sub("|".join(ORIGINAL_BOILERPLATE_PATTERNS), "", content, flags=re.MULTILINE)
+    content = re.sub(r"\n{2,}", "\n\n", content).strip()
+    content = re.sub(r"<img[^>]+>", "", content)
+    content = re.sub(r"!\[.*?\]\(.*?\)", "", content)
+    content = re.sub(r"^\[.*?\]:\s*http.*$", "", content, flags=re.MULTILINE)
+    content = re.sub(r"!\[.*?\]\(data:image/[^;]+;base64,[^\)]+\)", "", content)
+    return re.sub(r"\[.*?\]:\s*\S*\.(png|jpg|jpeg|gif|svg|webp)", "", content, flags=re.MULTILINE | re.IGNORECASE)
+
+
+def unmatched_image_syntax(rng: random.Random, pages: int) -> list[dict[str, Any]]:
+    """
+    Generate pages with long lines full of `![` and `]:` that never complete an image, the worst case of lazy regexes.
+
+    Args:
+        rng (random.Random): Seeded random generator.
+        pages (int): Number of pages to generate.
+
+    Returns:
+        list[dict[str, Any]]: The pages in the raw crawl format.
+    """
+    return [
+        _page(n, f"# Broken {n}\n\n" + " ".join(rng.choice(["![alt", "[ref]:", "see", "text"]) for _ in range(4_000)))
+        for n in range(pages)
+    ]
+
+
+def time_cleaning(clean: Callable[[str], str], contents: list[str], repeat: int) -> tuple[float, list[str]]:
+    """
+    Time a cleaning function over page contents.
+
+    Args:
+        clean (Callable[[str], str]): The cleaning function.
+        contents (list[str]): The markdown contents of the pages.
+        repeat (int): Number of runs; the fastest one is reported.
+
+    Returns:
+        tuple[float, list[str]]: The seconds of the fastest run and the cleaned contents.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        cleaned = [clean(content) for content in contents]
+        best = min(best, time.perf_counter() - start_time)
+    return best, cleaned
+
+
+def run_corpus(pages: list[dict[str, Any]], repeat: int) -> dict[str, Any]:
+    """
+    Compare `MarkdownChunker.clean_page` with the original regex passes on one corpus.
+
+    Args:
+        pages (list[dict[str, Any]]): The pages in the raw crawl format.
+        repeat (int): Number of runs per implementation.
+
+    Returns:
+        dict[str, Any]: Throughput of both implementations, the speedup and whether their outputs are identical.
+    """
+    chunker = MarkdownChunker(input_filename="cleaning-benchmark.json")
+    contents = [page["markdown"] for page in pages]
+    input_mb = sum(len(content) for content in contents) / 1e6
+    original_seconds, original = time_cleaning(original_clean_page, contents, repeat)
+    seconds, cleaned = time_cleaning(chunker.clean_page, contents, repeat)
+    return {
+        "pages": len(pages),
+        "input_mb": round(input_mb, 2),
+        "original_seconds": round(original_seconds, 4),
+        "seconds": round(seconds, 4),
+        "pages_per_second": round(len(pages) / seconds, 1),
+        "mb_per_second": round(input_mb / seconds, 1),
+        "speedup": round(original_seconds / seconds, 2),
+        "identical": cleaned == original,
+    }
+
+
+def main():
+    """
+    Benchmark page cleaning on raw crawl pages and on synthetic pages that stress the image patterns.
+
+    Usage:
+        python -m benchmarks.cleaning_benchmark [--pages N] [--repeat N] [--crawl-files FILE ...]
+    """
+    parser = argparse.ArgumentParser(description="Benchmark MarkdownChunker.clean_page against the original passes.")
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per implementation; the fastest is reported")
+    parser.add_argument("--crawl-files", nargs="*", help="raw crawl files to run (default: benchmarks/data/*.json)")
+    args = parser.parse_args()
+
+    crawl_files = args.crawl_files
+    if crawl_files is None:
+        crawl_files = sorted(glob.glob(os.path.join(SAMPLE_CRAWL_DIR, "*.json")))
+    corpora = {os.path.basename(path): load_sample_crawl(path) for path in crawl_files}
+    for generate in (base64_images, huge_lines, unmatched_image_syntax):
+        corpora[generate.__name__] = generate(random.Random(0), args.pages)
+
+    results = {name: run_corpus(pages, args.repeat) for name, pages in corpora.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -42,9 +42,13 @@ class ComponentInitializer:
         Load all documents from the directory specified by `self.chunked_docs_dir`.
 
         Returns:
-            list[str]: A list of filenames found in the directory.
+            list[str]: A list of chunk filenames found in the directory.
         """
-        return [f for f in listdir(self.chunked_docs_dir) if isfile(join(self.chunked_docs_dir, f))]
+        return [
+            f
+            for f in listdir(self.chunked_docs_dir)
+            if isfile(join(self.chunked_docs_dir, f)) and f.endswith(("-chunked.json", "-chunked.jsonl"))
+        ]
 
     def load_selected_docs(self) -> list[str]:
         """
@@ -5,7 +5,6 @@ from collections.abc import Generator
 from typing import Any
 
 import anthropic
-import tiktoken
 import weave
 from anthropic.types import Message
 from anthropic.types.beta.prompt_caching import PromptCachingBetaMessage
@@ -16,6 +15,7 @@ from src.generation.tool_definitions import tool_manager
 from src.utils.config import ANTHROPIC_API_KEY, MAIN_MODEL, WEAVE_PROJECT_NAME
 from src.utils.decorators import anthropic_error_handler, base_error_handler
 from src.utils.logger import get_logger
+from src.utils.tokenizer import tokenizers
 from src.vector_storage.vector_db import VectorDB
 
 weave.init(WEAVE_PROJECT_NAME)
@@ -78,7 +78,7 @@ class ConversationHistory:
         self.max_tokens = max_tokens  # specifically for Sonnet 3.5
         self.messages: list[ConversationMessage] = []
         self.total_tokens = 0
-        self.tokenizer = tiktoken.get_encoding(tokenizer)
+        self.tokenizer_name = tokenizer
 
     def add_message(self, role: str, content: str | list[dict[str, Any]]) -> None:
         """
@@ -127,13 +127,10 @@ class ConversationHistory:
 
     def _estimate_tokens(self, content: str | list[dict[str, Any]]) -> int:
         if isinstance(content, str):
-            return len(self.tokenizer.encode(content))
+            return tokenizers.count(content, self.tokenizer_name)
         elif isinstance(content, list):
-            return sum(
-                len(self.tokenizer.encode(item["text"]))
-                for item in content
-                if isinstance(item, dict) and "text" in item
-            )
+            texts = [item["text"] for item in content if isinstance(item, dict) and "text" in item]
+            return sum(tokenizers.count_batch(texts, self.tokenizer_name))
         return 0
 
     def _prune_history(self, new_tokens: int) -> None:
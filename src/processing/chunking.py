@@ -1,18 +1,840 @@
+import argparse
+import fcntl
+import glob
+import hashlib
 import json
+import mmap
 import os
 import re
 import statistics
+import sys
+import time
 import uuid
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from itertools import accumulate
 from typing import Any
 
-import tiktoken
-
 from src.utils.config import PROCESSED_DATA_DIR, RAW_DATA_DIR
 from src.utils.decorators import base_error_handler
+from src.utils.digest_index import DIGEST_INDEX_FILENAME, ChunkDigestIndex
 from src.utils.logger import configure_logging, get_logger
+from src.utils.tokenizer import get_tokenizer, tokenizers
 
 logger = get_logger()
 
+MANIFEST_FILENAME = "chunk_manifest.json"
+PAGE_INDEX_DIRNAME = ".page_index"
+
+
+class TokenAccumulator:
+    """
+    Track the token count of a growing chunk without re-encoding the whole chunk on every line.
+
+    Every fragment appended by the chunker ends with a newline. The cl100k pre-tokenizer never joins a newline with a
+    following non-whitespace character, so when a fragment starts with a non-whitespace character the count of the
+    concatenation is exactly the sum of the counts of its parts. A fragment starting with whitespace (a blank or
+    indented line) can merge with the trailing newlines of the content into different tokens, in either direction, so
+    the content since the last fragment that started with non-whitespace (the tail) is re-counted together with it.
+    The running count is therefore always exact, while only the tail is ever encoded again.
+
+    Args:
+        count_tokens (Callable[[str], int]): Function returning the exact token count of a string.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int]):
+        self.count_tokens = count_tokens
+        self.content = ""
+        self.tokens = 0
+        self.last_fragment_tokens = 0
+        self._tail_start = 0
+        self._tail_tokens = 0
+
+    def reset(self, content: str = "", tokens: int | None = None) -> None:
+        """
+        Start a new chunk.
+
+        Args:
+            content (str): Initial content of the chunk. Defaults to an empty string.
+            tokens (int | None): Token count of `content` if already known. Defaults to None.
+        """
+        self.content = content
+        self.tokens = tokens if tokens is not None else (self.count_tokens(content) if content else 0)
+        self._tail_start = 0
+        self._tail_tokens = self.tokens
+
+    def try_add(self, fragment: str, limit: int, fragment_tokens: int | None = None) -> bool:
+        """
+        Append a fragment if the resulting content stays within the token limit.
+
+        Args:
+            fragment (str): The text to append, ending with a newline.
+            limit (int): Maximum number of tokens allowed in the resulting content.
+            fragment_tokens (int | None): Token count of `fragment` if already known. Defaults to None.
+
+        Returns:
+            bool: True if the fragment was appended, False if it would exceed the limit.
+        """
+        if fragment_tokens is None:
+            fragment_tokens = self.count_tokens(fragment)
+        self.last_fragment_tokens = fragment_tokens
+
+        if not self.content or (self.content[-1] in "\r\n" and not fragment[:1].isspace()):
+            # The counts add up exactly, and the fragment starts a new tail
+            total_tokens = self.tokens + fragment_tokens
+            if total_tokens > limit:
+                return False
+            self._tail_start = len(self.content)
+            self._tail_tokens = fragment_tokens
+        else:
+            # The fragment may merge with the end of the content: count the tail and the fragment together
+            tail_tokens = self.count_tokens(self.content[self._tail_start :] + fragment)
+            total_tokens = self.tokens - self._tail_tokens + tail_tokens
+            if total_tokens > limit:
+                return False
+            self._tail_tokens = tail_tokens
+        self.content += fragment
+        self.tokens = total_tokens
+        return True
+
+    def add(self, fragment: str) -> None:
+        """
+        Append a fragment regardless of the token limit.
+
+        Args:
+            fragment (str): The text to append.
+        """
+        self.try_add(fragment, limit=sys.maxsize)
+
+
+class TokenCountCache:
+    """
+    Bounded LRU cache of token counts shared by every stage of the chunking pipeline.
+
+    Entries are keyed by a 16-byte BLAKE2b digest of the text, so the cache never holds on to chunk contents.
+
+    Args:
+        max_size (int): Maximum number of cached counts. A value of 0 disables caching. Defaults to 100_000.
+    """
+
+    def __init__(self, max_size: int = 100_000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._counts: OrderedDict[bytes, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of cached token counts."""
+        return len(self._counts)
+
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def get_or_count(self, text: str, count_tokens: Callable[[str], int]) -> int:
+        """
+        Return the cached token count of a text, counting and caching it on a miss.
+
+        Args:
+            text (str): The text to count tokens for.
+            count_tokens (Callable[[str], int]): Function computing the exact token count on a cache miss.
+
+        Returns:
+            int: The number of tokens in the text.
+        """
+        key = self._digest(text)
+        token_count = self._counts.get(key)
+        if token_count is not None:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return token_count
+
+        self.misses += 1
+        token_count = count_tokens(text)
+        if self.max_size > 0:
+            self._counts[key] = token_count
+            if len(self._counts) > self.max_size:
+                self._counts.popitem(last=False)
+        return token_count
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the share of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ByteBoundPrecheck:
+    """
+    Pre-check token limit comparisons against byte length bounds that hold for every text, without encoding it.
+
+    Every token covers at least one UTF-8 byte and at most `max_token_bytes` bytes, the longest token of the encoding
+    (128 for cl100k). A text of `n` bytes therefore has between `ceil(n / max_token_bytes)` and `n` tokens, whatever
+    its content. A comparison is only settled when the limit falls outside these bounds, which is the case for short
+    texts and for texts far above the limit; otherwise the caller counts exactly. This is not a token estimate: the
+    bounds are loose, so most checks close to the limit still need an exact count.
+
+    Args:
+        max_token_bytes (int): Length in bytes of the longest token of the encoding. Defaults to 128 (cl100k).
+    """
+
+    def __init__(self, max_token_bytes: int = 128):
+        self.max_token_bytes = max_token_bytes
+        self.settled = 0
+        self.unsettled = 0
+
+    def bounds(self, text: str) -> tuple[int, int]:
+        """
+        Return the lowest and highest possible token count of a text.
+
+        Args:
+            text (str): The text to bound.
+
+        Returns:
+            tuple[int, int]: The lower and upper bound of the token count.
+        """
+        byte_length = len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+        return -(-byte_length // self.max_token_bytes), byte_length
+
+    def exceeds(self, text: str, limit: int) -> bool | None:
+        """
+        Decide whether a text has more than `limit` tokens, if its bounds settle the comparison.
+
+        Args:
+            text (str): The text to check.
+            limit (int): The token limit.
+
+        Returns:
+            bool | None: Whether the text exceeds the limit, or None if the exact count is needed.
+        """
+        lower, upper = self.bounds(text)
+        if upper <= limit:
+            self.settled += 1
+            return False
+        if lower > limit:
+            self.settled += 1
+            return True
+        self.unsettled += 1
+        return None
+
+    @property
+    def settled_rate(self) -> float:
+        """Return the share of comparisons settled without an exact count."""
+        comparisons = self.settled + self.unsettled
+        return self.settled / comparisons if comparisons else 0.0
+
+
+class StageTimings:
+    """
+    Seconds spent in each stage of the chunking pipeline.
+
+    Page stages (clean, sectioning, splitting, adjusting, overlap) are timed around each call. The overlap stage also
+    covers encoding the final chunks, whose token IDs the overlap is taken from. Validation and write consume chunks
+    as they are produced, so their time excludes the time spent waiting for the chunks. With page workers, the page
+    stages add up the time spent in every worker and can exceed the wall-clock time.
+    """
+
+    STAGES = ("clean", "sectioning", "splitting", "adjusting", "overlap", "validation", "write")
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+
+    def add(self, stage: str, seconds: float) -> None:
+        """
+        Add time spent in a stage.
+
+        Args:
+            stage (str): The stage name, one of STAGES.
+            seconds (float): The time spent.
+        """
+        self.seconds[stage] += seconds
+
+    def merge(self, seconds: dict[str, float]) -> None:
+        """
+        Add the timings of another run, such as the ones exported by a page worker.
+
+        Args:
+            seconds (dict[str, float]): Seconds per stage.
+        """
+        for stage, stage_seconds in seconds.items():
+            self.add(stage, stage_seconds)
+
+    def reset(self) -> None:
+        """Reset every stage to zero."""
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+
+    def to_dict(self) -> dict[str, float]:
+        """
+        Return the seconds per stage, rounded to the millisecond.
+
+        Returns:
+            dict[str, float]: Seconds per stage, in pipeline order.
+        """
+        return {stage: round(seconds, 3) for stage, seconds in self.seconds.items()}
+
+
+class _TimedIterator:
+    """Iterator wrapper that adds up the time spent waiting for each item."""
+
+    def __init__(self, iterable: Iterable):
+        self.iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self) -> "_TimedIterator":
+        """Return the iterator itself."""
+        return self
+
+    def __next__(self) -> Any:
+        """Return the next item of the wrapped iterable, timing how long it took to produce."""
+        start_time = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start_time
+
+
+class MarkdownBlock:
+    """
+    A typed run of whole lines produced by `MarkdownChunker.lex_blocks`.
+
+    `text` is `content[start:end]`: the lines of the block joined by newlines, without the newline ending the last
+    line. The token count is filled in lazily by the chunker the first time a stage needs it.
+
+    Args:
+        kind (str): One of "heading", "fence", "paragraph", "list" or "blank".
+        start (int): Offset of the first character of the block.
+        end (int): Offset just past the last character of the block.
+        text (str): The block content.
+        level (int): Heading level of a heading block. Defaults to 0.
+        title (str): Raw text of a heading block. Defaults to "".
+        fence (str): Fence marker ("```" or "~~~") of a fence block. Defaults to "".
+        closed (bool): Whether a fence block has a closing fence. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        start: int,
+        end: int,
+        text: str,
+        level: int = 0,
+        title: str = "",
+        fence: str = "",
+        closed: bool = True,
+    ):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.text = text
+        self.level = level
+        self.title = title
+        self.fence = fence
+        self.closed = closed
+        self.tokens: int | None = None  # Token count of `text` + "\n"
+
+    def lines(self) -> list[str]:
+        """
+        Return the lines of the block.
+
+        Returns:
+            list[str]: The lines of the block without newlines.
+        """
+        return self.text.split("\n")
+
+    def rebase(self, offset: int, length: int) -> "MarkdownBlock | None":
+        """
+        Clip the block to `content[offset:offset + length]` and make its offsets relative to that window.
+
+        Args:
+            offset (int): Start of the window.
+            length (int): Length of the window.
+
+        Returns:
+            MarkdownBlock | None: The clipped block, or None if no part of the block lies in the window.
+        """
+        start = max(self.start, offset)
+        end = min(self.end, offset + length)
+        if start > end or (start == end and not offset < start < offset + length):
+            return None
+        text = self.text[start - self.start : end - self.start]
+        block = MarkdownBlock(
+            self.kind, start - offset, end - offset, text, self.level, self.title, self.fence, self.closed
+        )
+        if text == self.text:
+            block.tokens = self.tokens
+        return block
+
+
+HEADER_LEVELS = ("h1", "h2", "h3")
+
+
+class Section:
+    """
+    A run of page content under the same h1-h3 headers, as identified by `MarkdownChunker.identify_sections`.
+
+    Args:
+        headers (tuple[str, str, str]): The h1, h2 and h3 headers of the section.
+        content (str): The section content.
+        blocks (list[MarkdownBlock] | None): The lexed blocks of `content`. Defaults to None.
+    """
+
+    __slots__ = ("headers", "content", "blocks")
+
+    def __init__(self, headers: tuple[str, str, str], content: str, blocks: list[MarkdownBlock] | None = None):
+        self.headers = headers
+        self.content = content
+        self.blocks = blocks
+
+
+class Chunk:
+    """
+    A chunk of page content, kept compact while it moves through the chunker.
+
+    Headers are an interned (h1, h2, h3) tuple shared by every chunk with the same header path, instead of a dict per
+    chunk. The nested JSON shape (`chunk_id`, `metadata`, `data.headers`, `data.text`) is only built by `to_dict` when
+    the chunk is serialized.
+
+    Args:
+        headers (tuple[str, str, str]): The h1, h2 and h3 headers of the chunk.
+        text (str): The chunk text.
+        token_count (int): Number of tokens in the text. Defaults to 0 until the chunk is finalized.
+        source_url (str): URL of the page the chunk comes from. Defaults to "".
+        page_title (str): Title of the page the chunk comes from. Defaults to "".
+        chunk_id (str | None): The chunk ID, assigned once the text is final. Defaults to None.
+        token_ids (array | None): Token IDs of the text, kept while chunking only. Defaults to None.
+    """
+
+    __slots__ = ("chunk_id", "headers", "text", "token_count", "source_url", "page_title", "token_ids")
+
+    def __init__(
+        self,
+        headers: tuple[str, str, str],
+        text: str,
+        token_count: int = 0,
+        source_url: str = "",
+        page_title: str = "",
+        chunk_id: str | None = None,
+        token_ids: array | None = None,
+    ):
+        self.chunk_id = chunk_id
+        self.headers = headers
+        self.text = text
+        self.token_count = token_count
+        self.source_url = source_url
+        self.page_title = page_title
+        self.token_ids = token_ids
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the serialized fields of two chunks."""
+        if not isinstance(other, Chunk):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        """Return a short representation with the chunk ID, headers and token count."""
+        return f"Chunk(chunk_id={self.chunk_id!r}, headers={self.headers!r}, token_count={self.token_count})"
+
+    def _fields(self) -> tuple:
+        return self.chunk_id, self.headers, self.text, self.token_count, self.source_url, self.page_title
+
+    def header_dict(self) -> dict[str, str]:
+        """
+        Return the headers in their serialized form.
+
+        Returns:
+            dict[str, str]: The headers keyed by "h1", "h2" and "h3".
+        """
+        return dict(zip(HEADER_LEVELS, self.headers, strict=True))
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        Convert the chunk to the JSON shape saved in chunk files and loaded by `DocumentProcessor`.
+
+        Returns:
+            dict[str, Any]: The chunk with "chunk_id", "metadata" and "data" keys.
+        """
+        return {
+            "chunk_id": self.chunk_id,
+            "metadata": {"token_count": self.token_count, "source_url": self.source_url, "page_title": self.page_title},
+            "data": {"headers": self.header_dict(), "text": self.text},
+        }
+
+    @classmethod
+    def from_dict(cls, chunk: dict[str, Any]) -> "Chunk":
+        """
+        Create a chunk from its serialized form.
+
+        Args:
+            chunk (dict[str, Any]): A chunk as returned by `to_dict`.
+
+        Returns:
+            Chunk: The chunk.
+        """
+        headers = chunk["data"]["headers"]
+        metadata = chunk["metadata"]
+        return cls(
+            headers=tuple(headers.get(level, "") for level in HEADER_LEVELS),
+            text=chunk["data"]["text"],
+            token_count=metadata["token_count"],
+            source_url=metadata.get("source_url", ""),
+            page_title=metadata.get("page_title", ""),
+            chunk_id=chunk["chunk_id"],
+        )
+
+
+class ChunkManifest:
+    """
+    Persisted record of the pages chunked in previous runs, used to skip pages that have not changed.
+
+    Each `sourceURL` maps to a hash of the page (content, title and chunking settings), the IDs of the chunks it
+    produced, the chunk file they were saved to and the byte range of their lines in that file, so reusing a page reads
+    only its own chunks. The manifest is shared by all crawl files chunked into the same
+    output directory, so a new crawl of a site reuses the chunks of the pages that are identical to the last crawl.
+
+    Args:
+        filepath (str): Path of the JSON manifest file. It is created on the first save.
+    """
+
+    version = 2
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.pages = self._read()
+        self.updated_pages = {}
+
+    def __len__(self) -> int:
+        """Return the number of pages recorded in the manifest."""
+        return len(self.pages)
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.filepath, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            logger.warning(f"Ignoring unreadable chunk manifest {self.filepath}: {e}")
+            return {}
+        return manifest.get("pages", {}) if manifest.get("version") == self.version else {}
+
+    @staticmethod
+    def page_hash(page: dict[str, Any], settings: dict[str, Any]) -> str:
+        """
+        Hash everything that determines the chunks of a page.
+
+        Args:
+            page (dict[str, Any]): A page from the raw crawl data.
+            settings (dict[str, Any]): The chunking settings the page is chunked with.
+
+        Returns:
+            str: Hex digest identifying the page content and settings.
+        """
+        metadata = page.get("metadata", {})
+        key = [settings, metadata.get("sourceURL", ""), metadata.get("title", ""), page.get("markdown", "")]
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8", "surrogatepass")).hexdigest()
+
+    def lookup(self, source_url: str, content_hash: str) -> dict[str, Any] | None:
+        """
+        Return the previous entry for a page if its hash is unchanged.
+
+        Args:
+            source_url (str): The page URL.
+            content_hash (str): The current hash of the page.
+
+        Returns:
+            dict[str, Any] | None: The entry with "chunk_ids", "chunks_file", "offset" and "length", or None if the
+                page is new or changed.
+        """
+        entry = self.pages.get(source_url)
+        if entry is None or entry.get("content_hash") != content_hash:
+            return None
+        return entry
+
+    def update(
+        self, source_url: str, content_hash: str, chunk_ids: list[str], chunks_file: str, offset: int, length: int
+    ) -> None:
+        """
+        Record the chunks produced for a page in this run.
+
+        Args:
+            source_url (str): The page URL.
+            content_hash (str): The hash of the page.
+            chunk_ids (list[str]): IDs of the chunks saved for the page.
+            chunks_file (str): Name of the chunk file in the output directory.
+            offset (int): Byte offset of the first line of the page's chunks in the chunk file.
+            length (int): Length in bytes of the lines of the page's chunks.
+        """
+        entry = {
+            "content_hash": content_hash,
+            "chunk_ids": chunk_ids,
+            "chunks_file": chunks_file,
+            "offset": offset,
+            "length": length,
+        }
+        self.pages[source_url] = entry
+        self.updated_pages[source_url] = entry
+
+    def save(self) -> None:
+        """
+        Merge the pages updated in this run into the manifest file.
+
+        The file is re-read under an exclusive lock before writing, so concurrent chunking processes sharing the
+        manifest do not overwrite each other's entries.
+        """
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        with open(f"{self.filepath}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            pages = self._read()
+            pages.update(self.updated_pages)
+            temp_filepath = f"{self.filepath}.tmp"
+            with open(temp_filepath, "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "pages": pages}, f, ensure_ascii=False)
+            os.replace(temp_filepath, self.filepath)
+        self.pages = pages
+        self.updated_pages = {}
+
+
+class RawCrawlIndex:
+    """
+    Byte-offset index of the pages of a raw crawl file, read through `mmap`.
+
+    For every page of the "data" array, the index records the byte range of the page and of its "markdown" and
+    "metadata" values, and the page's `sourceURL`. It is built in one scan of the file and saved as a JSON sidecar in a
+    `.page_index` directory next to the file, and rebuilt when the size or modification time of the file changes.
+    Reading a page decodes only its own bytes, so one page can be re-chunked, inspected or summarized without parsing
+    the rest of the crawl.
+
+    Args:
+        filepath (str): Path of the raw crawl file.
+    """
+
+    version = 1
+    # One JSON token: a string, a structural character or a scalar, after optional whitespace
+    token_pattern = re.compile(rb'[ \t\n\r]*+("(?:[^"\\]++|\\.)*+"|[{}\[\],:]|[^ \t\n\r{}\[\],:"]++)', re.DOTALL)
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        directory, filename = os.path.split(filepath)
+        self.index_filepath = os.path.join(directory, PAGE_INDEX_DIRNAME, f"{filename}.pages.json")
+        # (start, end, markdown start, markdown end, metadata start, metadata end) of each page, None if missing
+        self.pages: list[list[int | None]] = []
+        self.source_urls: list[str] = []
+        self._positions: dict[str, int] = {}
+        self._file = None
+        self._mmap = None
+
+    def __len__(self) -> int:
+        """Return the number of indexed pages."""
+        return len(self.pages)
+
+    def __enter__(self) -> "RawCrawlIndex":
+        """Open the index for reading."""
+        return self.open()
+
+    def __exit__(self, *exc_info) -> None:
+        """Close the memory map of the raw crawl file."""
+        self.close()
+
+    def open(self) -> "RawCrawlIndex":
+        """
+        Load the index, building and saving it first if it is missing or stale, and map the raw crawl file.
+
+        Returns:
+            RawCrawlIndex: The index itself.
+
+        Raises:
+            FileNotFoundError: If the raw crawl file is not found.
+            json.JSONDecodeError: If the raw crawl file is not a JSON object with a "data" array of page objects.
+        """
+        self._file = open(self.filepath, "rb")
+        try:
+            file_stat = os.fstat(self._file.fileno())
+            if not file_stat.st_size:
+                raise json.JSONDecodeError("Empty raw crawl file", "", 0)
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            stat_key = [file_stat.st_size, file_stat.st_mtime_ns]
+            if not self._read(stat_key):
+                self.pages, self.source_urls = self._scan(self._mmap)
+                self._save(stat_key)
+        except BaseException:
+            self.close()
+            raise
+        self._positions = {}
+        for position, source_url in enumerate(self.source_urls):
+            self._positions.setdefault(source_url, position)
+        return self
+
+    def close(self) -> None:
+        """Close the memory map and the raw crawl file."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def position(self, source_url: str) -> int | None:
+        """
+        Return the position of the first page with the given source URL.
+
+        Args:
+            source_url (str): The `sourceURL` of the page.
+
+        Returns:
+            int | None: The position of the page in the "data" array, or None if no page has the URL.
+        """
+        return self._positions.get(source_url)
+
+    def page(self, position: int) -> dict[str, Any]:
+        """
+        Decode one page.
+
+        Args:
+            position (int): The position of the page in the "data" array.
+
+        Returns:
+            dict[str, Any]: The page, as `iter_pages` yields it.
+        """
+        start, end = self.pages[position][0:2]
+        return json.loads(self._mmap[start:end])
+
+    def markdown(self, position: int) -> str:
+        """
+        Decode the markdown of one page.
+
+        Args:
+            position (int): The position of the page in the "data" array.
+
+        Returns:
+            str: The markdown of the page, or "" if it has none.
+        """
+        start, end = self.pages[position][2:4]
+        return "" if start is None else json.loads(self._mmap[start:end])
+
+    def metadata(self, position: int) -> dict[str, Any]:
+        """
+        Decode the metadata of one page.
+
+        Args:
+            position (int): The position of the page in the "data" array.
+
+        Returns:
+            dict[str, Any]: The metadata of the page, or an empty dictionary if it has none.
+        """
+        start, end = self.pages[position][4:6]
+        return {} if start is None else json.loads(self._mmap[start:end])
+
+    def _read(self, stat_key: list[int]) -> bool:
+        try:
+            with open(self.index_filepath, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return False
+        except json.JSONDecodeError as e:
+            logger.warning(f"Rebuilding unreadable page index {self.index_filepath}: {e}")
+            return False
+        if index.get("version") != self.version or index.get("stat") != stat_key:
+            return False
+        self.pages, self.source_urls = index["pages"], index["source_urls"]
+        return True
+
+    def _save(self, stat_key: list[int]) -> None:
+        os.makedirs(os.path.dirname(self.index_filepath), exist_ok=True)
+        temp_filepath = f"{self.index_filepath}.{os.getpid()}.tmp"
+        with open(temp_filepath, "w", encoding="utf-8") as f:
+            index = {"version": self.version, "stat": stat_key, "pages": self.pages, "source_urls": self.source_urls}
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_filepath, self.index_filepath)
+        logger.info(f"Indexed {len(self.pages)} pages of {self.filepath}")
+
+    def _scan(self, data: mmap.mmap) -> tuple[list[list[int | None]], list[str]]:
+        pages, source_urls = [], []
+        position = self._expect(data, 0, b"{")
+        if self._peek(data, position) == b"}":
+            return pages, source_urls
+        while True:
+            key_start, position = self._token(data, position)
+            key = json.loads(data[key_start:position])
+            position = self._expect(data, position, b":")
+            if key != "data":
+                position = self._skip_value(data, position)[1]
+            else:
+                position = self._expect(data, position, b"[")
+                closed = self._peek(data, position) == b"]"
+                if closed:
+                    position = self._token(data, position)[1]
+                while not closed:
+                    page, position = self._scan_page(data, position)
+                    metadata = {} if page[4] is None else json.loads(data[page[4] : page[5]])
+                    pages.append(page)
+                    source_urls.append(metadata.get("sourceURL", "") if isinstance(metadata, dict) else "")
+                    position, closed = self._separator(data, position, b"]")
+            position, closed = self._separator(data, position, b"}")
+            if closed:
+                return pages, source_urls
+
+    def _scan_page(self, data: mmap.mmap, position: int) -> tuple[list[int | None], int]:
+        page = [None] * 6
+        page[0] = self._token(data, position)[0]
+        position = self._expect(data, position, b"{")
+        closed = self._peek(data, position) == b"}"
+        if closed:
+            position = self._token(data, position)[1]
+        while not closed:
+            key_start, position = self._token(data, position)
+            key = json.loads(data[key_start:position])
+            position = self._expect(data, position, b":")
+            value_start, position = self._skip_value(data, position)
+            if key == "markdown":
+                page[2:4] = value_start, position
+            elif key == "metadata":
+                page[4:6] = value_start, position
+            position, closed = self._separator(data, position, b"}")
+        page[1] = position
+        return page, position
+
+    def _token(self, data: mmap.mmap, position: int) -> tuple[int, int]:
+        match = self.token_pattern.match(data, position)
+        if match is None:
+            raise json.JSONDecodeError("Unexpected end of data or invalid token", "", position)
+        return match.start(1), match.end()
+
+    def _peek(self, data: mmap.mmap, position: int) -> bytes:
+        start = self._token(data, position)[0]
+        return data[start : start + 1]
+
+    def _expect(self, data: mmap.mmap, position: int, expected: bytes) -> int:
+        start, end = self._token(data, position)
+        if data[start:end] != expected:
+            raise json.JSONDecodeError(f"Expected {expected.decode()!r}", "", start)
+        return end
+
+    def _separator(self, data: mmap.mmap, position: int, close: bytes) -> tuple[int, bool]:
+        start, end = self._token(data, position)
+        token = data[start:end]
+        if token not in (b",", close):
+            raise json.JSONDecodeError(f"Expected ',' or {close.decode()!r}", "", start)
+        return end, token == close
+
+    def _skip_value(self, data: mmap.mmap, position: int) -> tuple[int, int]:
+        start, position = self._token(data, position)
+        depth = 1 if data[start : start + 1] in (b"{", b"[") else 0
+        while depth:
+            token_start, position = self._token(data, position)
+            token = data[token_start : token_start + 1]
+            if token in (b"{", b"["):
+                depth += 1
+            elif token in (b"}", b"]"):
+                depth -= 1
+        return start, position
+
 
 class MarkdownChunker:
     """Processes markdown data, removes boilerplate, images, and validates chunks.
@@ -25,13 +847,26 @@ class MarkdownChunker:
         min_chunk_size (int): Minimum size of each chunk in tokens. Defaults to 100.
         overlap_percentage (float): Percentage of token overlap between chunks. Defaults to 0.05.
         save (bool): Whether or not to save the processed chunks. Defaults to False.
+        token_cache_size (int): Maximum number of token counts kept in the LRU cache. Defaults to 100_000.
+        workers (int): Number of worker processes used to chunk pages in parallel. Defaults to 1 (no pool).
+        incremental (bool): Whether to reuse the chunks of pages unchanged since they were last chunked into
+            `output_dir`, as recorded in its chunk manifest. Defaults to False.
+        save_token_ids (bool): Whether `save_chunks` also writes the token IDs of every chunk to a
+            `-chunked.tokens.bin` sidecar file (see `iter_token_ids`). Defaults to False.
+        near_duplicate_threshold (float | None): Estimated Jaccard similarity at or above which the validator drops a
+            chunk as a near-duplicate of an earlier one (see `NearDuplicateIndex`). Defaults to None (exact only).
+        dedup_index (bool): Whether to drop chunks whose text was already saved from another crawl file into
+            `output_dir`, as recorded in its chunk digest index (see `ChunkDigestIndex`). Defaults to False.
 
     Methods:
         load_data: Loads markdown from JSON and prepares for chunking.
+        load_page: Loads one page of the raw crawl file by its source URL through its byte-offset index.
+        clean_page: Removes boilerplate and images from page content.
         remove_images: Removes all types of images from the content.
         process_pages: Iterates through each page in the loaded data.
         remove_boilerplate: Removes navigation and boilerplate content from markdown.
         clean_header_text: Cleans unwanted markdown elements and artifacts from header text.
+        lex_blocks: Splits markdown into typed heading, fence, paragraph, list and blank blocks in one pass.
         identify_sections: Identifies sections in the page content based on headers and preserves markdown structures.
 
     Raises:
@@ -48,22 +883,37 @@ class MarkdownChunker:
         min_chunk_size: int = 100,
         overlap_percentage: float = 0.05,
         save: bool = False,
+        token_cache_size: int = 100_000,
+        workers: int = 1,
+        incremental: bool = False,
+        save_token_ids: bool = False,
+        near_duplicate_threshold: float | None = None,
+        dedup_index: bool = False,
     ):
         self.output_dir = output_dir
         self.input_filename = input_filename
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer = get_tokenizer()
         self.max_tokens = max_tokens  # Hard limit
         self.soft_token_limit = soft_token_limit  # Soft limit
         self.min_chunk_size = min_chunk_size  # Minimum chunk size in tokens
         self.overlap_percentage = overlap_percentage  # 5% overlap
+        self.token_cache = TokenCountCache(max_size=token_cache_size)
+        self.size_precheck = ByteBoundPrecheck(tokenizers.max_token_bytes(self.tokenizer.name))
+        self.timings = StageTimings()
+        self.workers = workers
+        self.save = save
+        self.manifest = ChunkManifest(os.path.join(output_dir, MANIFEST_FILENAME)) if incremental else None
+        self.pages_skipped = 0
+        self.digest_index = ChunkDigestIndex(os.path.join(output_dir, DIGEST_INDEX_FILENAME)) if dedup_index else None
+        self.save_token_ids = save_token_ids
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self._header_paths = {}  # Interned (h1, h2, h3) header tuples
+        self._previous_chunk_files = {}  # chunk file name -> open file, read at the byte ranges of reused pages
+        self._page_hashes = {}  # sourceURL -> page hash, for pages seen in the current run
+        self._page_chunk_ids = {}  # sourceURL -> IDs of the validated chunks of the page in the current run
+        self._page_byte_ranges = {}  # sourceURL -> [start, end) of the lines of the page's chunks in the saved file
         # Initialize the validator
-        self.validator = MarkdownChunkValidator(
-            min_chunk_size=self.min_chunk_size,
-            max_tokens=self.max_tokens,
-            output_dir=self.output_dir,
-            input_filename=self.input_filename,
-            save=save,
-        )
+        self.validator = self._create_validator()
 
         # Precompile regex patterns for performance
         self.boilerplate_patterns = [
@@ -73,14 +923,24 @@ class MarkdownChunker:
             r"^Ctrl K$",
             r"^Search$",
             r"^Navigation$",
-            r"^\[.*\]\(/.*\)$",  # Matches navigation links
+            r"^\[(?=.*?\]\(/).*\)$",  # Matches navigation links
             r"^On this page$",
             r"^\* \* \*$",  # Matches horizontal rules used as separators
         ]
         self.boilerplate_regex = re.compile("|".join(self.boilerplate_patterns), re.MULTILINE)
         self.h_pattern = re.compile(r"^\s*(?![-*]{3,})(#{1,3})\s*(.*)$", re.MULTILINE)
         self.code_block_start_pattern = re.compile(r"^(```|~~~)(.*)$")
+        self.list_item_pattern = re.compile(r"(?:[-*+]|\d+[.)])(?:\s|$)")
         self.inline_code_pattern = re.compile(r"`([^`\n]+)`")
+        self.blank_lines_pattern = re.compile(r"\n{2,}")
+        self.html_image_pattern = re.compile(r"<img[^>]++>")
+        self.reference_image_url_pattern = re.compile(r"^\[.*?\]:\s*http.*$", re.MULTILINE)
+        self.base64_image_pattern = re.compile(r"!\[.*?\]\(data:image/[^;]++;base64,[^\)]++\)")
+        self.image_extension_pattern = re.compile(r"\.(png|jpg|jpeg|gif|svg|webp)", re.IGNORECASE)
+        self.sentence_end_pattern = re.compile(r"[.!?](?=\s)")
+        self.whitespace_pattern = re.compile(r"\s*")
+        self.non_whitespace_pattern = re.compile(r"\S*")
+        self.header_link_pattern = re.compile(r"\[(?>(.*?)\]\()[^)\n]*\)")
 
     @base_error_handler
     def load_data(self) -> dict[str, Any]:
@@ -111,6 +971,79 @@ class MarkdownChunker:
             logger.error(f"Invalid JSON in file: {input_filepath}")
             raise
 
+    def iter_pages(self, read_size: int = 1 << 20) -> Iterator[dict[str, Any]]:
+        """
+        Stream pages one at a time from the "data" array of the raw crawl file.
+
+        Unlike `load_data`, the file is never parsed as a whole: memory is bounded by the largest single page, so the
+        result can be passed to `process_pages` for crawls of any size.
+
+        Args:
+            read_size (int): Number of characters read from the file at a time. Defaults to 1 MiB.
+
+        Yields:
+            dict[str, Any]: The next page with its "markdown" and "metadata".
+
+        Raises:
+            FileNotFoundError: If the JSON file is not found.
+            json.JSONDecodeError: If the JSON file has invalid content.
+        """
+        input_filepath = os.path.join(RAW_DATA_DIR, self.input_filename)
+
+        try:
+            with open(input_filepath, encoding="utf-8") as f:
+                yield from _StreamingJsonReader(f, read_size).iter_array_items("data")
+            logger.info(f"{self.input_filename} streamed")
+        except FileNotFoundError:
+            logger.error(f"File not found: {input_filepath}")
+            raise
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON in file: {input_filepath}")
+            raise
+
+    def load_page(self, source_url: str) -> dict[str, Any]:
+        """
+        Load one page of the raw crawl file by its source URL, without parsing the rest of the file.
+
+        The page is read through the file's `RawCrawlIndex`, which is built on first use. Pass the page to
+        `process_pages` to re-chunk it on its own.
+
+        Args:
+            source_url (str): The `sourceURL` of the page.
+
+        Returns:
+            dict[str, Any]: The page with its "markdown" and "metadata".
+
+        Raises:
+            KeyError: If no page of the file has the source URL.
+            FileNotFoundError: If the JSON file is not found.
+            json.JSONDecodeError: If the JSON file has invalid content.
+        """
+        with RawCrawlIndex(os.path.join(RAW_DATA_DIR, self.input_filename)) as page_index:
+            position = page_index.position(source_url)
+            if position is None:
+                raise KeyError(f"No page with sourceURL {source_url} in {self.input_filename}")
+            return page_index.page(position)
+
+    @base_error_handler
+    def clean_page(self, content: str) -> str:
+        """
+        Remove boilerplate and images from page content.
+
+        Runs `remove_boilerplate` followed by `remove_images`, the same passes in the same order as before, since
+        later passes see the output of earlier ones. Their patterns are precompiled, image passes whose trigger
+        substring is absent from the page are skipped, and the inline image and image reference passes are linear
+        scanners instead of lazy regexes that backtracked quadratically on long lines.
+        `benchmarks/cleaning_benchmark.py` compares it with the original regex passes.
+
+        Args:
+            content (str): The raw markdown content of a page.
+
+        Returns:
+            str: The cleaned content.
+        """
+        return self.remove_images(self.remove_boilerplate(content))
+
     @base_error_handler
     def remove_images(self, content: str) -> str:
         """
@@ -126,63 +1059,335 @@ class MarkdownChunker:
             Exception: Raised if there are any issues during the execution of the function.
         """
         # Remove HTML img tags (in case any slipped through from FireCrawl)
-        content = re.sub(r"<img[^>]+>", "", content)
+        if "<img" in content:
+            content = self.html_image_pattern.sub("", content)
 
         # Remove Markdown image syntax
-        content = re.sub(r"!\[.*?\]\(.*?\)", "", content)
+        if "![" in content:
+            content = self._remove_markdown_images(content)
 
         # Remove reference-style images
-        content = re.sub(r"^\[.*?\]:\s*http.*$", "", content, flags=re.MULTILINE)
+        if "]:" in content:
+            content = self.reference_image_url_pattern.sub("", content)
 
         # Remove base64 encoded images
-        content = re.sub(r"!\[.*?\]\(data:image/[^;]+;base64,[^\)]+\)", "", content)
+        if "data:image/" in content:
+            content = self.base64_image_pattern.sub("", content)
 
         # Remove any remaining image links that might not have been caught
-        content = re.sub(
-            r"\[.*?\]:\s*\S*\.(png|jpg|jpeg|gif|svg|webp)", "", content, flags=re.MULTILINE | re.IGNORECASE
-        )
+        if "]:" in content:
+            content = self._remove_reference_images(content)
 
         return content
 
-    @base_error_handler
-    def process_pages(self, json_input: dict[str, Any]) -> list[dict[str, Any]]:
+    def _remove_markdown_images(self, content: str) -> str:
+        r"""
+        Remove `![alt](url)` images, matching `re.sub(r"!\[.*?\]\(.*?\)", "", content)` in linear time.
+
+        The regex matches from `![` to the first `)` after the first `](` on the same line. If a line has no such
+        `)` for one `![`, it has none for any later `![` either, so the rest of the line is skipped.
+
+        Args:
+            content (str): The content to remove images from.
+
+        Returns:
+            str: The content without markdown images.
+        """
+        parts = []
+        pos = 0
+        start = content.find("![")
+        while start != -1:
+            line_end = content.find("\n", start)
+            if line_end == -1:
+                line_end = len(content)
+            link_start = content.find("](", start + 2, line_end)
+            link_end = content.find(")", link_start + 2, line_end) if link_start != -1 else -1
+            if link_end == -1:
+                start = content.find("![", line_end)
+                continue
+            parts.append(content[pos:start])
+            pos = link_end + 1
+            start = content.find("![", pos)
+        parts.append(content[pos:])
+        return "".join(parts)
+
+    def _remove_reference_images(self, content: str) -> str:
+        r"""
+        Remove `[ref]: path.png` image references in linear time.
+
+        Matches `re.sub(r"\[.*?\]:\s*\S*\.(png|jpg|jpeg|gif|svg|webp)", "", content, flags=re.IGNORECASE)`: from
+        the first `[` on a line, the first `]:` on that line whose following non-whitespace run contains an image
+        extension, up to the last extension in that run. Whether a `]:` succeeds does not depend on the `[`, so each
+        `]:` is checked at most once and the last extension of each run is looked up once.
+
+        Args:
+            content (str): The content to remove image references from.
+
+        Returns:
+            str: The content without image references.
+        """
+        last_extension_ends = {}  # end of a non-whitespace run -> end of the last image extension in it
+        parts = []
+        pos = 0
+        start = content.find("[")
+        while start != -1:
+            line_end = content.find("\n", start)
+            if line_end == -1:
+                line_end = len(content)
+            match_end = None
+            separator = content.find("]:", start + 1, line_end)
+            while separator != -1:
+                run_start = self.whitespace_pattern.match(content, separator + 2).end()
+                run_end = self.non_whitespace_pattern.match(content, run_start).end()
+                if run_end not in last_extension_ends:
+                    last_match = None
+                    for match in self.image_extension_pattern.finditer(content, run_start, run_end):
+                        last_match = match
+                    last_extension_ends[run_end] = (last_match.start(), last_match.end()) if last_match else None
+                extension = last_extension_ends[run_end]
+                if extension is not None and extension[0] >= run_start:
+                    match_end = extension[1]
+                    break
+                separator = content.find("]:", separator + 1, line_end)
+            if match_end is None:
+                start = content.find("[", line_end)
+                continue
+            parts.append(content[pos:start])
+            pos = match_end
+            start = content.find("[", pos)
+        parts.append(content[pos:])
+        return "".join(parts)
+
+    @base_error_handler
+    def process_pages(self, json_input: dict[str, Any] | Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Process pages from JSON input and generate data chunks.
+
+        With `workers` > 1 pages are chunked in a process pool; chunks are still returned in page order.
+
+        Args:
+            json_input (dict[str, Any] | Iterable[dict[str, Any]]): The input JSON containing page data and metadata,
+                or an iterable of pages such as the one returned by `iter_pages`.
+
+        Returns:
+            list[dict[str, Any]]: A list of processed data chunks, in the JSON shape saved by `save_chunks`.
+
+        Raises:
+            KeyError: If the JSON input does not contain the required keys.
+            ValueError: If there is an issue with the page content processing.
+        """
+        return [chunk.to_dict() for chunk in self.iter_chunks(json_input)]
+
+    def iter_chunks(self, json_input: dict[str, Any] | Iterable[dict[str, Any]]) -> Iterator[Chunk]:
+        """
+        Chunk pages lazily, yielding validated chunks page by page.
+
+        Duplicates are dropped as they appear and the validation summary is logged once all pages are processed.
+        Combined with `iter_pages` and `save_chunks`, only one page and its chunks are held in memory at a time.
+
+        Args:
+            json_input (dict[str, Any] | Iterable[dict[str, Any]]): The input JSON containing page data and metadata,
+                or an iterable of pages such as the one returned by `iter_pages`.
+
+        Yields:
+            Chunk: The validated chunks, in page order. `Chunk.to_dict` converts them to their JSON shape.
+        """
+        pages = json_input["data"] if isinstance(json_input, dict) else json_input
+        if self.workers > 1:
+            page_chunks = self._iter_pages_in_pool(pages)
+        else:
+            page_chunks = map(self._chunk_or_reuse_page, pages)
+        produced = _TimedIterator(chunk for chunks in page_chunks for chunk in chunks)
+        chunks = _TimedIterator(self.validator.validate_stream(produced))
+        for chunk in chunks:
+            if self.manifest is not None:
+                self._page_chunk_ids.setdefault(chunk.source_url, []).append(chunk.chunk_id)
+            yield chunk
+        self.timings.add("validation", chunks.seconds - produced.seconds)
+        if self.manifest is not None:
+            logger.info(f"Skipped {self.pages_skipped} unchanged pages out of {len(self._page_hashes)}")
+
+    def _chunk_or_reuse_page(self, page: dict[str, Any]) -> list[Chunk]:
+        reused_chunks = self._reuse_page_chunks(page)
+        return reused_chunks if reused_chunks is not None else self._process_page(page)
+
+    def _reuse_page_chunks(self, page: dict[str, Any]) -> list[Chunk] | None:
+        """
+        Return the chunks saved for a page in a previous run if the page is unchanged.
+
+        Args:
+            page (dict[str, Any]): A page from the raw crawl data.
+
+        Returns:
+            list[Chunk] | None: The previous chunks, or None if the page has to be chunked.
+        """
+        if self.manifest is None:
+            return None
+        source_url = page["metadata"].get("sourceURL", "")
+        content_hash = self.manifest.page_hash(page, self._settings())
+        self._page_hashes[source_url] = content_hash
+        entry = self.manifest.lookup(source_url, content_hash) if source_url else None
+        if entry is None:
+            return None
+
+        chunks = self._read_previous_chunks(entry)
+        if chunks is None:
+            return None
+        for chunk in chunks:
+            chunk.headers = self._intern_headers(chunk.headers)
+            self.validator.add_chunk(chunk.token_count)
+            for level, heading_text in zip(HEADER_LEVELS, chunk.headers, strict=True):
+                if heading_text:
+                    self.validator.increment_total_headings(level, heading_text)
+                    self.validator.add_preserved_heading(level, heading_text)
+        self.pages_skipped += 1
+        return chunks
+
+    def _read_previous_chunks(self, entry: dict[str, Any]) -> list[Chunk] | None:
+        """
+        Read the chunks of a page from the byte range recorded for it in its previous chunk file.
+
+        Args:
+            entry (dict[str, Any]): The manifest entry of the page.
+
+        Returns:
+            list[Chunk] | None: The chunks in their previous order, or None if the range no longer holds them.
+        """
+        chunks_file = entry["chunks_file"]
+        try:
+            if chunks_file not in self._previous_chunk_files:
+                self._previous_chunk_files[chunks_file] = open(os.path.join(self.output_dir, chunks_file), "rb")
+            f = self._previous_chunk_files[chunks_file]
+            f.seek(entry["offset"])
+            previous_chunks = {}
+            for line in f.read(entry["length"]).splitlines():
+                chunk = Chunk.from_dict(json.loads(line))
+                previous_chunks[chunk.chunk_id] = chunk
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Cannot reuse chunks from {chunks_file}, the page will be chunked again: {e}")
+            return None
+        if not all(chunk_id in previous_chunks for chunk_id in entry["chunk_ids"]):
+            return None
+        return [previous_chunks[chunk_id] for chunk_id in entry["chunk_ids"]]
+
+    def _update_manifest(self, chunks_file: str) -> None:
+        for source_url, content_hash in self._page_hashes.items():
+            if source_url:
+                start, end = self._page_byte_ranges.get(source_url, (0, 0))
+                chunk_ids = self._page_chunk_ids.get(source_url, [])
+                self.manifest.update(source_url, content_hash, chunk_ids, chunks_file, start, end - start)
+        self.manifest.save()
+        self._page_hashes = {}
+        self._page_chunk_ids = {}
+        self._page_byte_ranges = {}
+        for f in self._previous_chunk_files.values():
+            f.close()
+        self._previous_chunk_files = {}
+
+    def _settings(self) -> dict[str, Any]:
+        return {
+            "max_tokens": self.max_tokens,
+            "soft_token_limit": self.soft_token_limit,
+            "min_chunk_size": self.min_chunk_size,
+            "overlap_percentage": self.overlap_percentage,
+        }
+
+    def _process_page(self, page: dict[str, Any]) -> list[Chunk]:
         """
-        Process pages from JSON input and generate data chunks.
+        Clean a single page and split it into chunks.
 
         Args:
-            json_input (dict[str, Any]): The input JSON containing page data and metadata.
+            page (dict[str, Any]): A page from the raw crawl data with "markdown" and "metadata" keys.
 
         Returns:
-            list[dict[str, Any]]: A list of processed data chunks.
+            list[Chunk]: The chunks created from the page.
+        """
+        start_time = time.perf_counter()
+        page_content = self.clean_page(page["markdown"])
+        page_metadata = page["metadata"]
+        sectioning_start_time = time.perf_counter()
+        self.timings.add("clean", sectioning_start_time - start_time)
+
+        sections = self.identify_sections(page_content, page_metadata)
+        self.timings.add("sectioning", time.perf_counter() - sectioning_start_time)
+        chunks = self.create_chunks(sections, page_metadata)
+
+        # Post-processing: Ensure headers fallback to page title if missing
+        page_title = page_metadata.get("title", "Untitled")
+        for chunk in chunks:
+            if not chunk.headers[0]:
+                chunk.headers = self._intern_headers((page_title, *chunk.headers[1:]))
+                # Increment total headings for H1 when setting from page title
+                if page_title.strip() not in self.validator.total_headings["h1"]:
+                    self.validator.increment_total_headings("h1", page_title)
+            if not self.save_token_ids:
+                chunk.token_ids = None  # Only needed for overlap within the page
+        return chunks
 
-        Raises:
-            KeyError: If the JSON input does not contain the required keys.
-            ValueError: If there is an issue with the page content processing.
+    def _iter_pages_in_pool(self, pages: Iterable[dict[str, Any]]) -> Iterator[list[Chunk]]:
         """
-        all_chunks = []
-        for _index, page in enumerate(json_input["data"]):
-            page_content = page["markdown"]
-            page_content = self.remove_boilerplate(page_content)
-            page_content = self.remove_images(page_content)  # Add this line
-            page_metadata = page["metadata"]
+        Chunk pages in a process pool, keeping page order and merging worker validator counts.
 
-            sections = self.identify_sections(page_content, page_metadata)
-            chunks = self.create_chunks(sections, page_metadata)
+        At most `4 * workers` pages are in flight at a time, so streamed pages are not all read ahead.
 
-            # Post-processing: Ensure headers fallback to page title if missing
-            page_title = page_metadata.get("title", "Untitled")
-            for chunk in chunks:
-                if not chunk["data"]["headers"].get("h1"):
-                    chunk["data"]["headers"]["h1"] = page_title
-                    # Increment total headings for H1 when setting from page title
-                    if page_title.strip() not in self.validator.total_headings["h1"]:
-                        self.validator.increment_total_headings("h1", page_title)
+        Args:
+            pages (Iterable[dict[str, Any]]): The pages to chunk.
+
+        Yields:
+            list[Chunk]: The chunks of each page, in page order.
+        """
+        worker_config = {
+            "input_filename": self.input_filename,
+            "output_dir": self.output_dir,
+            "max_tokens": self.max_tokens,
+            "soft_token_limit": self.soft_token_limit,
+            "min_chunk_size": self.min_chunk_size,
+            "overlap_percentage": self.overlap_percentage,
+            "token_cache_size": self.token_cache.max_size,
+            "save_token_ids": self.save_token_ids,
+        }
+        max_in_flight = 4 * self.workers
+        logger.info(f"Chunking pages with {self.workers} worker processes")
+
+        in_flight = deque()
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_page_worker, initargs=(worker_config,)
+        ) as executor:
+            for page in pages:
+                reused_chunks = self._reuse_page_chunks(page)
+                in_flight.append(
+                    reused_chunks if reused_chunks is not None else executor.submit(_chunk_page_in_worker, page)
+                )
+                if len(in_flight) >= max_in_flight:
+                    yield self._collect_page_result(in_flight.popleft())
+            while in_flight:
+                yield self._collect_page_result(in_flight.popleft())
+
+    def _collect_page_result(self, result: Future | list[Chunk]) -> list[Chunk]:
+        if isinstance(result, list):  # Chunks reused from a previous run
+            return result
+        chunks, counts, seconds = result.result()
+        self.validator.merge_counts(counts)
+        self.timings.merge(seconds)
+        for chunk in chunks:  # Unpickled chunks carry their own copies of the header tuples
+            chunk.headers = self._intern_headers(chunk.headers)
+        return chunks
 
-            all_chunks.extend(chunks)
+    def _intern_headers(self, headers: tuple[str, str, str]) -> tuple[str, str, str]:
+        return self._header_paths.setdefault(headers, headers)
 
-        # After processing all pages, perform validation
-        self.validator.validate(all_chunks)
-        return all_chunks
+    def _create_validator(self) -> "MarkdownChunkValidator":
+        return MarkdownChunkValidator(
+            min_chunk_size=self.min_chunk_size,
+            max_tokens=self.max_tokens,
+            output_dir=self.output_dir,
+            input_filename=self.input_filename,
+            save=self.save,
+            token_cache=self.token_cache,
+            size_precheck=self.size_precheck,
+            near_duplicate_threshold=self.near_duplicate_threshold,
+            digest_index=self.digest_index,
+        )
 
     @base_error_handler
     def remove_boilerplate(self, content: str) -> str:
@@ -201,7 +1406,7 @@ class MarkdownChunker:
         # Use precompiled regex
         cleaned_content = self.boilerplate_regex.sub("", content)
         # Remove any extra newlines left after removing boilerplate
-        cleaned_content = re.sub(r"\n{2,}", "\n\n", cleaned_content)
+        cleaned_content = self.blank_lines_pattern.sub("\n\n", cleaned_content)
         return cleaned_content.strip()
 
     @base_error_handler
@@ -221,9 +1426,11 @@ class MarkdownChunker:
         # Remove zero-width spaces
         cleaned_text = header_text.replace("\u200b", "")
         # Remove markdown links but keep the link text
-        cleaned_text = re.sub(r"\[(.*?)\]\(.*?\)", r"\1", cleaned_text)
+        if "](" in cleaned_text:
+            cleaned_text = self.header_link_pattern.sub(r"\1", cleaned_text)
         # Remove images in headers
-        cleaned_text = re.sub(r"!\[.*?\]\(.*?\)", "", cleaned_text)
+        if "![" in cleaned_text:
+            cleaned_text = self._remove_markdown_images(cleaned_text)
         cleaned_text = cleaned_text.strip()
         # Ensure shell commands are not mistaken as headers
         if cleaned_text.startswith("!/") or cleaned_text.startswith("#!"):
@@ -231,7 +1438,73 @@ class MarkdownChunker:
         return cleaned_text
 
     @base_error_handler
-    def identify_sections(self, page_content: str, page_metadata: dict[str, Any]) -> list[dict[str, Any]]:
+    def lex_blocks(self, content: str) -> list[MarkdownBlock]:
+        """
+        Split markdown content into typed blocks in a single pass over its lines.
+
+        Fences are recognized on lines stripped of surrounding whitespace and run until a line equal to the opening
+        fence marker; headings are only recognized outside fences. Consecutive non-blank lines form a paragraph block,
+        or a list block if the first of them is a list item.
+
+        Args:
+            content (str): The markdown content.
+
+        Returns:
+            list[MarkdownBlock]: Blocks covering every line of the content, in order.
+        """
+        blocks = []
+        kind = None  # Kind of the block being built, None if there is none
+        block_start = fence = None
+
+        def emit(block_end: int, closed: bool = True) -> None:
+            blocks.append(
+                MarkdownBlock(
+                    kind, block_start, block_end, content[block_start:block_end], fence=fence or "", closed=closed
+                )
+            )
+
+        pos = 0
+        content_length = len(content)
+        while True:
+            newline = content.find("\n", pos)
+            line_end = content_length if newline == -1 else newline
+            stripped_line = content[pos:line_end].strip()
+
+            if kind == "fence":
+                if stripped_line == fence:
+                    emit(line_end)
+                    kind = fence = None
+            elif stripped_line.startswith(("```", "~~~")):
+                if kind is not None:
+                    emit(pos - 1)
+                kind, block_start, fence = "fence", pos, stripped_line[:3]
+            elif stripped_line.startswith("#") and (header_match := self.h_pattern.match(stripped_line)):
+                if kind is not None:
+                    emit(pos - 1)
+                    kind = None
+                level = len(header_match.group(1))
+                title = header_match.group(2).strip()
+                blocks.append(MarkdownBlock("heading", pos, line_end, content[pos:line_end], level=level, title=title))
+            else:
+                line_kind = "blank"
+                if stripped_line:
+                    line_kind = "list" if self.list_item_pattern.match(stripped_line) else "paragraph"
+                continues_block = kind == line_kind or (kind in ("paragraph", "list") and line_kind != "blank")
+                if not continues_block:
+                    if kind is not None:
+                        emit(pos - 1)
+                    kind, block_start = line_kind, pos
+
+            if newline == -1:
+                break
+            pos = newline + 1
+
+        if kind is not None:
+            emit(content_length, closed=kind != "fence")
+        return blocks
+
+    @base_error_handler
+    def identify_sections(self, page_content: str, page_metadata: dict[str, Any]) -> list[Section]:
         """
         Identify the sections and headers in the provided page content.
 
@@ -240,246 +1513,204 @@ class MarkdownChunker:
             page_metadata (dict[str, Any]): Metadata of the page provided as a dictionary.
 
         Returns:
-            list[dict[str, Any]]: A list of sections, each represented as a dictionary with headers and content.
+            list[Section]: The sections of the page with their headers, content and the blocks of the content.
 
         Raises:
             ValueError: If an unclosed code block is detected.
         """
         sections = []
-        in_code_block = False
-        code_fence = ""
-        current_section = {"headers": {"h1": "", "h2": "", "h3": ""}, "content": ""}
-        accumulated_content = ""
+        headers = self._intern_headers(("", "", ""))
+        section_blocks = []
 
-        lines = page_content.split("\n")
-        for line in lines:
-            stripped_line = line.strip()
-
-            # Check for code block start/end
-            code_block_start_match = self.code_block_start_pattern.match(stripped_line)
-            if code_block_start_match:
-                fence = code_block_start_match.group(1)
-                if not in_code_block:
-                    in_code_block = True
-                    code_fence = fence
-                elif stripped_line == code_fence:
-                    in_code_block = False
-                accumulated_content += line + "\n"
-                continue
-            elif in_code_block:
-                accumulated_content += line + "\n"
+        blocks = self.lex_blocks(page_content)
+        for block in blocks:
+            if block.kind != "heading":
+                section_blocks.append(block)
                 continue
 
-            # If not in code block, check for headers
-            header_match = self.h_pattern.match(stripped_line)
-            if header_match:
-                # Process accumulated content before this header
-                if accumulated_content.strip():
-                    current_section["content"] = accumulated_content.strip()
-                    sections.append(current_section.copy())
-                    accumulated_content = ""
-                    # Reset current_section for the next section
-                    current_section = {"headers": current_section["headers"].copy(), "content": ""}
-
-                header_marker = header_match.group(1)
-                header_level = len(header_marker)
-                header_text = header_match.group(2).strip()
-                cleaned_header_text = self.clean_header_text(
-                    self.inline_code_pattern.sub(r"<code>\1</code>", header_text)
-                )
+            # Process accumulated content before this header
+            self._append_section(sections, page_content, section_blocks, headers)
+            section_blocks = []
 
-                # Update headers after cleaning
-                if header_level == 1:
-                    current_section["headers"]["h1"] = cleaned_header_text
-                    current_section["headers"]["h2"] = ""
-                    current_section["headers"]["h3"] = ""
-                elif header_level == 2:
-                    current_section["headers"]["h2"] = cleaned_header_text
-                    current_section["headers"]["h3"] = ""
-                elif header_level == 3:
-                    current_section["headers"]["h3"] = cleaned_header_text
-
-                # Update validator counts
-                self.validator.increment_total_headings(f"h{header_level}", cleaned_header_text)
-            else:
-                accumulated_content += line + "\n"
+            cleaned_header_text = self.clean_header_text(self.inline_code_pattern.sub(r"<code>\1</code>", block.title))
+
+            # Update headers after cleaning
+            if block.level == 1:
+                headers = self._intern_headers((cleaned_header_text, "", ""))
+            elif block.level == 2:
+                headers = self._intern_headers((headers[0], cleaned_header_text, ""))
+            elif block.level == 3:
+                headers = self._intern_headers((headers[0], headers[1], cleaned_header_text))
+
+            # Update validator counts
+            self.validator.increment_total_headings(f"h{block.level}", cleaned_header_text)
 
         # Process any remaining content
-        if accumulated_content.strip():
-            current_section["content"] = accumulated_content.strip()
-            sections.append(current_section.copy())
+        self._append_section(sections, page_content, section_blocks, headers)
 
         # Check for unclosed code block
-        if in_code_block:
+        if blocks and blocks[-1].kind == "fence" and not blocks[-1].closed:
             self.validator.add_validation_error("Unclosed code block detected.")
 
         return sections
 
+    def _append_section(
+        self,
+        sections: list[Section],
+        page_content: str,
+        blocks: list[MarkdownBlock],
+        headers: tuple[str, str, str],
+    ) -> None:
+        if not blocks:
+            return
+        raw_content = page_content[blocks[0].start : blocks[-1].end]
+        content = raw_content.strip()
+        if not content:
+            return
+        offset = blocks[0].start + len(raw_content) - len(raw_content.lstrip())
+        section_blocks = [rebased for block in blocks if (rebased := block.rebase(offset, len(content)))]
+        sections.append(Section(headers, content, section_blocks))
+
     @base_error_handler
-    def create_chunks(self, sections: list[dict[str, Any]], page_metadata: dict[str, Any]) -> list[dict[str, Any]]:
+    def create_chunks(self, sections: list[Section], page_metadata: dict[str, Any]) -> list[Chunk]:
         """
         Create chunks from sections and adjust them according to page metadata.
 
         Args:
-            sections (list[dict[str, Any]]): List of sections, where each section is a dictionary with "content" and
-            "headers".
+            sections (list[Section]): The sections of the page.
             page_metadata (dict[str, Any]): Metadata related to the page, used to enrich chunk metadata.
 
         Returns:
-            list[dict[str, Any]]: A list of adjusted and enriched chunks with ids, metadata, and data.
+            list[Chunk]: The adjusted chunks with their ids, page metadata and the token IDs of the text.
 
         Raises:
             CustomException: If validation or adjustment fails during the chunk creation process.
         """
+        start_time = time.perf_counter()
         page_chunks = []
         for section in sections:
-            section_chunks = self._split_section(section["content"], section["headers"])
+            section_chunks = self._split_section(section.content, section.headers, section.blocks)
             page_chunks.extend(section_chunks)
+        adjusting_start_time = time.perf_counter()
+        self.timings.add("splitting", adjusting_start_time - start_time)
 
         # Adjust chunks for the entire page
         adjusted_chunks = self._adjust_chunks(page_chunks)
-
-        final_chunks = []
-        for chunk in adjusted_chunks:
-            chunk_id = str(self._generate_chunk_id())
-            token_count = self._calculate_tokens(chunk["content"])
-            self.validator.add_chunk(token_count)
-            metadata = self._create_metadata(page_metadata, token_count)
-            new_chunk = {
-                "chunk_id": chunk_id,
-                "metadata": metadata,
-                "data": {"headers": chunk["headers"], "text": chunk["content"]},
-            }
-            final_chunks.append(new_chunk)
+        overlap_start_time = time.perf_counter()
+        self.timings.add("adjusting", overlap_start_time - adjusting_start_time)
+
+        source_url = page_metadata.get("sourceURL", "")
+        page_title = page_metadata.get("title", "")
+        page_token_ids = tokenizers.encode_ordinary_batch([chunk.text for chunk in adjusted_chunks])
+        for chunk, token_ids in zip(adjusted_chunks, page_token_ids, strict=True):
+            chunk.token_ids = array("I", token_ids)
+            chunk.token_count = len(chunk.token_ids)
+            chunk.source_url = source_url
+            chunk.page_title = page_title
+            self.validator.add_chunk(chunk.token_count)
 
         # After chunks are created, update headings preserved
-        for chunk in final_chunks:
-            headers = chunk["data"]["headers"]
-            for level in ["h1", "h2", "h3"]:
-                heading_text = headers.get(level)
+        for chunk in adjusted_chunks:
+            for level, heading_text in zip(HEADER_LEVELS, chunk.headers, strict=True):
                 if heading_text:
                     self.validator.add_preserved_heading(level, heading_text)
 
-        # Add overlap as the final step
-        self._add_overlap(final_chunks)
-        return final_chunks
+        # Add overlap as the final step, then derive the IDs from the final text
+        self._add_overlap(adjusted_chunks)
+        for chunk in adjusted_chunks:
+            chunk.chunk_id = str(self._generate_chunk_id(chunk.source_url, chunk.header_dict(), chunk.text))
+        self.timings.add("overlap", time.perf_counter() - overlap_start_time)
+        return adjusted_chunks
 
     @base_error_handler
-    def _split_section(self, content: str, headers: dict[str, str]) -> list[dict[str, Any]]:  # noqa: C901
+    def _split_section(
+        self, content: str, headers: tuple[str, str, str], blocks: list[MarkdownBlock] | None = None
+    ) -> list[Chunk]:
         """
         Split the content into sections based on headers and code blocks.
 
         Args:
             content (str): The content to be split.
-            headers (dict[str, str]): The headers associated with each content chunk.
+            headers (tuple[str, str, str]): The h1-h3 headers shared by every chunk of the content.
+            blocks (list[MarkdownBlock] | None): The blocks of `content` if already lexed. Defaults to None.
 
         Returns:
-            list[dict[str, Any]]: A list of dictionaries, each containing 'headers' and 'content'.
+            list[Chunk]: The chunks of the content, without token counts or page metadata yet.
 
         Raises:
             ValidationError: If an unclosed code block is detected.
         """
-        # TODO: refactor this method to reduce complexity
-        # Current complexity is necessary for accurate content splitting
         chunks = []
-        current_chunk = {"headers": headers.copy(), "content": ""}
-        lines = content.split("\n")
-        in_code_block = False
-        code_fence = ""
-        code_block_content = ""
-
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            stripped_line = line.rstrip()
-
-            # Check for code block start/end
-            code_block_start_match = self.code_block_start_pattern.match(stripped_line)
-            if code_block_start_match:
-                fence = code_block_start_match.group(1)
-                if not in_code_block:
-                    in_code_block = True
-                    code_fence = fence
-                    code_block_content = line + "\n"
-                elif stripped_line == code_fence:
-                    code_block_content += line + "\n"
-                    in_code_block = False
-
-                    # Code block has ended; decide where to place it
-                    code_block_tokens = self._calculate_tokens(code_block_content)
-                    if code_block_tokens > 2 * self.max_tokens:
-                        # Split the code block
-                        split_code_blocks = self._split_code_block(code_block_content, code_fence)
-                        for code_chunk in split_code_blocks:
-                            code_chunk = code_chunk.strip()
-                            if not code_chunk:
-                                continue
-                            # Wrap code chunk with code fence
-                            code_chunk_content = f"{code_fence}\n{code_chunk}\n{code_fence}\n"
-                            potential_chunk_content = current_chunk["content"] + code_chunk_content
-                            token_count = self._calculate_tokens(potential_chunk_content)
-                            if token_count <= 2 * self.max_tokens:
-                                current_chunk["content"] = potential_chunk_content
-                            else:
-                                if current_chunk["content"].strip():
-                                    chunks.append(current_chunk.copy())
-                                current_chunk = {"headers": headers.copy(), "content": code_chunk_content}
-                    else:
-                        # Decide whether to add to current chunk or start a new one
-                        potential_chunk_content = current_chunk["content"] + code_block_content
-                        token_count = self._calculate_tokens(potential_chunk_content)
-                        if token_count <= 2 * self.max_tokens:
-                            current_chunk["content"] = potential_chunk_content
-                        else:
-                            if current_chunk["content"].strip():
-                                chunks.append(current_chunk.copy())
-                            current_chunk = {"headers": headers.copy(), "content": code_block_content}
-                    code_block_content = ""
-                else:
-                    # Inside code block
-                    code_block_content += line + "\n"
-                i += 1
-                continue
-
-            elif in_code_block:
-                code_block_content += line + "\n"
-                i += 1
+        current_chunk = TokenAccumulator(self._calculate_tokens)
+        if blocks is None:
+            blocks = self.lex_blocks(content)
+
+        for block in blocks:
+            if block.kind == "fence":
+                code_block_content = block.text + "\n"
+                if not block.closed:
+                    self.validator.add_validation_error("Unclosed code block detected.")
+                    # Add remaining code block content to current_chunk
+                    current_chunk.add(code_block_content)
+                    continue
+                self._add_code_block(chunks, current_chunk, block, headers)
                 continue
 
             # Handle regular lines
-            line = self.inline_code_pattern.sub(r"<code>\1</code>", line)
-            potential_chunk_content = current_chunk["content"] + line + "\n"
-            token_count = self._calculate_tokens(potential_chunk_content)
-
-            if token_count <= self.soft_token_limit:
-                current_chunk["content"] = potential_chunk_content
-            else:
-                if current_chunk["content"].strip():
-                    chunks.append(current_chunk.copy())
-                # Check if the line itself exceeds 2 * max_tokens
-                line_token_count = self._calculate_tokens(line + "\n")
-                if line_token_count > 2 * self.max_tokens:
-                    # Split the line into smaller chunks
-                    split_lines = self._split_long_line(line)
-                    for split_line in split_lines:
-                        current_chunk = {"headers": headers.copy(), "content": split_line + "\n"}
-                        chunks.append(current_chunk.copy())
-                    current_chunk = {"headers": headers.copy(), "content": ""}
-                else:
-                    current_chunk = {"headers": headers.copy(), "content": line + "\n"}
-            i += 1
-
-        # After processing all lines, check for any unclosed code block
-        if in_code_block:
-            self.validator.add_validation_error("Unclosed code block detected.")
-            # Add remaining code block content to current_chunk
-            current_chunk["content"] += code_block_content
+            for line in block.lines():
+                line = self.inline_code_pattern.sub(r"<code>\1</code>", line)
+                if not current_chunk.try_add(line + "\n", self.soft_token_limit):
+                    if current_chunk.content.strip():
+                        chunks.append(Chunk(headers, current_chunk.content))
+                    # Check if the line itself exceeds 2 * max_tokens
+                    line_token_count = current_chunk.last_fragment_tokens
+                    if line_token_count > 2 * self.max_tokens:
+                        # Split the line into smaller chunks
+                        split_lines = self._split_long_line(line)
+                        for split_line in split_lines:
+                            chunks.append(Chunk(headers, split_line + "\n"))
+                        current_chunk.reset()
+                    else:
+                        current_chunk.reset(line + "\n", line_token_count)
 
-        if current_chunk["content"].strip():
-            chunks.append(current_chunk.copy())
+        if current_chunk.content.strip():
+            chunks.append(Chunk(headers, current_chunk.content))
 
         return chunks
 
+    def _add_code_block(
+        self,
+        chunks: list[Chunk],
+        current_chunk: TokenAccumulator,
+        block: MarkdownBlock,
+        headers: tuple[str, str, str],
+    ) -> None:
+        code_block_content = block.text + "\n"
+        code_block_tokens = self._block_tokens(block)
+        if code_block_tokens > 2 * self.max_tokens:
+            # Split the code block
+            split_code_blocks = self._split_code_block(code_block_content, block.fence)
+            for code_chunk in split_code_blocks:
+                code_chunk = code_chunk.strip()
+                if not code_chunk:
+                    continue
+                # Wrap code chunk with code fence
+                code_chunk_content = f"{block.fence}\n{code_chunk}\n{block.fence}\n"
+                if not current_chunk.try_add(code_chunk_content, 2 * self.max_tokens):
+                    if current_chunk.content.strip():
+                        chunks.append(Chunk(headers, current_chunk.content))
+                    current_chunk.reset(code_chunk_content, current_chunk.last_fragment_tokens)
+        # Decide whether to add to current chunk or start a new one
+        elif not current_chunk.try_add(code_block_content, 2 * self.max_tokens, code_block_tokens):
+            if current_chunk.content.strip():
+                chunks.append(Chunk(headers, current_chunk.content))
+            current_chunk.reset(code_block_content, code_block_tokens)
+
+    def _block_tokens(self, block: MarkdownBlock) -> int:
+        if block.tokens is None:
+            block.tokens = self._calculate_tokens(block.text + "\n")
+        return block.tokens
+
     @base_error_handler
     def _split_code_block(self, code_block_content: str, code_fence: str) -> list[str]:
         """
@@ -527,17 +1758,19 @@ class MarkdownChunker:
         return chunks
 
     @base_error_handler
-    def _adjust_chunks(self, chunks: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    def _adjust_chunks(self, chunks: list[Chunk]) -> list[Chunk]:
         """
         Adjust chunks to be within the specified token limits.
 
-        Adjusts the size of the given text chunks by merging small chunks and splitting large ones.
+        Adjusts the size of the given text chunks by merging small chunks and splitting large ones. Size checks are
+        settled by the byte bound pre-check when the limit falls outside the bounds of the text and by an exact count
+        otherwise.
 
         Args:
-            chunks: A list of dictionaries, where each dictionary contains headers and content.
+            chunks: A list of chunks with their headers and text.
 
         Returns:
-            A list of dictionaries representing the adjusted chunks.
+            A list of the adjusted chunks.
 
         Raises:
             ValueError: If a chunk cannot be adjusted to meet the token requirements.
@@ -546,21 +1779,18 @@ class MarkdownChunker:
         i = 0
         while i < len(chunks):
             current_chunk = chunks[i]
-            current_tokens = self._calculate_tokens(current_chunk["content"])
             # If the chunk is too small, try to merge with adjacent chunks
-            if current_tokens < self.min_chunk_size:
+            if not self._exceeds_tokens(current_chunk.text, self.min_chunk_size - 1):
                 merged = False
                 # Try merging with the next chunk
                 if i + 1 < len(chunks):
                     next_chunk = chunks[i + 1]
-                    combined_content = current_chunk["content"] + next_chunk["content"]
-                    combined_tokens = self._calculate_tokens(combined_content)
-                    if combined_tokens <= 2 * self.max_tokens:
+                    combined_content = current_chunk.text + next_chunk.text
+                    if not self._exceeds_tokens(combined_content, 2 * self.max_tokens):
                         # Merge current and next chunk
-                        merged_chunk = {
-                            "headers": self._merge_headers(current_chunk["headers"], next_chunk["headers"]),
-                            "content": combined_content,
-                        }
+                        merged_chunk = Chunk(
+                            self._merge_headers(current_chunk.headers, next_chunk.headers), combined_content
+                        )
                         # Replace next chunk with merged chunk
                         chunks[i + 1] = merged_chunk
                         i += 1  # Skip the current chunk, continue with merged chunk
@@ -568,14 +1798,12 @@ class MarkdownChunker:
                 if not merged and adjusted_chunks:
                     # Try merging with the previous chunk
                     prev_chunk = adjusted_chunks[-1]
-                    combined_content = prev_chunk["content"] + current_chunk["content"]
-                    combined_tokens = self._calculate_tokens(combined_content)
-                    if combined_tokens <= 2 * self.max_tokens:
+                    combined_content = prev_chunk.text + current_chunk.text
+                    if not self._exceeds_tokens(combined_content, 2 * self.max_tokens):
                         # Merge previous and current chunk
-                        merged_chunk = {
-                            "headers": self._merge_headers(prev_chunk["headers"], current_chunk["headers"]),
-                            "content": combined_content,
-                        }
+                        merged_chunk = Chunk(
+                            self._merge_headers(prev_chunk.headers, current_chunk.headers), combined_content
+                        )
                         adjusted_chunks[-1] = merged_chunk
                         i += 1
                         continue
@@ -591,8 +1819,7 @@ class MarkdownChunker:
         # Now, split any chunks that exceed 2x max_tokens
         final_chunks = []
         for chunk in adjusted_chunks:
-            token_count = self._calculate_tokens(chunk["content"])
-            if token_count > 2 * self.max_tokens:
+            if self._exceeds_tokens(chunk.text, 2 * self.max_tokens):
                 split_chunks = self._split_large_chunk(chunk)
                 final_chunks.extend(split_chunks)
             else:
@@ -600,79 +1827,44 @@ class MarkdownChunker:
         return final_chunks
 
     @base_error_handler
-    def _split_large_chunk(self, chunk: dict[str, Any]) -> list[dict[str, Any]]:
+    def _split_large_chunk(self, chunk: Chunk) -> list[Chunk]:
         """
-        Split a large text chunk into smaller chunks.
+        Split a large text chunk into smaller chunks of at most 2 * max_tokens tokens.
 
         Args:
-            chunk (dict[str, Any]): A dictionary containing 'content' and 'headers' keys.
-                                    'content' is the text to split, and 'headers' are additional metadata.
+            chunk (Chunk): The chunk to split.
 
         Returns:
-            list[dict[str, Any]]: A list of dictionaries where each dictionary contains a portion of the original
-            content
-                                  and a copy of the headers.
+            list[Chunk]: Chunks holding consecutive portions of the original text, with the same headers.
 
         Raises:
-            KeyError: If 'content' or 'headers' keys are not found in the chunk dictionary.
-            Any other exceptions raised by self._calculate_tokens method.
+            Any exceptions raised by self._calculate_tokens method.
         """
-        content = chunk["content"]
-        headers = chunk["headers"]
-        lines = content.split("\n")
-
-        chunks = []
-        current_chunk_content = ""
-        for line in lines:
-            potential_chunk_content = current_chunk_content + line + "\n"
-            token_count = self._calculate_tokens(potential_chunk_content)
-            if token_count <= 2 * self.max_tokens:
-                current_chunk_content = potential_chunk_content
-            else:
-                if current_chunk_content.strip():
-                    new_chunk = {"headers": headers.copy(), "content": current_chunk_content.strip()}
-                    chunks.append(new_chunk)
-                current_chunk_content = line + "\n"
-
-        if current_chunk_content.strip():
-            new_chunk = {"headers": headers.copy(), "content": current_chunk_content.strip()}
-            chunks.append(new_chunk)
-
-        return chunks
+        pieces = self._split_by_tokens(chunk.text, 2 * self.max_tokens, strip=True)
+        return [Chunk(chunk.headers, piece) for piece in pieces]
 
     @base_error_handler
-    def _merge_headers(self, headers1: dict[str, str], headers2: dict[str, str]) -> dict[str, str]:
+    def _merge_headers(self, headers1: tuple[str, str, str], headers2: tuple[str, str, str]) -> tuple[str, str, str]:
         """
-        Merge two headers dictionaries by levels.
+        Merge two header tuples by levels.
 
         Args:
-            headers1 (dict[str, str]): The first headers dictionary.
-            headers2 (dict[str, str]): The second headers dictionary.
+            headers1 (tuple[str, str, str]): The first h1-h3 headers.
+            headers2 (tuple[str, str, str]): The second h1-h3 headers.
 
         Returns:
-            dict[str, str]: The merged headers dictionary with levels "h1", "h2", and "h3".
+            tuple[str, str, str]: The merged headers, taking each level from the first tuple if it is set.
         """
-        merged = {}
-        for level in ["h1", "h2", "h3"]:
-            header1 = headers1.get(level, "").strip()
-            header2 = headers2.get(level, "").strip()
-            if header1:
-                merged[level] = header1
-            elif header2:
-                merged[level] = header2
-            else:
-                merged[level] = ""
-        return merged
+        merged = tuple(header1.strip() or header2.strip() for header1, header2 in zip(headers1, headers2, strict=True))
+        return self._intern_headers(merged)
 
     @base_error_handler
-    def _add_overlap(
-        self, chunks: list[dict[str, Any]], min_overlap_tokens: int = 50, max_overlap_tokens: int = 100
-    ) -> None:
+    def _add_overlap(self, chunks: list[Chunk], min_overlap_tokens: int = 50, max_overlap_tokens: int = 100) -> None:
         """
         Add overlap to chunks of text based on specified token limits.
 
         Args:
-            chunks (list[dict[str, Any]]): List of text chunks with metadata.
+            chunks (list[Chunk]): List of text chunks with metadata.
             min_overlap_tokens (int): Minimum number of tokens for the overlap.
             max_overlap_tokens (int): Maximum number of tokens for the overlap.
 
@@ -685,33 +1877,40 @@ class MarkdownChunker:
         for i in range(1, len(chunks)):
             prev_chunk = chunks[i - 1]
             curr_chunk = chunks[i]
-            prev_chunk_text = prev_chunk["data"]["text"]
+            prev_token_ids = self._chunk_token_ids(prev_chunk)
 
             # Calculate overlap tokens
-            overlap_token_count = max(
-                int(self._calculate_tokens(prev_chunk_text) * self.overlap_percentage), min_overlap_tokens
-            )
+            overlap_token_count = max(int(len(prev_token_ids) * self.overlap_percentage), min_overlap_tokens)
             overlap_token_count = min(overlap_token_count, max_overlap_tokens)
 
             # Ensure that adding overlap does not exceed max_tokens
-            current_chunk_token_count = curr_chunk["metadata"]["token_count"]
+            current_chunk_token_count = curr_chunk.token_count
             available_space = self.max_tokens - current_chunk_token_count
             allowed_overlap_tokens = min(overlap_token_count, available_space)
             if allowed_overlap_tokens <= 0:
                 # Cannot add overlap without exceeding max_tokens
                 self.validator.add_validation_error(
-                    f"Cannot add overlap to chunk {curr_chunk['chunk_id']} without exceeding max_tokens"
+                    f"Cannot add overlap to chunk {i} of {curr_chunk.source_url} without exceeding max_tokens"
                 )
                 continue
 
-            overlap_text = self._get_last_n_tokens(prev_chunk_text, allowed_overlap_tokens)
-            additional_tokens = self._calculate_tokens(overlap_text)
-            curr_chunk["data"]["text"] = overlap_text + curr_chunk["data"]["text"]
-            curr_chunk["metadata"]["token_count"] += additional_tokens
+            # The overlap is a slice of the previous chunk's tokens, prepended to the current chunk's tokens
+            overlap_token_ids = prev_token_ids[-allowed_overlap_tokens:]
+            curr_chunk.text = self.tokenizer.decode(overlap_token_ids) + curr_chunk.text
+            curr_chunk.token_ids = overlap_token_ids + self._chunk_token_ids(curr_chunk)
+            curr_chunk.token_count += len(overlap_token_ids)
+
+    def _chunk_token_ids(self, chunk: Chunk) -> array:
+        if chunk.token_ids is None:
+            chunk.token_ids = self._encode(chunk.text)
+        return chunk.token_ids
+
+    def _encode(self, text: str) -> array:
+        return array("I", self.tokenizer.encode_ordinary(text))
 
     def _split_long_line(self, line: str) -> list[str]:
         """
-        Split a long line of text into smaller chunks based on token limits.
+        Split a long line of text into smaller chunks of at most 2 * max_tokens tokens, preferring sentence ends.
 
         Args:
             line (str): The line of text to be split.
@@ -719,66 +1918,223 @@ class MarkdownChunker:
         Returns:
             list[str]: A list containing the smaller chunks of text.
         """
-        tokens = self.tokenizer.encode(line)
-        max_tokens_per_chunk = 2 * self.max_tokens
-        chunks = []
-        for i in range(0, len(tokens), max_tokens_per_chunk):
-            chunk_tokens = tokens[i : i + max_tokens_per_chunk]
-            chunk_text = self.tokenizer.decode(chunk_tokens)
-            chunks.append(chunk_text)
-        return chunks
+        return self._split_by_tokens(line, 2 * self.max_tokens)
+
+    def _split_by_tokens(self, text: str, limit: int, strip: bool = False) -> list[str]:
+        """
+        Split a text into pieces of at most `limit` tokens, cutting at the last line or sentence boundary that fits.
+
+        The text is encoded once and a map from token to character offsets drives the cuts in a single pass: each
+        piece ends at the last line boundary within `limit` tokens of its start, at the last sentence boundary if there
+        is none, or after `limit` tokens otherwise. The pieces are then counted on their own in one batch, and a piece
+        is cut shorter in the rare case that it takes more tokens alone than as part of the text.
 
-    def _get_last_n_tokens(self, text: str, n: int) -> str:
+        Args:
+            text (str): The text to split.
+            limit (int): Maximum number of tokens per piece.
+            strip (bool): Whether to strip surrounding whitespace from the pieces. Defaults to False.
+
+        Returns:
+            list[str]: The non-empty pieces, in order.
+        """
+        token_ids = self.tokenizer.encode_ordinary(text)
+        text, offsets = self._token_offsets(text, token_ids)
+        line_boundaries, sentence_boundaries = self._token_boundaries(text, offsets)
+        token_count = len(token_ids)
+
+        def piece_text(start: int, end: int) -> str:
+            piece = text[offsets[start] : offsets[end]]
+            return piece.strip() if strip else piece
+
+        pieces = []
+        start = 0
+        while start < token_count:
+            # Cut the rest of the text, then count all pieces in one batch
+            spans = []
+            cut = start
+            while cut < token_count:
+                end = min(cut + limit, token_count)
+                if end < token_count:
+                    end = (
+                        self._last_boundary(line_boundaries, cut, end)
+                        or self._last_boundary(sentence_boundaries, cut, end)
+                        or end
+                    )
+                spans.append((cut, end))
+                cut = end
+            texts = [piece_text(cut, end) for cut, end in spans]
+
+            start = token_count
+            for (cut, end), piece, count in zip(spans, texts, tokenizers.count_batch(texts), strict=True):
+                if count > limit and end - cut > 1:
+                    # The piece takes more tokens alone than as part of the text: shorten it and cut the rest again
+                    while count > limit and end - cut > 1:
+                        end = max(cut + 1, end - (count - limit))
+                        piece = piece_text(cut, end)
+                        count = tokenizers.count(piece)
+                    start = end
+                if piece:
+                    pieces.append(piece)
+                if start != token_count:
+                    break
+        return pieces
+
+    def _token_offsets(self, text: str, token_ids: list[int]) -> tuple[str, list[int]]:
         """
-        Get the last n tokens from the given text.
+        Map every token of an encoded text to the offset of its first character.
 
         Args:
-            text (str): The text to tokenize.
-            n (int): The number of tokens to retrieve from the end of the text.
+            text (str): The encoded text.
+            token_ids (list[int]): The token IDs of the text.
 
         Returns:
-            str: The decoded string of the last n tokens.
+            tuple[str, list[int]]: The decoded text, which only differs from `text` if it held lone surrogates, and
+            the character offset of every token followed by the length of the text.
+        """
+        if text.isascii():
+            return text, [0, *accumulate(map(len, self.tokenizer.decode_tokens_bytes(token_ids)))]
+        text, offsets = self.tokenizer.decode_with_offsets(token_ids)
+        offsets.append(len(text))
+        return text, offsets
 
-        Raises:
-            ValueError: If n is greater than the number of tokens in the text.
+    def _token_boundaries(self, text: str, offsets: list[int]) -> tuple[list[int], list[int]]:
+        """
+        Find the token positions where a text may be cut at a line or sentence boundary.
+
+        Position `i` is the boundary between token `i - 1` and token `i`. It is a line boundary if a newline ends
+        the text before it or starts the text after it, and a sentence boundary if it follows ".", "!" or "?" and
+        precedes whitespace.
+
+        Args:
+            text (str): The encoded text.
+            offsets (list[int]): Character offset of every token followed by the length of the text.
+
+        Returns:
+            tuple[list[int], list[int]]: The sorted line boundaries and sentence boundaries.
+        """
+
+        def token_positions(char_positions: Iterable[int]) -> list[int]:
+            positions = []
+            for char_position in char_positions:
+                i = bisect_left(offsets, char_position)
+                if i < len(offsets) and offsets[i] == char_position and (not positions or positions[-1] < i):
+                    positions.append(i)
+            return positions
+
+        newlines = (match.start() + shift for match in re.finditer("\n", text) for shift in (0, 1))
+        sentence_ends = (match.end() for match in self.sentence_end_pattern.finditer(text))
+        return token_positions(newlines), token_positions(sentence_ends)
+
+    @staticmethod
+    def _last_boundary(boundaries: list[int], start: int, end: int) -> int:
         """
-        tokens = self.tokenizer.encode(text)
-        last_n_tokens = tokens[-n:]
-        return self.tokenizer.decode(last_n_tokens)
+        Return the last boundary after `start` and at or before `end`, or 0 if there is none.
+
+        Args:
+            boundaries (list[int]): Sorted token positions.
+            start (int): Exclusive lower bound.
+            end (int): Inclusive upper bound.
+
+        Returns:
+            int: The last boundary in range, or 0.
+        """
+        i = bisect_right(boundaries, end) - 1
+        return boundaries[i] if i >= 0 and boundaries[i] > start else 0
 
     @base_error_handler
-    def save_chunks(self, chunks: list[dict[str, Any]]):
+    def save_chunks(self, chunks: Iterable[Chunk | dict[str, Any]]) -> str:
         """
-        Save the given chunks to a JSON file.
+        Save the given chunks to a JSONL file, one chunk per line.
+
+        Chunks are written as they are consumed, so passing the iterator returned by `iter_chunks` writes each page's
+        chunks as soon as they are produced. The file is written under a temporary name and moved into place at the
+        end, so readers never see a partial file. Once the file is in place, the chunk manifest is updated in
+        incremental mode and the chunk digest index if `dedup_index` is set. With `save_token_ids`, the token IDs of
+        the chunks are written to a `-chunked.tokens.bin` sidecar file in the same order.
 
         Args:
-            chunks (list of dict): A list of dictionaries containing chunk data.
+            chunks (Iterable[Chunk | dict[str, Any]]): The chunks to save, either as `Chunk` objects or already in
+                their JSON shape.
+
+        Returns:
+            str: The path of the saved `-chunked.jsonl` file.
 
         Raises:
             Exception: If an error occurs while saving the chunks to the file.
         """
-        input_name = os.path.splitext(self.input_filename)[0]  # Remove the extension
-        output_filename = f"{input_name}-chunked.json"
-        output_filepath = os.path.join(self.output_dir, output_filename)
-        with open(output_filepath, "w", encoding="utf-8") as f:
-            json.dump(chunks, f, indent=2)
-        logger.info(f"Chunks saved to {output_filepath}")
+        output_filepath = self._output_filepath()
+        temp_filepath = f"{output_filepath}.tmp"
+        token_ids_filepath = f"{os.path.splitext(output_filepath)[0]}.tokens.bin"
+        saved_chunks = 0
+        position = 0
+        start_time = time.perf_counter()
+        chunks = _TimedIterator(chunks)
+        with (
+            open(temp_filepath, "wb") as f,
+            open(f"{token_ids_filepath}.tmp", "wb") if self.save_token_ids else nullcontext() as token_ids_file,
+        ):
+            for chunk in chunks:
+                if isinstance(chunk, dict):
+                    chunk = Chunk.from_dict(chunk)
+                line = (json.dumps(chunk.to_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+                f.write(line)
+                if self.manifest is not None:
+                    # The chunks of a page are consecutive, so their lines form one range
+                    self._page_byte_ranges.setdefault(chunk.source_url, [position, position])[1] = position + len(line)
+                position += len(line)
+                saved_chunks += 1
+                if token_ids_file is not None:
+                    self._write_token_ids(token_ids_file, chunk)
+        os.replace(temp_filepath, output_filepath)
+        logger.info(f"{saved_chunks} chunks saved to {output_filepath}")
+        if self.save_token_ids:
+            os.replace(f"{token_ids_filepath}.tmp", token_ids_filepath)
+            logger.info(f"Token IDs of {saved_chunks} chunks saved to {token_ids_filepath}")
+        if self.manifest is not None:
+            self._update_manifest(os.path.basename(output_filepath))
+        if self.digest_index is not None:
+            self.digest_index.save(replace=True)
+        self.timings.add("write", time.perf_counter() - start_time - chunks.seconds)
+        return output_filepath
+
+    def _write_token_ids(self, f, chunk: Chunk) -> None:
+        token_ids = self._chunk_token_ids(chunk)  # Chunks reused from a previous run are encoded here
+        chunk.token_ids = None
+        if sys.byteorder == "big":
+            token_ids = array("I", token_ids)
+            token_ids.byteswap()
+        f.write(uuid.UUID(chunk.chunk_id).bytes)
+        f.write(len(token_ids).to_bytes(4, "little"))
+        token_ids.tofile(f)
+
+    def _output_filepath(self) -> str:
+        return _chunked_filepath(self.input_filename, self.output_dir)
 
     @base_error_handler
-    def _generate_chunk_id(self) -> uuid.UUID:
+    def _generate_chunk_id(self, source_url: str, headers: dict[str, str], text: str) -> uuid.UUID:
         """
-        Generate a new UUID for chunk identification.
+        Generate a content-addressed UUID for chunk identification.
+
+        The ID is derived from the source URL, the header path and a hash of the chunk text, so re-chunking an
+        unchanged page yields the same IDs and only new or changed chunks are embedded again.
+
+        Args:
+            source_url (str): URL of the page the chunk comes from.
+            headers (dict[str, str]): The h1-h3 headers of the chunk.
+            text (str): The final text of the chunk.
 
         Returns:
-            uuid.UUID: A new unique identifier for the chunk.
+            uuid.UUID: A deterministic identifier for the chunk.
 
         """
-        return uuid.uuid4()
+        header_path = "\x1f".join(headers.get(level, "") for level in ("h1", "h2", "h3"))
+        content_hash = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+        return uuid.uuid5(uuid.NAMESPACE_URL, "\n".join((source_url, header_path, content_hash)))
 
     @base_error_handler
     def _calculate_tokens(self, text: str) -> int:
         """
-        Calculate the number of tokens in a given text.
+        Calculate the number of tokens in a given text, using the shared token count cache.
 
         Args:
             text (str): The input text to be tokenized.
@@ -789,30 +2145,153 @@ class MarkdownChunker:
         Raises:
             TokenizationError: If there is an error during tokenization.
         """
-        token_count = len(self.tokenizer.encode(text))
-        return token_count
+        return self.token_cache.get_or_count(text, self._encode_length)
 
-    @base_error_handler
-    def _create_metadata(self, page_metadata: dict[str, Any], token_count: int) -> dict[str, Any]:
+    def _encode_length(self, text: str) -> int:
+        return len(self.tokenizer.encode_ordinary(text))
+
+    def _exceeds_tokens(self, text: str, limit: int) -> bool:
+        exceeds = self.size_precheck.exceeds(text, limit)
+        if exceeds is None:
+            exceeds = self._calculate_tokens(text) > limit
+        return exceeds
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index that finds chunks whose text is nearly identical to one added before.
+
+    Texts are reduced to sets of word shingles and summarised by a one-permutation MinHash signature: every shingle
+    hash is assigned to one of `num_perm` bins and each bin keeps its minimum, with empty bins filled from their right
+    neighbour. Signatures are split into bands for locality sensitive hashing, so adding a text only compares it with
+    the texts sharing a band and the cost stays linear in the number of texts. Candidates are confirmed by the share of
+    equal signature values, which estimates the Jaccard similarity of the shingle sets.
+
+    Args:
+        threshold (float): Estimated Jaccard similarity at or above which two texts are near-duplicates.
+        num_perm (int): Number of MinHash values per signature. Defaults to 64.
+        shingle_size (int): Number of consecutive words per shingle. Defaults to 3.
+
+    Raises:
+        ValueError: If the threshold is not between 0 and 1.
+    """
+
+    word_pattern = re.compile(r"\w+")
+    _mask = (1 << 64) - 1
+    _empty = 1 << 32
+
+    def __init__(self, threshold: float, num_perm: int = 64, shingle_size: int = 3):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Near-duplicate threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.rows = self._band_rows(threshold, num_perm)
+        self.keys: list[str] = []
+        self.signatures: list[array] = []
+        self._bands: list[dict[int, int]] = [{} for _ in range(num_perm // self.rows)]
+
+    def __len__(self) -> int:
+        """Return the number of texts in the index."""
+        return len(self.keys)
+
+    @staticmethod
+    def _band_rows(threshold: float, num_perm: int) -> int:
+        # Texts sharing a band become candidates with probability 1 - (1 - s^r)^b, which crosses 1/2 near
+        # (1/b)^(1/r); take the longest band whose crossing point does not exceed the threshold
+        rows = 1
+        for r in range(1, num_perm + 1):
+            if (1 / (num_perm // r)) ** (1 / r) <= threshold:
+                rows = r
+        return rows
+
+    def signature(self, text: str) -> array | None:
         """
-        Create metadata dictionary for a page.
+        Compute the MinHash signature of a text.
 
         Args:
-            page_metadata (dict[str, Any]): Metadata extracted from a page.
-            token_count (int): Number of tokens in the page content.
+            text (str): The text to summarise.
 
         Returns:
-            dict[str, Any]: A dictionary containing the token count, source URL, and page title.
+            array | None: `num_perm` unsigned 32-bit values, or None if the text has fewer words than a shingle.
+        """
+        words = self.word_pattern.findall(text.lower())
+        if len(words) < self.shingle_size:
+            return None
+        mask = self._mask
+        hashes = [zlib.crc32(word.encode("utf-8", "surrogatepass")) for word in words]
+        shingles = hashes[: len(hashes) - self.shingle_size + 1]
+        for offset in range(1, self.shingle_size):
+            shingles = [
+                (shingle * 0x100000001B3 + word) & mask
+                for shingle, word in zip(shingles, hashes[offset:], strict=False)
+            ]
+
+        num_perm = self.num_perm
+        bins = [self._empty] * num_perm
+        for shingle in shingles:
+            mixed = ((shingle ^ (shingle >> 31)) * 0x9E3779B97F4A7C15) & mask
+            value = mixed >> 32
+            index = mixed % num_perm
+            if value < bins[index]:
+                bins[index] = value
+
+        # Fill empty bins from the nearest non-empty bin to the right, offset by the distance
+        filled = bins[:]
+        for index in range(num_perm):
+            distance = 1
+            while filled[index] == self._empty:
+                value = bins[(index + distance) % num_perm]
+                if value != self._empty:
+                    filled[index] = (value + distance * 0x9E3779B9) & 0xFFFFFFFF
+                distance += 1
+        return array("I", filled)
+
+    def similarity(self, first: array, second: array) -> float:
+        """
+        Estimate the Jaccard similarity of two texts from their signatures.
 
-        Raises:
-            None
+        Args:
+            first (array): Signature of the first text.
+            second (array): Signature of the second text.
+
+        Returns:
+            float: The share of equal signature values.
         """
-        metadata = {
-            "token_count": token_count,
-            "source_url": page_metadata.get("sourceURL", ""),
-            "page_title": page_metadata.get("title", ""),
-        }
-        return metadata
+        return sum(a == b for a, b in zip(first, second, strict=True)) / self.num_perm
+
+    def add(self, key: str, text: str) -> str | None:
+        """
+        Return the key of a near-duplicate of the text, or add the text to the index if there is none.
+
+        Args:
+            key (str): Identifier of the text, e.g. a chunk ID.
+            text (str): The text to look up.
+
+        Returns:
+            str | None: The key of the first indexed text similar enough to this one, or None if the text was added.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        rows = self.rows
+        band_keys = [hash(signature[i * rows : (i + 1) * rows].tobytes()) for i in range(len(self._bands))]
+
+        checked = set()
+        for band, band_key in zip(self._bands, band_keys, strict=True):
+            candidate = band.get(band_key)
+            if candidate is None or candidate in checked:
+                continue
+            checked.add(candidate)
+            if self.similarity(signature, self.signatures[candidate]) >= self.threshold:
+                return self.keys[candidate]
+
+        position = len(self.keys)
+        self.keys.append(key)
+        self.signatures.append(signature)
+        for band, band_key in zip(self._bands, band_keys, strict=True):
+            band.setdefault(band_key, position)
+        return None
 
 
 class MarkdownChunkValidator:
@@ -824,15 +2303,35 @@ class MarkdownChunkValidator:
         max_tokens (int): Maximum allowable tokens per chunk.
         output_dir (str): Directory to save output files.
         input_filename (str): Input file name for reference.
-        save (bool): Flag to indicate whether to save incorrect chunks to a file.
+        save (bool): Flag to indicate whether to save incorrect chunks and near-duplicate clusters to a file.
+        token_cache (TokenCountCache | None): Token count cache whose hit rate is reported in the summary.
+        size_precheck (ByteBoundPrecheck | None): Byte bound pre-check whose settled comparisons are reported in the
+            summary.
+        near_duplicate_threshold (float | None): Estimated Jaccard similarity at or above which a chunk is dropped as a
+            near-duplicate of an earlier one. Defaults to None, which only drops exact duplicates.
+        digest_index (ChunkDigestIndex | None): Index of the chunk texts saved from other files, owned by
+            `input_filename`. Chunks it records for another file are dropped. Defaults to None.
     """
 
-    def __init__(self, min_chunk_size, max_tokens, output_dir, input_filename, save: bool = False):
+    def __init__(
+        self,
+        min_chunk_size,
+        max_tokens,
+        output_dir,
+        input_filename,
+        save: bool = False,
+        token_cache: TokenCountCache | None = None,
+        size_precheck: ByteBoundPrecheck | None = None,
+        near_duplicate_threshold: float | None = None,
+        digest_index: ChunkDigestIndex | None = None,
+    ):
         self.min_chunk_size = min_chunk_size
         self.max_tokens = max_tokens
         self.output_dir = output_dir
         self.input_filename = input_filename
         self.save = save
+        self.token_cache = token_cache
+        self.size_precheck = size_precheck
         # Validation-related attributes
         self.validation_errors = []
         self.total_chunks = 0
@@ -842,6 +2341,11 @@ class MarkdownChunkValidator:
         self.total_headings = {"h1": set(), "h2": set(), "h3": set()}
         self.incorrect_counts = {"too_small": 0, "too_large": 0}
         self.duplicates_removed = 0
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.near_duplicate_clusters: dict[str, list[str]] = {}  # kept chunk ID -> IDs of its removed near-duplicates
+        self.near_duplicate_tokens_saved = 0
+        self.digest_index = digest_index
+        self.cross_file_duplicates_removed = 0
 
     def increment_total_headings(self, level, heading_text):
         """
@@ -892,6 +2396,51 @@ class MarkdownChunkValidator:
         self.total_tokens += token_count
         self.chunk_token_counts.append(token_count)
 
+    def export_counts(self) -> dict[str, Any]:
+        """
+        Export the counts collected so far so they can be merged into another validator.
+
+        Returns:
+            dict[str, Any]: Heading sets, chunk token statistics, validation errors, token cache and byte bound
+            pre-check counters.
+        """
+        return {
+            "total_headings": self.total_headings,
+            "headings_preserved": self.headings_preserved,
+            "total_chunks": self.total_chunks,
+            "total_tokens": self.total_tokens,
+            "chunk_token_counts": self.chunk_token_counts,
+            "validation_errors": self.validation_errors,
+            "token_cache_hits": self.token_cache.hits if self.token_cache is not None else 0,
+            "token_cache_misses": self.token_cache.misses if self.token_cache is not None else 0,
+            "prechecks_settled": self.size_precheck.settled if self.size_precheck is not None else 0,
+            "prechecks_unsettled": self.size_precheck.unsettled if self.size_precheck is not None else 0,
+        }
+
+    def merge_counts(self, counts: dict[str, Any]) -> None:
+        """
+        Merge counts exported by another validator, e.g. one running in a worker process.
+
+        Args:
+            counts (dict[str, Any]): Counts returned by `export_counts`.
+
+        Returns:
+            None
+        """
+        for level in ["h1", "h2", "h3"]:
+            self.total_headings[level].update(counts["total_headings"][level])
+            self.headings_preserved[level].update(counts["headings_preserved"][level])
+        self.total_chunks += counts["total_chunks"]
+        self.total_tokens += counts["total_tokens"]
+        self.chunk_token_counts.extend(counts["chunk_token_counts"])
+        self.validation_errors.extend(counts["validation_errors"])
+        if self.token_cache is not None:
+            self.token_cache.hits += counts["token_cache_hits"]
+            self.token_cache.misses += counts["token_cache_misses"]
+        if self.size_precheck is not None:
+            self.size_precheck.settled += counts["prechecks_settled"]
+            self.size_precheck.unsettled += counts["prechecks_unsettled"]
+
     def add_validation_error(self, error_message):
         """
         Add a validation error message to the validation errors list.
@@ -920,17 +2469,52 @@ class MarkdownChunkValidator:
         Raises:
             ValidationError: If duplicates or incorrect chunks are found.
         """
-        self.validate_duplicates(chunks)
-        self.find_incorrect_chunks(chunks, save=self.save)
+        chunks[:] = list(self.validate_stream(chunks))
+
+    def validate_stream(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        """
+        Validate chunks as they are produced, yielding only the ones that are not duplicates.
+
+        Duplicates are tracked by a digest of the chunk text (and a MinHash signature if `near_duplicate_threshold` is
+        set), so the stream never holds on to earlier chunks. Incorrect chunks are counted (and saved if `save` is set)
+        and the summary is logged once the stream is exhausted.
+
+        Args:
+            chunks (Iterable[Chunk]): The chunks to validate.
+
+        Yields:
+            Chunk: The chunks that are not duplicates of an earlier chunk, in order.
+        """
+        incorrect = {"too_small": [], "too_large": []}
+        self.incorrect_counts = {"too_small": 0, "too_large": 0}
+        unique_chunks = 0
+        for chunk in self._drop_duplicates(chunks):
+            unique_chunks += 1
+            kind = self._incorrect_kind(chunk)
+            if kind:
+                self.incorrect_counts[kind] += 1
+                if self.save:
+                    incorrect[kind].append(self._incorrect_entry(chunk))
+            yield chunk
+
+        self.total_chunks = unique_chunks
+        if any(self.incorrect_counts.values()):
+            if self.save:
+                self._save_incorrect_chunks(incorrect)
+        else:
+            logger.info("No incorrect chunks found.")
+        if self.near_duplicate_clusters and self.save:
+            self._save_near_duplicate_clusters()
         self.log_summary()
 
-    def validate_duplicates(self, chunks: list[dict[str, Any]]) -> None:
+    def validate_duplicates(self, chunks: list[Chunk]) -> None:
         """
         Validate and remove duplicate chunks based on the text content.
 
+        Near-duplicates are removed as well if `near_duplicate_threshold` is set.
+
         Args:
-            chunks (list[dict[str, Any]]): The list of chunks where each chunk is a dictionary
-                containing text data under the "data" key.
+            chunks (list[Chunk]): The list of chunks.
 
         Returns:
             None
@@ -938,22 +2522,31 @@ class MarkdownChunkValidator:
         Raises:
             None
         """
-        unique_chunks = {}
-        cleaned_chunks = []
+        chunks[:] = list(self._drop_duplicates(chunks))
+        self.total_chunks = len(chunks)
+
+    def _drop_duplicates(self, chunks: Iterable[Chunk]) -> Iterator[Chunk]:
+        seen_digests = set()
+        index = NearDuplicateIndex(self.near_duplicate_threshold) if self.near_duplicate_threshold else None
         for chunk in chunks:
-            text = chunk["data"]["text"]
-            if text in unique_chunks:
+            digest = ChunkDigestIndex.digest(chunk.text)
+            if digest in seen_digests:
                 self.duplicates_removed += 1
-                # Log the duplicate chunk removal
                 continue
-            else:
-                unique_chunks[text] = True
-                cleaned_chunks.append(chunk)
+            seen_digests.add(digest)
+            if self.digest_index is not None and self.digest_index.owned_elsewhere(digest, self.input_filename):
+                self.cross_file_duplicates_removed += 1
+                continue
 
-        # Update the chunks list to the cleaned_chunks without duplicates
-        chunks.clear()
-        chunks.extend(cleaned_chunks)
-        self.total_chunks = len(chunks)
+            if index is not None:
+                kept_chunk_id = index.add(chunk.chunk_id, chunk.text)
+                if kept_chunk_id is not None:
+                    self.near_duplicate_clusters.setdefault(kept_chunk_id, []).append(chunk.chunk_id)
+                    self.near_duplicate_tokens_saved += chunk.token_count
+                    continue
+            if self.digest_index is not None:
+                self.digest_index.claim(digest, self.input_filename)
+            yield chunk
 
     def log_summary(self):
         """
@@ -973,6 +2566,14 @@ class MarkdownChunkValidator:
 
         # Duplicate chunks removed
         logger.warning(f"Duplicate chunks removed: {self.duplicates_removed}")
+        if self.near_duplicate_threshold:
+            near_duplicates = sum(len(removed) for removed in self.near_duplicate_clusters.values())
+            logger.warning(
+                f"Near-duplicate chunks removed: {near_duplicates} in {len(self.near_duplicate_clusters)} clusters, "
+                f"saving {self.near_duplicate_tokens_saved} tokens"
+            )
+        if self.digest_index is not None:
+            logger.warning(f"Chunks already saved from other files removed: {self.cross_file_duplicates_removed}")
 
         # Chunk statistics
         if self.chunk_token_counts:
@@ -1014,12 +2615,27 @@ class MarkdownChunkValidator:
         )
         logger.info(incorrect_chunks_info)
 
-    def find_incorrect_chunks(self, chunks: list[dict[str, Any]], save: bool = False) -> None:
+        # Token count cache summary
+        if self.token_cache is not None:
+            logger.info(
+                f"Token count cache - Hits: {self.token_cache.hits}, Misses: {self.token_cache.misses}, "
+                f"Hit rate: {self.token_cache.hit_rate:.2%}"
+            )
+
+        # Byte bound pre-check summary
+        if self.size_precheck is not None:
+            logger.info(
+                f"Byte bound pre-check - Size checks settled without an exact count: {self.size_precheck.settled}, "
+                f"Counted exactly: {self.size_precheck.unsettled} "
+                f"({self.size_precheck.settled_rate:.2%} settled)"
+            )
+
+    def find_incorrect_chunks(self, chunks: list[Chunk], save: bool = False) -> None:
         """
         Identify chunks that are too small or too large and optionally save them to a file.
 
         Args:
-            chunks (list[dict[str, Any]]): List of chunk dictionaries containing metadata and data for each chunk.
+            chunks (list[Chunk]): List of chunks.
             save (bool, optional): If True, save the incorrect chunks to a file. Defaults to False.
 
         Returns:
@@ -1028,76 +2644,405 @@ class MarkdownChunkValidator:
         Raises:
             None
         """
-        incorrect = {
-            "too_small": [
-                {
-                    "id": c["chunk_id"],
-                    "size": c["metadata"]["token_count"],
-                    "headers": c["data"]["headers"],
-                    "text": c["data"]["text"],
-                }
-                for c in chunks
-                if c["metadata"]["token_count"] < self.min_chunk_size
-            ],
-            "too_large": [
-                {
-                    "id": c["chunk_id"],
-                    "size": c["metadata"]["token_count"],
-                    "headers": c["data"]["headers"],
-                    "text": c["data"]["text"],
-                }
-                for c in chunks
-                if c["metadata"]["token_count"] > 2 * self.max_tokens
-            ],
-        }
+        incorrect = {"too_small": [], "too_large": []}
+        for chunk in chunks:
+            kind = self._incorrect_kind(chunk)
+            if kind:
+                incorrect[kind].append(self._incorrect_entry(chunk))
 
         # Store counts for logging summary
         self.incorrect_counts = {"too_small": len(incorrect["too_small"]), "too_large": len(incorrect["too_large"])}
 
         if any(incorrect.values()):
-
             if save:
-                base_name = os.path.splitext(self.input_filename)[0]
-                output_filename = f"{base_name}-incorrect-chunks.json"
-                output_filepath = os.path.join(self.output_dir, output_filename)
-                with open(output_filepath, "w", encoding="utf-8") as f:
-                    json.dump(incorrect, f, indent=2, ensure_ascii=False)
-                logger.info(f"Incorrect chunks saved to {output_filepath}")
-            else:
-                pass
+                self._save_incorrect_chunks(incorrect)
         else:
             logger.info("No incorrect chunks found.")
 
+    def _incorrect_kind(self, chunk: Chunk) -> str | None:
+        token_count = chunk.token_count
+        if token_count < self.min_chunk_size:
+            return "too_small"
+        if token_count > 2 * self.max_tokens:
+            return "too_large"
+        return None
+
+    @staticmethod
+    def _incorrect_entry(chunk: Chunk) -> dict[str, Any]:
+        return {
+            "id": chunk.chunk_id,
+            "size": chunk.token_count,
+            "headers": chunk.header_dict(),
+            "text": chunk.text,
+        }
+
+    def _save_incorrect_chunks(self, incorrect: dict[str, list[dict[str, Any]]]) -> None:
+        base_name = os.path.splitext(os.path.basename(self.input_filename))[0]
+        output_filename = f"{base_name}-incorrect-chunks.json"
+        output_filepath = os.path.join(self.output_dir, output_filename)
+        with open(output_filepath, "w", encoding="utf-8") as f:
+            json.dump(incorrect, f, indent=2, ensure_ascii=False)
+        logger.info(f"Incorrect chunks saved to {output_filepath}")
+
+    def _save_near_duplicate_clusters(self) -> None:
+        base_name = os.path.splitext(os.path.basename(self.input_filename))[0]
+        output_filepath = os.path.join(self.output_dir, f"{base_name}-near-duplicates.json")
+        clusters = [
+            {"kept": kept_chunk_id, "removed": removed}
+            for kept_chunk_id, removed in self.near_duplicate_clusters.items()
+        ]
+        with open(output_filepath, "w", encoding="utf-8") as f:
+            json.dump({"tokens_saved": self.near_duplicate_tokens_saved, "clusters": clusters}, f, indent=2)
+        logger.info(f"Near-duplicate clusters saved to {output_filepath}")
+
+
+class _StreamingJsonReader:
+    """
+    Read a JSON document incrementally from a text file, decoding one value at a time.
+
+    Args:
+        f: A text file object positioned at the start of the JSON document.
+        read_size (int): Minimum number of characters to read when the buffer runs out.
+    """
+
+    whitespace = re.compile(r"[ \t\n\r]*")
+    number_start = "-0123456789"
+    number_end = re.compile(r"[,\]} \t\n\r]")
+
+    def __init__(self, f, read_size: int):
+        self.f = f
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def iter_array_items(self, key: str) -> Iterator[Any]:
+        """
+        Yield the items of the array stored under `key` in the top-level object.
+
+        Other top-level values are decoded and discarded one at a time; reading stops at the end of the array.
+
+        Args:
+            key (str): The top-level key holding the array.
+
+        Yields:
+            Any: The decoded array items, in order.
+
+        Raises:
+            json.JSONDecodeError: If the document is not valid JSON or is not an object.
+        """
+        self._expect("{")
+        if self._next_char() == "}":
+            return
+        while True:
+            current_key = self._decode_value()
+            self._expect(":")
+            if current_key == key:
+                self._expect("[")
+                if self._next_char() == "]":
+                    return
+                while True:
+                    yield self._decode_value()
+                    if self._expect(",]") == "]":
+                        return
+            self._decode_value()
+            if self._expect(",}") == "}":
+                return
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        # Read at least as much as is already buffered so retries of a large value stay linear overall
+        data = self.f.read(max(self.read_size, len(self.buffer) - self.pos))
+        self.buffer = self.buffer[self.pos :] + data
+        self.pos = 0
+        self.eof = not data
+        return bool(data)
+
+    def _next_char(self) -> str:
+        while True:
+            self.pos = self.whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise json.JSONDecodeError("Unexpected end of data", self.buffer, self.pos)
+
+    def _expect(self, chars: str) -> str:
+        char = self._next_char()
+        if char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def _decode_value(self) -> Any:
+        if self._next_char() in self.number_start:
+            # A number is only complete once a delimiter follows it, otherwise "1." would decode as 1
+            while not self.number_end.search(self.buffer, self.pos) and self._fill():
+                pass
+        while True:
+            try:
+                value, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+                return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+
+# Per-process chunker used by MarkdownChunker._iter_pages_in_pool
+_worker_chunker: MarkdownChunker | None = None
+
+
+def iter_token_ids(filepath: str) -> Iterator[tuple[str, array]]:
+    """
+    Read a token ID sidecar file written by `MarkdownChunker.save_chunks` with `save_token_ids=True`.
+
+    Each record is the 16-byte chunk UUID, the number of tokens as a little-endian uint32 and the token IDs as
+    little-endian uint32 values. Records are in the same order as the chunks in the JSONL file.
+
+    Args:
+        filepath (str): Path of the `-chunked.tokens.bin` file.
+
+    Yields:
+        tuple[str, array]: The chunk ID and its token IDs.
+    """
+    with open(filepath, "rb") as f:
+        while header := f.read(20):
+            token_ids = array("I")
+            token_ids.fromfile(f, int.from_bytes(header[16:], "little"))
+            if sys.byteorder == "big":
+                token_ids.byteswap()
+            yield str(uuid.UUID(bytes=header[:16])), token_ids
+
+
+def _init_page_worker(worker_config: dict[str, Any]) -> None:
+    global _worker_chunker
+    _worker_chunker = MarkdownChunker(**worker_config)
+
+
+def _chunk_page_in_worker(page: dict[str, Any]) -> tuple[list[Chunk], dict[str, Any], dict[str, float]]:
+    # Start every page with fresh counts so the parent can merge them without double counting
+    _worker_chunker.validator = _worker_chunker._create_validator()
+    _worker_chunker.token_cache.hits = _worker_chunker.token_cache.misses = 0
+    _worker_chunker.size_precheck.settled = _worker_chunker.size_precheck.unsettled = 0
+    _worker_chunker.timings.reset()
+    chunks = _worker_chunker._process_page(page)
+    return chunks, _worker_chunker.validator.export_counts(), _worker_chunker.timings.seconds
+
+
+def chunk_files(
+    filenames: list[str],
+    max_workers: int = 4,
+    output_dir: str = PROCESSED_DATA_DIR,
+    save: bool = False,
+    incremental: bool = False,
+) -> dict[str, Any]:
+    """
+    Chunk several raw crawl files concurrently and report throughput per file and for the whole batch.
+
+    Each file is chunked in its own task of a bounded process pool. Results are collected as they complete, so a
+    slow file does not hold back the others, and a file that fails is reported without aborting the batch.
+
+    Args:
+        filenames (list[str]): Names of the raw crawl files in RAW_DATA_DIR, or paths to raw crawl files.
+        max_workers (int): Maximum number of files chunked at the same time. Defaults to 4.
+        output_dir (str): The directory to save the chunks to. Defaults to PROCESSED_DATA_DIR.
+        save (bool): Whether to save incorrect chunks for each file. Defaults to False.
+        incremental (bool): Whether to skip files whose chunks were saved after the file was last modified, and to
+            reuse the chunks of pages unchanged since the last run in the other files. Defaults to False.
+
+    Returns:
+        dict[str, Any]: A dictionary with a "files" list of per-file stats (including seconds per pipeline stage) and
+        a "total" dictionary with the aggregate pages/s, chunks/s and tokens/s over the wall-clock time of the batch.
+    """
+    start_time = time.perf_counter()
+    file_stats = []
+    if incremental:
+        up_to_date = [filename for filename in filenames if _is_up_to_date(filename, output_dir)]
+        for filename in up_to_date:
+            logger.info(f"Skipping {filename}: its chunks are newer than the file")
+            file_stats.append({"filename": filename, "status": "skipped"})
+        filenames = [filename for filename in filenames if filename not in up_to_date]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_chunk_file, filename, output_dir, save, incremental): filename for filename in filenames
+        }
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                logger.error(f"Chunking job for {filename} failed: {e}")
+                file_stats.append({"filename": filename, "status": "failed", "error": str(e)})
+                continue
+            logger.info(
+                f"Chunking job for {filename} complete: {stats['pages']} pages ({stats['pages_skipped']} unchanged), "
+                f"{stats['chunks']} chunks in "
+                f"{stats['seconds']:.2f}s ({stats['pages_per_second']:.1f} pages/s, "
+                f"{stats['chunks_per_second']:.1f} chunks/s, {stats['tokens_per_second']:.0f} tokens/s)"
+            )
+            file_stats.append(stats)
+
+    succeeded = [stats for stats in file_stats if stats["status"] == "ok"]
+    stages = StageTimings()
+    for stats in succeeded:
+        stages.merge(stats["stages"])
+    total = _add_throughput(
+        {
+            "files": len(succeeded),
+            "failed_files": sum(stats["status"] == "failed" for stats in file_stats),
+            "skipped_files": sum(stats["status"] == "skipped" for stats in file_stats),
+            "pages": sum(stats["pages"] for stats in succeeded),
+            "pages_skipped": sum(stats["pages_skipped"] for stats in succeeded),
+            "chunks": sum(stats["chunks"] for stats in succeeded),
+            "tokens": sum(stats["tokens"] for stats in succeeded),
+            "seconds": time.perf_counter() - start_time,
+            "stages": stages.to_dict(),
+        }
+    )
+    logger.info(
+        f"Chunked {total['files']} files ({total['failed_files']} failed, {total['skipped_files']} up to date) in "
+        f"{total['seconds']:.2f}s: {total['pages_per_second']:.1f} pages/s, {total['chunks_per_second']:.1f} chunks/s, "
+        f"{total['tokens_per_second']:.0f} tokens/s"
+    )
+    return {"files": file_stats, "total": total}
+
+
+def _chunked_filepath(input_filename: str, output_dir: str) -> str:
+    input_name = os.path.splitext(os.path.basename(input_filename))[0]  # Remove the directory and extension
+    return os.path.join(output_dir, f"{input_name}-chunked.jsonl")
+
+
+def _is_up_to_date(filename: str, output_dir: str) -> bool:
+    try:
+        input_mtime = os.path.getmtime(os.path.join(RAW_DATA_DIR, filename))
+        return os.path.getmtime(_chunked_filepath(filename, output_dir)) > input_mtime
+    except OSError:
+        return False
+
+
+def _chunk_file(filename: str, output_dir: str, save: bool, incremental: bool = False) -> dict[str, Any]:
+    start_time = time.perf_counter()
+    markdown_chunker = MarkdownChunker(
+        input_filename=filename, output_dir=output_dir, save=save, incremental=incremental
+    )
+    counts = {"pages": 0, "chunks": 0, "tokens": 0}
+
+    def count_pages(pages: Iterator[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        for page in pages:
+            counts["pages"] += 1
+            yield page
 
-# Test usage
-def main():
+    def count_chunks(chunks: Iterator[Chunk]) -> Iterator[Chunk]:
+        for chunk in chunks:
+            counts["chunks"] += 1
+            counts["tokens"] += chunk.token_count
+            yield chunk
+
+    pages = count_pages(markdown_chunker.iter_pages())
+    markdown_chunker.save_chunks(count_chunks(markdown_chunker.iter_chunks(pages)))
+    return _add_throughput(
+        {
+            "filename": filename,
+            "status": "ok",
+            **counts,
+            "pages_skipped": markdown_chunker.pages_skipped,
+            "seconds": time.perf_counter() - start_time,
+            "stages": markdown_chunker.timings.to_dict(),
+        }
+    )
+
+
+def _add_throughput(stats: dict[str, Any]) -> dict[str, Any]:
+    seconds = stats["seconds"] or float("inf")
+    for unit in ["pages", "chunks", "tokens"]:
+        stats[f"{unit}_per_second"] = stats[unit] / seconds
+    return stats
+
+
+def resolve_input_files(patterns: list[str]) -> list[str]:
+    """
+    Expand file names, paths and glob patterns into the raw crawl files to chunk.
+
+    Patterns are matched as given first, then relative to RAW_DATA_DIR. Files inside RAW_DATA_DIR are returned
+    relative to it, other files as absolute paths.
+
+    Args:
+        patterns (list[str]): File names, paths or glob patterns. An empty list selects every file in RAW_DATA_DIR.
+
+    Returns:
+        list[str]: The matching files, without duplicates, in the order they were matched.
+
+    Raises:
+        FileNotFoundError: If a pattern matches no file.
     """
-    Initialize logging settings, identify and process markdown files into chunks.
+    raw_data_dir = os.path.abspath(RAW_DATA_DIR)
+    filenames = {}
+    for pattern in patterns or [os.path.join(raw_data_dir, "*")]:
+        matches = sorted(glob.glob(pattern)) or sorted(glob.glob(os.path.join(raw_data_dir, pattern)))
+        matches = [os.path.abspath(match) for match in matches if os.path.isfile(match)]
+        if not matches:
+            raise FileNotFoundError(f"No raw crawl file matches {pattern}")
+        for match in matches:
+            if os.path.dirname(match) == raw_data_dir:
+                match = os.path.basename(match)
+            filenames.setdefault(match, None)
+    return list(filenames)
+
+
+def main(argv: list[str] | None = None) -> dict[str, Any]:
+    """
+    Chunk raw crawl files from the command line and write a JSON stats report.
+
+    Usage:
+        python -m src.processing.chunking [FILE_OR_GLOB ...] [--jobs N] [--incremental] [--stats PATH]
 
     Args:
-        debug (bool, optional): Configure logging in debug mode. Defaults to True.
+        argv (list[str] | None): Command line arguments. Defaults to sys.argv[1:].
 
     Returns:
-        None
+        dict[str, Any]: The stats report returned by `chunk_files`.
 
     Raises:
-        FileNotFoundError: If the specified chunks directory does not exist.
-        IOError: If there is an error processing the markdown files.
+        FileNotFoundError: If an input pattern matches no file.
     """
-    configure_logging(debug=True)
-
-    files_to_chunk = []
-    chunks_dir = RAW_DATA_DIR
-    for filename in os.listdir(chunks_dir):
-        if os.path.isfile(os.path.join(chunks_dir, filename)):
-            files_to_chunk.append(filename)
-
-    for file in files_to_chunk:
-        markdown_chunker = MarkdownChunker(input_filename=file, save=False)  # save incorrect chunks or not
-        result = markdown_chunker.load_data()
-        chunks = markdown_chunker.process_pages(result)
-        markdown_chunker.save_chunks(chunks)
-        logger.info("Chunking job for " + file + " complete!")
+    parser = argparse.ArgumentParser(description="Chunk raw crawl files into -chunked.jsonl files.")
+    parser.add_argument("inputs", nargs="*", help="raw crawl files or globs (default: every file in RAW_DATA_DIR)")
+    parser.add_argument(
+        "--jobs", type=int, default=min(4, os.cpu_count() or 1), help="number of files chunked at the same time"
+    )
+    parser.add_argument("--output-dir", default=PROCESSED_DATA_DIR, help="directory to save the chunks to")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="skip files whose chunks are newer than the file and reuse the chunks of unchanged pages",
+    )
+    parser.add_argument(
+        "--stats", help="write the JSON stats report to this file, or to stdout with '-' (default: no report)"
+    )
+    parser.add_argument("--save-incorrect", action="store_true", help="save incorrect chunks for each file")
+    parser.add_argument("--debug", action="store_true", help="log in debug mode")
+    args = parser.parse_args(argv)
+
+    configure_logging(debug=args.debug)
+    filenames = resolve_input_files(args.inputs)
+    report = chunk_files(
+        filenames,
+        max_workers=max(1, args.jobs),
+        output_dir=args.output_dir,
+        save=args.save_incorrect,
+        incremental=args.incremental,
+    )
+
+    if args.stats == "-":
+        print(json.dumps(report, indent=2))
+    elif args.stats:
+        with open(args.stats, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        logger.info(f"Chunking stats saved to {args.stats}")
+    return report
 
 
 if __name__ == "__main__":
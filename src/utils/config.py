@@ -43,6 +43,8 @@ MAIN_MODEL = "claude-3-5-sonnet-20240620"
 # Evaluation config
 EVALUATOR_MODEL_NAME = "gpt-4o-mini"
 EMBEDDING_MODEL = "text-embedding-3-small"
+# Embedding backend of the vector database: "openai", or "local" for the offline hashed n-gram embedder
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
 
 
 # Ensure directories exist
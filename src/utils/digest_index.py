@@ -0,0 +1,138 @@
+import fcntl
+import hashlib
+import os
+
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+DIGEST_INDEX_FILENAME = "chunk_digests.bin"
+
+
+class ChunkDigestIndex:
+    """
+    Persisted index of the digests of chunk texts, used to skip content already indexed from another file.
+
+    Every record is a 16-byte BLAKE2b digest of a chunk text and an 8-byte key of the file that owns it, so the index
+    never stores chunk texts and its size grows by 24 bytes per unique chunk. A file may always re-add its own content;
+    content owned by a different file is reported as a duplicate.
+
+    Args:
+        filepath (str): Path of the binary index file. It is created on the first save.
+    """
+
+    magic = b"KCDI\x01"
+    record_size = 24
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.owners = self._read()
+        self.claimed: dict[bytes, bytes] = {}
+
+    def __len__(self) -> int:
+        """Return the number of digests in the index."""
+        return len(self.owners)
+
+    def _read(self) -> dict[bytes, bytes]:
+        try:
+            with open(self.filepath, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+        header = len(self.magic)
+        if data[:header] != self.magic or (len(data) - header) % self.record_size:
+            logger.warning(f"Ignoring unreadable chunk digest index {self.filepath}")
+            return {}
+        return {
+            data[offset : offset + 16]: data[offset + 16 : offset + self.record_size]
+            for offset in range(header, len(data), self.record_size)
+        }
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        """
+        Return the 16-byte digest identifying a chunk text.
+
+        Args:
+            text (str): The chunk text.
+
+        Returns:
+            bytes: The BLAKE2b digest of the text.
+        """
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    @staticmethod
+    def owner_key(owner: str) -> bytes:
+        """
+        Return the 8-byte key recorded for a file name.
+
+        Args:
+            owner (str): Name of the file the content comes from.
+
+        Returns:
+            bytes: The BLAKE2b digest of the name.
+        """
+        return hashlib.blake2b(owner.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+
+    def owned_elsewhere(self, digest: bytes, owner: str) -> bool:
+        """
+        Check whether a chunk text is already indexed from a different file.
+
+        Args:
+            digest (bytes): Digest of the chunk text.
+            owner (str): Name of the file the chunk comes from.
+
+        Returns:
+            bool: True if another file owns the digest.
+        """
+        owner_key = self.owners.get(digest)
+        return owner_key is not None and owner_key != self.owner_key(owner)
+
+    def claim(self, digest: bytes, owner: str) -> None:
+        """
+        Record a chunk text as owned by a file, unless another file already owns it.
+
+        Args:
+            digest (bytes): Digest of the chunk text.
+            owner (str): Name of the file the chunk comes from.
+        """
+        owner_key = self.owner_key(owner)
+        if self.owners.setdefault(digest, owner_key) == owner_key:
+            self.claimed[digest] = owner_key
+
+    def save(self, replace: bool = False) -> None:
+        """
+        Merge the digests claimed since the last save into the index file.
+
+        The file is re-read under an exclusive lock before writing, so concurrent processes sharing the index do not
+        overwrite each other's records; a digest claimed by another file in the meantime keeps its owner.
+
+        Args:
+            replace (bool): Whether the claims replace the previous records of their files, e.g. because the files
+                were regenerated. Defaults to False, which only adds records.
+        """
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        with open(f"{self.filepath}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            owners = self._read()
+            if replace:
+                replaced = set(self.claimed.values())
+                owners = {digest: owner_key for digest, owner_key in owners.items() if owner_key not in replaced}
+            for digest, owner_key in self.claimed.items():
+                owners.setdefault(digest, owner_key)
+            temp_filepath = f"{self.filepath}.tmp"
+            with open(temp_filepath, "wb") as f:
+                f.write(self.magic)
+                f.write(b"".join(digest + owner_key for digest, owner_key in owners.items()))
+            os.replace(temp_filepath, self.filepath)
+        self.owners = owners
+        self.claimed = {}
+
+    def clear(self) -> None:
+        """Remove every record from the index and delete the index file."""
+        with open(f"{self.filepath}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(self.filepath):
+                os.remove(self.filepath)
+        self.owners = {}
+        self.claimed = {}
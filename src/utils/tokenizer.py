@@ -0,0 +1,131 @@
+import threading
+
+import tiktoken
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+class TokenizerRegistry:
+    """
+    Process-wide registry of tiktoken encodings shared by every component.
+
+    Each encoding is loaded on first use, at most once even when several threads ask for it at the same time. Encodings
+    are safe to use from several threads, and the helpers encode text as ordinary text: special token strings such as
+    "<|endoftext|>" in a document are counted like any other text instead of raising.
+
+    Args:
+        batch_threads (int): Number of threads used by the batch helpers for large batches. Defaults to 8.
+        min_batch_size (int): Smallest batch encoded in threads; smaller batches are encoded in the calling thread.
+            Defaults to 16.
+    """
+
+    def __init__(self, batch_threads: int = 8, min_batch_size: int = 16):
+        self.batch_threads = batch_threads
+        self.min_batch_size = min_batch_size
+        self._encodings: dict[str, tiktoken.Encoding] = {}
+        self._max_token_bytes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+        """
+        Return an encoding, loading it on first use.
+
+        Args:
+            name (str): The tiktoken encoding name. Defaults to "cl100k_base".
+
+        Returns:
+            tiktoken.Encoding: The shared encoding.
+        """
+        encoding = self._encodings.get(name)
+        if encoding is None:
+            with self._lock:
+                encoding = self._encodings.get(name)
+                if encoding is None:
+                    encoding = self._encodings[name] = tiktoken.get_encoding(name)
+        return encoding
+
+    def max_token_bytes(self, name: str = DEFAULT_ENCODING) -> int:
+        """
+        Return the length in bytes of the longest token of an encoding.
+
+        Args:
+            name (str): The tiktoken encoding name. Defaults to "cl100k_base".
+
+        Returns:
+            int: The number of UTF-8 bytes of the longest token (128 for cl100k).
+        """
+        max_bytes = self._max_token_bytes.get(name)
+        if max_bytes is None:
+            max_bytes = self._max_token_bytes[name] = max(map(len, self.get(name).token_byte_values()))
+        return max_bytes
+
+    def encode(self, text: str, name: str = DEFAULT_ENCODING) -> list[int]:
+        """
+        Encode a text as ordinary text.
+
+        Args:
+            text (str): The text to encode.
+            name (str): The tiktoken encoding name. Defaults to "cl100k_base".
+
+        Returns:
+            list[int]: The token IDs of the text.
+        """
+        return self.get(name).encode_ordinary(text)
+
+    def count(self, text: str, name: str = DEFAULT_ENCODING) -> int:
+        """
+        Count the tokens of a text.
+
+        Args:
+            text (str): The text to count tokens for.
+            name (str): The tiktoken encoding name. Defaults to "cl100k_base".
+
+        Returns:
+            int: The number of tokens in the text.
+        """
+        return len(self.get(name).encode_ordinary(text))
+
+    def encode_ordinary_batch(self, texts: list[str], name: str = DEFAULT_ENCODING) -> list[list[int]]:
+        """
+        Encode several texts as ordinary text, in threads if the batch is large enough to pay for them.
+
+        Args:
+            texts (list[str]): The texts to encode.
+            name (str): The tiktoken encoding name. Defaults to "cl100k_base".
+
+        Returns:
+            list[list[int]]: The token IDs of each text, in order.
+        """
+        encoding = self.get(name)
+        if len(texts) < self.min_batch_size:
+            return [encoding.encode_ordinary(text) for text in texts]
+        return encoding.encode_ordinary_batch(texts, num_threads=self.batch_threads)
+
+    def count_batch(self, texts: list[str], name: str = DEFAULT_ENCODING) -> list[int]:
+        """
+        Count the tokens of several texts.
+
+        Args:
+            texts (list[str]): The texts to count tokens for.
+            name (str): The tiktoken encoding name. Defaults to "cl100k_base".
+
+        Returns:
+            list[int]: The number of tokens in each text, in order.
+        """
+        return [len(token_ids) for token_ids in self.encode_ordinary_batch(texts, name)]
+
+
+tokenizers = TokenizerRegistry()
+
+
+def get_tokenizer(name: str = DEFAULT_ENCODING) -> tiktoken.Encoding:
+    """
+    Return a shared tiktoken encoding from the process-wide registry.
+
+    Args:
+        name (str): The tiktoken encoding name. Defaults to "cl100k_base".
+
+    Returns:
+        tiktoken.Encoding: The shared encoding.
+    """
+    return tokenizers.get(name)
@@ -0,0 +1,104 @@
+import re
+import zlib
+from collections import Counter
+from collections.abc import Callable
+
+import chromadb.utils.embedding_functions as embedding_functions
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class HashedNgramEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Local, deterministic embedding function built from hashed word and character n-grams.
+
+    Every document is reduced to lowercase word unigrams and bigrams plus character trigrams of each word. Each feature
+    is hashed with CRC32 to a dimension and a sign, weighted by `1 + log(count)`, and the resulting vector is L2
+    normalized. Documents that share words and word pieces end up close in cosine distance. The embedder needs no
+    model download or network access and is fast on a CPU, which makes it suited to tests, offline development and
+    ingestion benchmarks rather than to production retrieval quality.
+
+    Args:
+        dimensions (int): Number of dimensions of the embeddings. Defaults to 384.
+    """
+
+    word_pattern = re.compile(r"\w+")
+
+    def __init__(self, dimensions: int = 384) -> None:
+        self.dimensions = dimensions
+        self.model_name = f"hashed-ngram-{dimensions}"
+
+    def __call__(self, input: Documents) -> Embeddings:
+        """
+        Embed documents.
+
+        Args:
+            input (Documents): The documents to embed.
+
+        Returns:
+            Embeddings: One L2-normalized float32 embedding per document, in order.
+        """
+        embeddings = np.zeros((len(input), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(input):
+            counts = Counter(self._features(text))
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8", "surrogatepass")) for feature in counts), np.uint32
+            )
+            weights = 1.0 + np.log(np.fromiter(counts.values(), np.float32))
+            signed_weights = np.where(hashes >> 31, -weights, weights)
+            embeddings[row] = np.bincount(hashes % self.dimensions, signed_weights, minlength=self.dimensions)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms > 0, norms, 1.0)
+        return list(embeddings)
+
+    def _features(self, text: str) -> list[str]:
+        words = self.word_pattern.findall(text.lower())
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{first} {second}" for first, second in zip(words, words[1:], strict=False)]
+        for word in words:
+            padded = f"<{word}>"
+            features += [f"c:{padded[i : i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+
+def _openai_embedding_function(model_name: str, api_key: str | None) -> EmbeddingFunction:
+    return embedding_functions.OpenAIEmbeddingFunction(api_key=api_key, model_name=model_name)
+
+
+def _local_embedding_function(model_name: str, api_key: str | None) -> EmbeddingFunction:
+    return HashedNgramEmbeddingFunction()
+
+
+# Embedding backend name -> factory taking the configured model name and API key
+EMBEDDING_BACKENDS: dict[str, Callable[[str, str | None], EmbeddingFunction]] = {
+    "openai": _openai_embedding_function,
+    "local": _local_embedding_function,
+}
+
+
+def create_embedding_function(
+    backend: str, model_name: str, api_key: str | None = None
+) -> tuple[EmbeddingFunction, str]:
+    """
+    Build the embedding function of a backend.
+
+    Args:
+        backend (str): The backend name, a key of EMBEDDING_BACKENDS.
+        model_name (str): The embedding model name, used by backends that serve several models.
+        api_key (str | None): The API key of backends that call an API. Defaults to None.
+
+    Returns:
+        tuple[EmbeddingFunction, str]: The embedding function and the name of the model it embeds with.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {sorted(EMBEDDING_BACKENDS)}")
+    embedding_function = EMBEDDING_BACKENDS[backend](model_name, api_key)
+    logger.debug(f"Using the {backend} embedding backend")
+    return embedding_function, getattr(embedding_function, "model_name", model_name)
@@ -0,0 +1,303 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+EMBEDDING_CACHE_FILENAME = "embedding_cache.sqlite"
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of document embeddings keyed by the embedding model and a hash of the document text.
+
+    Vectors are stored as float32 in a SQLite file, so they survive `reset_database`, re-chunking and new collections.
+    Once the stored vectors exceed `max_bytes`, the least recently used entries are evicted down to 90% of the limit.
+    The cache is safe to share between threads, and between processes through SQLite's own locking.
+
+    Args:
+        filepath (str): Path of the SQLite cache file. It is created on first use.
+        max_bytes (int): Maximum total size of the cached vectors in bytes. Defaults to 1 GiB.
+    """
+
+    # SQLite limits the number of parameters of a statement
+    query_batch_size = 500
+
+    def __init__(self, filepath: str, max_bytes: int = 1 << 30):
+        self.filepath = filepath
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached embeddings."""
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def key(model_name: str, text: str) -> bytes:
+        """
+        Return the cache key of a document embedded with a model.
+
+        Args:
+            model_name (str): The embedding model name.
+            text (str): The document text.
+
+        Returns:
+            bytes: 16-byte BLAKE2b digest of the model name and the text.
+        """
+        return hashlib.blake2b(f"{model_name}\0{text}".encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def get_many(self, model_name: str, texts: list[str]) -> list[np.ndarray | None]:
+        """
+        Look up the embeddings of several documents.
+
+        Args:
+            model_name (str): The embedding model name.
+            texts (list[str]): The document texts.
+
+        Returns:
+            list[np.ndarray | None]: The cached float32 embedding of each text, or None where it is not cached.
+        """
+        keys = [self.key(model_name, text) for text in texts]
+        vectors = {}
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(keys), self.query_batch_size):
+                batch = keys[start : start + self.query_batch_size]
+                placeholders = ",".join("?" * len(batch))
+                rows = connection.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+                vectors.update(rows)
+            if vectors:
+                connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(time.time(), key) for key in vectors]
+                )
+                connection.commit()
+            hits = sum(key in vectors for key in keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return [np.frombuffer(vectors[key], dtype=np.float32) if key in vectors else None for key in keys]
+
+    def put_many(self, model_name: str, texts: list[str], embeddings: list) -> None:
+        """
+        Store the embeddings of several documents, evicting the least recently used entries if the cache is full.
+
+        Args:
+            model_name (str): The embedding model name.
+            texts (list[str]): The document texts.
+            embeddings (list): The embedding of each text.
+        """
+        now = time.time()
+        vectors = {
+            self.key(model_name, text): np.asarray(embedding, dtype=np.float32).tobytes()
+            for text, embedding in zip(texts, embeddings, strict=True)
+        }
+        keys = list(vectors)
+        with self._lock:
+            connection = self._connect()
+            previous_sizes = {}
+            for start in range(0, len(keys), self.query_batch_size):
+                batch = keys[start : start + self.query_batch_size]
+                placeholders = ",".join("?" * len(batch))
+                rows = connection.execute(
+                    f"SELECT key, length(vector) FROM embeddings WHERE key IN ({placeholders})", batch
+                )
+                previous_sizes.update(rows)
+            self._total_bytes += sum(len(vector) - previous_sizes.get(key, 0) for key, vector in vectors.items())
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, vector, now) for key, vector in vectors.items()],
+            )
+            if self._total_bytes > self.max_bytes:
+                self._evict(connection, int(0.9 * self.max_bytes))
+            connection.commit()
+
+    def clear(self) -> None:
+        """Remove every cached embedding."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM embeddings")
+            connection.commit()
+            self._total_bytes = 0
+
+    def close(self) -> None:
+        """Close the connection to the cache file."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            connection.commit()
+            self._total_bytes = connection.execute(
+                "SELECT COALESCE(SUM(length(vector)), 0) FROM embeddings"
+            ).fetchone()[0]
+            self._connection = connection
+        return self._connection
+
+    def _evict(self, connection: sqlite3.Connection, target_bytes: int) -> None:
+        rows = connection.execute("SELECT key, length(vector) FROM embeddings ORDER BY last_used")
+        evicted_keys = []
+        for key, size in rows:
+            if self._total_bytes <= target_bytes:
+                break
+            evicted_keys.append((key,))
+            self._total_bytes -= size
+        connection.executemany("DELETE FROM embeddings WHERE key = ?", evicted_keys)
+        self.evictions += len(evicted_keys)
+        logger.info(f"Evicted {len(evicted_keys)} embeddings from the embedding cache")
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU cache of query embeddings whose entries expire after a time to live.
+
+    Search queries are short and often repeated by users and evaluation runs, so keeping their embeddings in memory
+    saves an embedding request per repeated query. Entries expire so that a long-running process does not keep
+    serving embeddings from a model that was since replaced.
+
+    Args:
+        max_size (int): Maximum number of cached queries. A value of 0 disables caching. Defaults to 1024.
+        ttl (float): Seconds an entry stays valid after it is stored. Defaults to 3600.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached query embeddings, including expired ones not evicted yet."""
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        """
+        Look up the embeddings of several queries, dropping the expired ones.
+
+        Args:
+            texts (list[str]): The query texts.
+
+        Returns:
+            list[np.ndarray | None]: The cached embedding of each query, or None where it is missing or expired.
+        """
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            for text in texts:
+                entry = self._entries.get(text)
+                if entry is not None and entry[0] <= now:
+                    del self._entries[text]
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(text)
+                    self.hits += 1
+                    results.append(entry[1])
+        return results
+
+    def put_many(self, texts: list[str], embeddings: list) -> None:
+        """
+        Store the embeddings of several queries, evicting the least recently used ones beyond `max_size`.
+
+        Args:
+            texts (list[str]): The query texts.
+            embeddings (list): The embedding of each query.
+        """
+        if not self.max_size:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for text, embedding in zip(texts, embeddings, strict=True):
+                self._entries[text] = (expires_at, np.asarray(embedding, dtype=np.float32))
+                self._entries.move_to_end(text)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove every cached query embedding."""
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function that serves embeddings from an `EmbeddingCache` and embeds only the misses.
+
+    Args:
+        embedding_function (Callable[[Documents], Embeddings]): The embedding function to wrap.
+        cache (EmbeddingCache): The cache to read and fill.
+        model_name (str): The embedding model name, part of the cache key.
+    """
+
+    def __init__(
+        self, embedding_function: Callable[[Documents], Embeddings], cache: EmbeddingCache, model_name: str
+    ) -> None:
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.model_name = model_name
+
+    def __call__(self, input: Documents) -> Embeddings:
+        """
+        Embed documents, calling the wrapped function only for documents that are not cached.
+
+        Args:
+            input (Documents): The documents to embed.
+
+        Returns:
+            Embeddings: One float32 embedding per document, in order.
+        """
+        texts = list(input)
+        embeddings = self.cache.get_many(self.model_name, texts)
+        missing_texts = list(
+            dict.fromkeys(text for text, embedding in zip(texts, embeddings, strict=True) if embedding is None)
+        )
+        if missing_texts:
+            new_embeddings = self.embedding_function(missing_texts)
+            self.cache.put_many(self.model_name, missing_texts, new_embeddings)
+            embedded = {
+                text: np.asarray(embedding, dtype=np.float32)
+                for text, embedding in zip(missing_texts, new_embeddings, strict=True)
+            }
+            embeddings = [
+                embedded[text] if embedding is None else embedding
+                for text, embedding in zip(texts, embeddings, strict=True)
+            ]
+        return embeddings
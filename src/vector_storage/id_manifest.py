@@ -0,0 +1,148 @@
+import fcntl
+import hashlib
+import os
+from collections.abc import Iterable
+
+from src.utils.logger import get_logger
+
+logger = get_logger()
+
+ID_MANIFEST_SUFFIX = "-ids.bin"
+
+
+class IndexedIdManifest:
+    """
+    Persisted set of the chunk IDs stored in a Chroma collection, used to check which chunks exist without querying it.
+
+    Every record is a 16-byte BLAKE2b digest of a chunk ID, so membership checks are set lookups and the manifest
+    grows by 16 bytes per chunk. The manifest is trusted while it holds as many IDs as the collection; `sync` compares
+    the counts, one cheap request, and rebuilds the manifest from the collection's IDs when they differ, e.g. after the
+    collection was modified by another tool or the manifest was lost.
+
+    Args:
+        filepath (str): Path of the binary manifest file. It is created on the first save.
+    """
+
+    magic = b"KIDM\x01"
+    record_size = 16
+    # Number of IDs fetched per request while rebuilding from the collection
+    sync_batch_size = 10_000
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.digests = self._read()
+        self.added: list[bytes] = []
+
+    def __len__(self) -> int:
+        """Return the number of IDs in the manifest."""
+        return len(self.digests)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        """Return whether a chunk ID is in the manifest."""
+        return self.digest(chunk_id) in self.digests
+
+    def _read(self) -> set[bytes]:
+        try:
+            with open(self.filepath, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return set()
+        header = len(self.magic)
+        if data[:header] != self.magic or (len(data) - header) % self.record_size:
+            logger.warning(f"Ignoring unreadable chunk ID manifest {self.filepath}")
+            return set()
+        return {data[offset : offset + self.record_size] for offset in range(header, len(data), self.record_size)}
+
+    @staticmethod
+    def digest(chunk_id: str) -> bytes:
+        """
+        Return the 16-byte digest recorded for a chunk ID.
+
+        Args:
+            chunk_id (str): The chunk ID.
+
+        Returns:
+            bytes: The BLAKE2b digest of the ID.
+        """
+        return hashlib.blake2b(chunk_id.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def missing(self, chunk_ids: Iterable[str]) -> list[str]:
+        """
+        Return the chunk IDs that are not in the manifest.
+
+        Args:
+            chunk_ids (Iterable[str]): The chunk IDs to check.
+
+        Returns:
+            list[str]: The missing IDs, without duplicates, in their original order.
+        """
+        return [chunk_id for chunk_id in dict.fromkeys(chunk_ids) if self.digest(chunk_id) not in self.digests]
+
+    def add(self, chunk_ids: Iterable[str]) -> None:
+        """
+        Record chunk IDs as stored in the collection.
+
+        Args:
+            chunk_ids (Iterable[str]): The IDs of the chunks added to the collection.
+        """
+        for chunk_id in chunk_ids:
+            digest = self.digest(chunk_id)
+            if digest not in self.digests:
+                self.digests.add(digest)
+                self.added.append(digest)
+
+    def save(self) -> None:
+        """Append the IDs added since the last save to the manifest file."""
+        if not self.added:
+            return
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        with open(f"{self.filepath}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            exists = os.path.exists(self.filepath)
+            with open(self.filepath, "ab") as f:
+                if not exists:
+                    f.write(self.magic)
+                f.write(b"".join(self.added))
+        self.added = []
+
+    def sync(self, collection) -> bool:
+        """
+        Make sure the manifest matches a collection, rebuilding it from the collection's IDs if the counts differ.
+
+        Args:
+            collection: The Chroma collection the manifest describes.
+
+        Returns:
+            bool: True if the manifest was rebuilt.
+        """
+        count = collection.count()
+        if count == len(self.digests) and not self.added:
+            return False
+        digests = set()
+        for offset in range(0, count, self.sync_batch_size):
+            result = collection.get(include=[], limit=self.sync_batch_size, offset=offset)
+            digests.update(self.digest(chunk_id) for chunk_id in result["ids"])
+        self._write(digests)
+        logger.info(f"Rebuilt the chunk ID manifest from {count} documents in the collection")
+        return True
+
+    def clear(self) -> None:
+        """Remove every ID from the manifest and delete the manifest file."""
+        with open(f"{self.filepath}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(self.filepath):
+                os.remove(self.filepath)
+        self.digests = set()
+        self.added = []
+
+    def _write(self, digests: set[bytes]) -> None:
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        with open(f"{self.filepath}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            temp_filepath = f"{self.filepath}.tmp"
+            with open(temp_filepath, "wb") as f:
+                f.write(self.magic)
+                f.write(b"".join(digests))
+            os.replace(temp_filepath, self.filepath)
+        self.digests = digests
+        self.added = []
@@ -4,18 +4,37 @@ import json
 import os
 import time
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any
 
 import chromadb
-import chromadb.utils.embedding_functions as embedding_functions
 import cohere
+import numpy as np
 import weave
 from cohere import RerankResponse
 
 from src.generation.summary_manager import SummaryManager
-from src.utils.config import CHROMA_DB_DIR, COHERE_API_KEY, OPENAI_API_KEY, PROCESSED_DATA_DIR
+from src.utils.config import (
+    CHROMA_DB_DIR,
+    COHERE_API_KEY,
+    EMBEDDING_BACKEND,
+    OPENAI_API_KEY,
+    PROCESSED_DATA_DIR,
+    VECTOR_STORAGE_DIR,
+)
 from src.utils.decorators import base_error_handler
+from src.utils.digest_index import DIGEST_INDEX_FILENAME, ChunkDigestIndex
 from src.utils.logger import configure_logging, get_logger
+from src.utils.tokenizer import tokenizers
+from src.vector_storage.embedding_backends import create_embedding_function
+from src.vector_storage.embedding_cache import (
+    EMBEDDING_CACHE_FILENAME,
+    CachedEmbeddingFunction,
+    EmbeddingCache,
+    QueryEmbeddingCache,
+)
+from src.vector_storage.id_manifest import ID_MANIFEST_SUFFIX, IndexedIdManifest
 
 logger = get_logger()
 
@@ -40,13 +59,32 @@ class DocumentProcessor:
 
     def load_json(self, filename: str) -> list[dict]:
         """
-        Load and parse JSON data from a specified file.
+        Load and parse chunks from a specified file.
 
         Args:
-            filename (str): Name of the file containing JSON data.
+            filename (str): Name of the file containing the chunks, either JSONL (`-chunked.jsonl`) or a legacy JSON
+                array (`-chunked.json`).
 
         Returns:
-            list[dict]: A list of dictionaries parsed from the JSON file.
+            list[dict]: A list of dictionaries parsed from the file.
+
+        Raises:
+            FileNotFoundError: If the specified file cannot be found.
+            JSONDecodeError: If the file contains invalid JSON.
+        """
+        return list(self.iter_chunks(filename))
+
+    def iter_chunks(self, filename: str) -> Iterator[dict]:
+        """
+        Lazily read chunks from a specified file.
+
+        JSONL files are read one line at a time; legacy JSON arrays are parsed in one go.
+
+        Args:
+            filename (str): Name of the file containing the chunks.
+
+        Yields:
+            dict: The next chunk in the file.
 
         Raises:
             FileNotFoundError: If the specified file cannot be found.
@@ -54,9 +92,13 @@ class DocumentProcessor:
         """
         try:
             filepath = os.path.join(self.processed_dir, filename)
-            with open(filepath) as f:
-                data = json.load(f)
-            return data
+            with open(filepath, encoding="utf-8") as f:
+                if filename.endswith(".jsonl"):
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+                else:
+                    yield from json.load(f)
         except FileNotFoundError:
             logger.error(f"File not found: {filename}")
             raise
@@ -163,6 +205,150 @@ class VectorDBInterface(ABC):
         pass
 
 
+class EmbeddingPipeline:
+    """
+    Embed documents in token-budgeted batches with a bounded pool of workers and add each batch as soon as it is done.
+
+    Batches hold at most `batch_tokens` tokens and `batch_size` documents, so no request exceeds the embedding API
+    limits. Embedding requests run concurrently; the batches are written to the collection from the calling thread as
+    they complete. A batch that still fails after its retries is logged and left out, and the other batches are
+    added regardless, so adding the same documents again only embeds the ones that failed.
+
+    Args:
+        embedding_function (Callable[[list[str]], list]): Function returning one embedding per document.
+        batch_tokens (int): Maximum number of tokens per batch. Defaults to 100_000.
+        batch_size (int): Maximum number of documents per batch. Defaults to 512.
+        workers (int): Maximum number of batches embedded at the same time. Defaults to 4.
+        retries (int): Number of times a failed batch is retried, with exponential backoff. Defaults to 2.
+        retry_delay (float): Seconds to wait before the first retry. Defaults to 1.0.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Callable[[list[str]], list],
+        batch_tokens: int = 100_000,
+        batch_size: int = 512,
+        workers: int = 4,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+    ):
+        self.embedding_function = embedding_function
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.workers = workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def batches(self, token_counts: list[int]) -> list[slice]:
+        """
+        Group consecutive documents into batches within the token and size budgets.
+
+        A document larger than `batch_tokens` on its own gets a batch of its own.
+
+        Args:
+            token_counts (list[int]): The number of tokens of each document.
+
+        Returns:
+            list[slice]: The batches, as slices of the document list.
+        """
+        batches = []
+        start = batch_tokens = 0
+        for end, tokens in enumerate(token_counts):
+            if end > start and (batch_tokens + tokens > self.batch_tokens or end - start >= self.batch_size):
+                batches.append(slice(start, end))
+                start, batch_tokens = end, 0
+            batch_tokens += tokens
+        if start < len(token_counts):
+            batches.append(slice(start, len(token_counts)))
+        return batches
+
+    @staticmethod
+    def empty_stats() -> dict[str, Any]:
+        """
+        Return the stats of a run that had nothing to embed.
+
+        Returns:
+            dict[str, Any]: The stats returned by `add`, with every count at zero.
+        """
+        return {
+            "chunks": 0,
+            "failed_chunks": 0,
+            "batches": 0,
+            "embedding_tokens": 0,
+            "seconds": 0.0,
+            "chunks_per_second": 0.0,
+            "embedding_tokens_per_second": 0.0,
+            "failed_ids": [],
+        }
+
+    def add(self, collection, ids: list[str], documents: list[str], metadatas: list[dict[str, Any]]) -> dict[str, Any]:
+        """
+        Embed documents and add them to a collection, batch by batch.
+
+        Args:
+            collection: The Chroma collection to add the documents to.
+            ids (list[str]): The document IDs.
+            documents (list[str]): The documents to embed.
+            metadatas (list[dict[str, Any]]): The metadata of each document.
+
+        Returns:
+            dict[str, Any]: The number of chunks added, failed and batches, the embedding tokens, the seconds taken,
+            chunks/s and embedding tokens/s, and the "failed_ids" of the documents that were not added.
+        """
+        start_time = time.perf_counter()
+        token_counts = tokenizers.count_batch(documents)
+        batches = self.batches(token_counts)
+        added_chunks = embedding_tokens = 0
+        failed_ids = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._embed, documents[batch]): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    collection.add(
+                        ids=ids[batch],
+                        embeddings=future.result(),
+                        documents=documents[batch],
+                        metadatas=metadatas[batch],
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to add a batch of {len(ids[batch])} documents: {e}")
+                    failed_ids.extend(ids[batch])
+                    continue
+                added_chunks += len(ids[batch])
+                embedding_tokens += sum(token_counts[batch])
+
+        seconds = time.perf_counter() - start_time
+        stats = {
+            "chunks": added_chunks,
+            "failed_chunks": len(failed_ids),
+            "batches": len(batches),
+            "embedding_tokens": embedding_tokens,
+            "seconds": seconds,
+            "chunks_per_second": added_chunks / seconds if seconds else 0.0,
+            "embedding_tokens_per_second": embedding_tokens / seconds if seconds else 0.0,
+            "failed_ids": failed_ids,
+        }
+        if batches:
+            logger.info(
+                f"Embedded {added_chunks} chunks in {len(batches)} batches ({len(failed_ids)} chunks failed) in "
+                f"{seconds:.2f}s: {stats['chunks_per_second']:.1f} chunks/s, "
+                f"{stats['embedding_tokens_per_second']:.0f} embedding tokens/s"
+            )
+        return stats
+
+    def _embed(self, documents: list[str]) -> list:
+        for attempt in range(self.retries + 1):
+            try:
+                return self.embedding_function(documents)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.retry_delay * 2**attempt
+                logger.warning(f"Embedding a batch of {len(documents)} documents failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+
 class VectorDB(VectorDBInterface):
     """
     Initializes the VectorDB class with embedding and OpenAI API configurations.
@@ -170,31 +356,77 @@ class VectorDB(VectorDBInterface):
     Args:
         embedding_function (str): The name of the embedding function to use. Defaults to "text-embedding-3-small".
         openai_api_key (str): The OpenAI API key for authentication. Defaults to OPENAI_API_KEY.
+        embedding_backend (str): The embedding backend, "openai" or "local" for the offline hashed n-gram embedder
+            (see EMBEDDING_BACKENDS). Other backends than "openai" use their own collection, since their embeddings
+            have other dimensions. Defaults to EMBEDDING_BACKEND.
+        embedding_batch_tokens (int): Maximum number of tokens per embedding request. Defaults to 100_000.
+        embedding_batch_size (int): Maximum number of documents per embedding request. Defaults to 512.
+        embedding_workers (int): Maximum number of concurrent embedding requests. Defaults to 4.
+        embedding_cache_max_bytes (int): Maximum size of the on-disk embedding cache, which keeps the embeddings of
+            documents across resets, re-chunking and collections. Defaults to 1 GiB.
+        query_cache_size (int): Maximum number of query embeddings kept in memory by `query`. Defaults to 1024.
+        query_cache_ttl (float): Seconds a cached query embedding stays valid. Defaults to 3600.
     """
 
     def __init__(
         self,
         embedding_function: str = "text-embedding-3-small",
         openai_api_key: str = OPENAI_API_KEY,
+        embedding_backend: str = EMBEDDING_BACKEND,
+        embedding_batch_tokens: int = 100_000,
+        embedding_batch_size: int = 512,
+        embedding_workers: int = 4,
+        embedding_cache_max_bytes: int = 1 << 30,
+        query_cache_size: int = 1024,
+        query_cache_ttl: float = 3600.0,
     ):
         self.embedding_function = None
+        self.query_embedding_function = None
         self.client = None
         self.collection = None
         self.embedding_function_name = embedding_function
         self.openai_api_key = openai_api_key
-        self.collection_name = "local-collection"
+        self.embedding_backend = embedding_backend
+        self.collection_name = (
+            "local-collection" if embedding_backend == "openai" else f"local-collection-{embedding_backend}"
+        )
         self.summary_manager = SummaryManager()
+        # Each collection has its own index, so a text added with one backend is still added to the others
+        self.digest_index = ChunkDigestIndex(
+            os.path.join(VECTOR_STORAGE_DIR, f"{self.collection_name}-{DIGEST_INDEX_FILENAME}")
+        )
+        self.embedding_batch_tokens = embedding_batch_tokens
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_workers = embedding_workers
+        self.embedding_pipeline = None
+        self.embedding_cache = EmbeddingCache(
+            os.path.join(VECTOR_STORAGE_DIR, EMBEDDING_CACHE_FILENAME), max_bytes=embedding_cache_max_bytes
+        )
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size, ttl=query_cache_ttl)
+        self.id_manifest = IndexedIdManifest(
+            os.path.join(VECTOR_STORAGE_DIR, f"{self.collection_name}{ID_MANIFEST_SUFFIX}")
+        )
 
         self._init()
 
     def _init(self):
         self.client = chromadb.PersistentClient(path=CHROMA_DB_DIR)  # using default path for Chroma
-        self.embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-            api_key=self.openai_api_key, model_name=self.embedding_function_name
+        embedding_function, model_name = create_embedding_function(
+            self.embedding_backend, self.embedding_function_name, self.openai_api_key
         )
+        # Queries bypass the document embedding cache and are only kept in the in-process query cache
+        self.query_embedding_function = embedding_function
+        self.embedding_function = CachedEmbeddingFunction(embedding_function, self.embedding_cache, model_name)
         self.collection = self.client.get_or_create_collection(
             self.collection_name, embedding_function=self.embedding_function
         )
+        self.embedding_pipeline = EmbeddingPipeline(
+            self.embedding_function,
+            batch_tokens=self.embedding_batch_tokens,
+            batch_size=self.embedding_batch_size,
+            workers=self.embedding_workers,
+        )
+        self.id_manifest.sync(self.collection)
         logger.info(
             f"Successfully initialized ChromaDb with collection: {self.collection_name}\n with "
             f"{self.collection.count()} documents (chunks)"
@@ -243,21 +475,36 @@ class VectorDB(VectorDBInterface):
         return {"ids": ids, "documents": documents, "metadatas": metadatas}
 
     @base_error_handler
-    def add_documents(self, json_data: list[dict], file_name: str) -> None:
+    def add_documents(self, json_data: list[dict], file_name: str) -> dict[str, Any]:
         """
         Add documents from a given JSON list to the database, handling duplicates and generating summaries.
 
+        Chunks whose text was already added from another file, as recorded in the chunk digest index, are skipped.
+        Missing chunks are embedded by the embedding pipeline in token-budgeted, concurrent batches, each added to
+        the collection as soon as it is embedded.
+
         Args:
             json_data (list[dict]): A list of dictionaries containing the document data.
             file_name (str): The name of the file from which the documents are being added.
 
         Returns:
-            None
+            dict[str, Any]: The ingestion stats of the embedding pipeline (chunks added and failed, embedding tokens,
+            chunks/s and embedding tokens/s).
 
         Raises:
             Exception: If there is an error during the document preparation or addition process.
         """
-        processed_docs = self.prepare_documents(json_data)
+        new_chunks = []
+        new_digests = []
+        for chunk in json_data:
+            digest = ChunkDigestIndex.digest(chunk["data"]["text"])
+            if not self.digest_index.owned_elsewhere(digest, file_name):
+                new_chunks.append(chunk)
+                new_digests.append(digest)
+        if len(new_chunks) < len(json_data):
+            logger.info(f"Skipping {len(json_data) - len(new_chunks)} chunks already added from other files.")
+
+        processed_docs = self.prepare_documents(new_chunks)
 
         ids = processed_docs["ids"]
         documents = processed_docs["documents"]
@@ -266,30 +513,45 @@ class VectorDB(VectorDBInterface):
         # Check which documents are missing
         all_exist, missing_ids = self.check_documents_exist(ids)
 
-        if all_exist:
+        if all_exist or not ids:
             logger.info(f"All documents from {file_name} already loaded.")
+            stats = EmbeddingPipeline.empty_stats()
         else:
             # Prepare data for missing documents only
-            missing_indices = [ids.index(m_id) for m_id in missing_ids]
+            positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+            missing_indices = [positions[m_id] for m_id in missing_ids]
             missing_docs = [documents[i] for i in missing_indices]
             missing_metas = [metadatas[i] for i in missing_indices]
 
             # Add only missing documents
-            self.collection.add(
-                ids=missing_ids,
-                documents=missing_docs,
-                metadatas=missing_metas,
+            stats = self.embedding_pipeline.add(self.collection, missing_ids, missing_docs, missing_metas)
+            logger.info(f"Added {stats['chunks']} new documents to ChromaDB.")
+            logger.info(
+                f"Embedding cache - Hits: {self.embedding_cache.hits}, Misses: {self.embedding_cache.misses}, "
+                f"Hit rate: {self.embedding_cache.hit_rate:.2%}"
             )
-            logger.info(f"Added {len(missing_ids)} new documents to ChromaDB.")
+
+        # Chunks that failed to embed stay unclaimed, so they are added again with this file
+        failed_ids = set(stats["failed_ids"])
+        self.id_manifest.add(chunk_id for chunk_id in missing_ids if chunk_id not in failed_ids)
+        self.id_manifest.save()
+        for chunk_id, digest in zip(ids, new_digests, strict=True):
+            if chunk_id not in failed_ids:
+                self.digest_index.claim(digest, file_name)
+        self.digest_index.save()
 
         # Generate summary for the entire file if not already present
         self.summary_manager.process_file(data=json_data, file_name=file_name)
+        return stats
 
     @base_error_handler
     def check_documents_exist(self, document_ids: list[str]) -> tuple[bool, list[str]]:
         """
         Check if documents exist.
 
+        Existence is checked against the local chunk ID manifest, which is kept in sync with the collection, so no
+        request is sent to Chroma.
+
         Args:
             document_ids (list[str]): The list of document IDs to check.
 
@@ -300,28 +562,22 @@ class VectorDB(VectorDBInterface):
         Raises:
             Exception: If an error occurs while checking the document existence.
         """
-        try:
-            # Get existing document ids from the db
-            result = self.collection.get(ids=document_ids, include=[])
-            existing_ids = set(result["ids"])
+        missing_ids = self.id_manifest.missing(document_ids)
+        all_exist = len(missing_ids) == 0
 
-            # Find missing ids
-            missing_ids = list(set(document_ids) - existing_ids)
-            all_exist = len(missing_ids) == 0
-
-            if missing_ids:
-                logger.info(f"{len(missing_ids)} out of {len(document_ids)} documents are new and will be added.")
-            return all_exist, missing_ids
-
-        except Exception as e:
-            logger.error(f"Error checking document existence: {e}")
-            return False, document_ids
+        if missing_ids:
+            logger.info(f"{len(missing_ids)} out of {len(document_ids)} documents are new and will be added.")
+        return all_exist, missing_ids
 
     @base_error_handler
     def query(self, user_query: str | list[str], n_results: int = 10):
         """
         Query the collection to retrieve documents based on the user's query.
 
+        Query embeddings are served from the in-memory query cache when possible; only the queries that miss it are
+        embedded, in a single request to the embedding backend, and the collection is searched with the embeddings.
+        Queries are never written to the on-disk document embedding cache.
+
         Args:
             user_query (str | list[str]): A string or list of strings representing the user's query.
             n_results (int, optional): The number of results to retrieve. Defaults to 10.
@@ -333,8 +589,25 @@ class VectorDB(VectorDBInterface):
             SomeSpecificException: If an error occurs while querying the collection.
         """
         query_texts = [user_query] if isinstance(user_query, str) else user_query
+        query_embeddings = self.query_cache.get_many(query_texts)
+        missing_texts = list(
+            dict.fromkeys(
+                text for text, embedding in zip(query_texts, query_embeddings, strict=True) if embedding is None
+            )
+        )
+        if missing_texts:
+            embeddings = [
+                np.asarray(embedding, dtype=np.float32) for embedding in self.query_embedding_function(missing_texts)
+            ]
+            embedded = dict(zip(missing_texts, embeddings, strict=True))
+            self.query_cache.put_many(missing_texts, list(embedded.values()))
+            query_embeddings = [
+                embedded[text] if embedding is None else embedding
+                for text, embedding in zip(query_texts, query_embeddings, strict=True)
+            ]
+            logger.debug(f"Embedded {len(missing_texts)} of {len(query_texts)} queries missing from the query cache")
         search_results = self.collection.query(
-            query_texts=query_texts, n_results=n_results, include=["documents", "distances", "embeddings"]
+            query_embeddings=query_embeddings, n_results=n_results, include=["documents", "distances", "embeddings"]
         )
         return search_results
 
@@ -343,6 +616,8 @@ class VectorDB(VectorDBInterface):
         """
         Reset the database by deleting and recreating the collection, and clearing summaries.
 
+        The embedding cache is kept, so adding the same documents again does not embed them again.
+
         Args:
             self: The instance of the class containing this method.
 
@@ -362,6 +637,10 @@ class VectorDB(VectorDBInterface):
         # Delete the summaries file
         self.summary_manager.clear_summaries()
 
+        # Forget the chunk texts and IDs added so far
+        self.digest_index.clear()
+        self.id_manifest.clear()
+
         logger.info("Database reset successfully. ")
 
     def process_results_to_print(self, search_results: dict[str, Any]):
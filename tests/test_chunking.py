@@ -1,4 +1,26 @@
-from src.processing.chunking import MarkdownChunker
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.cleaning_benchmark import original_clean_page
+from src.processing import chunking
+from src.processing.chunking import (
+    ByteBoundPrecheck,
+    Chunk,
+    MarkdownBlock,
+    MarkdownChunker,
+    NearDuplicateIndex,
+    RawCrawlIndex,
+    StageTimings,
+    TokenAccumulator,
+    TokenCountCache,
+    chunk_files,
+    iter_token_ids,
+)
+from src.utils.digest_index import DIGEST_INDEX_FILENAME, ChunkDigestIndex
+from src.utils.tokenizer import TokenizerRegistry, get_tokenizer
+from src.vector_storage.vector_db import DocumentProcessor
 
 
 def test_markdown_chunker_initialization():
@@ -17,3 +39,640 @@ def test_markdown_chunker_initialization():
     assert chunker is not None
     assert chunker.max_tokens == 1000
     assert chunker.soft_token_limit == 800
+
+
+SAMPLE_SECTION = "\n".join(
+    [
+        "Kollektiv chunks crawled documentation into sections that fit the embedding model.",
+        "",
+        "- first list item with `inline code`",
+        "- second list item",
+        "    - nested item with trailing spaces   ",
+        "",
+        "```python",
+        "def example(value):",
+        "    return value * 2",
+        "```",
+        "",
+        "A long paragraph that keeps going " * 40,
+        "",
+        "~~~",
+        "\n".join(f"print('line {n}')" for n in range(120)),
+        "~~~",
+        "",
+        "Final words.",
+    ]
+    * 3
+)
+
+
+class ExactTokenAccumulator(TokenAccumulator):
+    """Reference accumulator that re-encodes the whole chunk for every fragment, as the chunker originally did."""
+
+    def try_add(self, fragment, limit, fragment_tokens=None):
+        """Append the fragment if the exact token count of the combined content is within the limit."""
+        self.last_fragment_tokens = self.count_tokens(fragment)
+        potential_content = self.content + fragment
+        if self.count_tokens(potential_content) <= limit:
+            self.content = potential_content
+            return True
+        return False
+
+
+def test_incremental_token_counting_preserves_chunk_boundaries(monkeypatch):
+    """
+    Test that the running token counter produces exactly the same chunks as full re-tokenization.
+
+    Raises:
+        AssertionError: If `_split_section` output differs from the reference or split chunk sizes change.
+    """
+    chunker = MarkdownChunker(input_filename="test_input.json", max_tokens=60, soft_token_limit=45)
+    headers = ("Title", "Section", "")
+
+    sections = chunker._split_section(SAMPLE_SECTION, headers)
+    large_chunks = chunker._split_large_chunk(Chunk(headers, SAMPLE_SECTION))
+
+    monkeypatch.setattr(chunking, "TokenAccumulator", ExactTokenAccumulator)
+    assert chunker._split_section(SAMPLE_SECTION, headers) == sections
+    assert len(sections) > 10
+    split_counts = [52, 120, 120, 116, 120, 120, 120, 120, 120, 63, 120, 120, 116, 120, 120, 120, 120, 120, 63]
+    split_counts += [120, 120, 116, 120, 120, 120, 120, 120, 11]
+    assert [chunker._encode_length(chunk.text) for chunk in large_chunks] == split_counts
+
+
+def test_token_accumulator_count_is_exact_across_blank_and_indented_lines():
+    """
+    Test that the running count equals the exact count of the content, including fragments starting with whitespace.
+
+    Raises:
+        AssertionError: If the running count differs from the exact count or a fragment over the limit is accepted.
+    """
+    tokenizer = get_tokenizer()
+
+    def count_tokens(text: str) -> int:
+        return len(tokenizer.encode_ordinary(text))
+
+    # The count of this concatenation is one token more than the sum of the counts of its parts
+    accumulator = TokenAccumulator(count_tokens)
+    accumulator.reset("'_*\n\n)\r\r\n")
+    assert not accumulator.try_add("\n", count_tokens("'_*\n\n)\r\r\n") + count_tokens("\n"))
+
+    rng = random.Random(0)
+    pieces = ["word", " ", "  ", "\t", "\r", "\r\n", "\n", "*", "_", "'", "(", ")", "é", "1"]
+    for _ in range(200):
+        accumulator.reset()
+        for _ in range(rng.randint(1, 20)):
+            fragment = "".join(rng.choices(pieces, k=rng.randint(0, 6))) + "\n"
+            expected = count_tokens(accumulator.content + fragment)
+            assert accumulator.try_add(fragment, expected) and accumulator.tokens == expected
+            assert not accumulator.try_add(fragment, count_tokens(accumulator.content + fragment) - 1)
+
+
+def test_token_count_cache_evicts_least_recently_used():
+    """
+    Test that the token count cache tracks hits and misses and stays within its size limit.
+
+    Raises:
+        AssertionError: If counts, hit/miss counters or evictions are wrong.
+    """
+    cache = TokenCountCache(max_size=2)
+    calls = []
+
+    def count_tokens(text):
+        calls.append(text)
+        return len(text.split())
+
+    assert cache.get_or_count("one two", count_tokens) == 2
+    assert cache.get_or_count("three", count_tokens) == 1
+    assert cache.get_or_count("one two", count_tokens) == 2  # hit, now most recently used
+    assert cache.get_or_count("four five six", count_tokens) == 3  # evicts "three"
+    assert cache.get_or_count("three", count_tokens) == 1
+
+    assert len(cache) == 2
+    assert calls == ["one two", "three", "four five six", "three"]
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert cache.hit_rate == 0.2
+
+
+def test_process_pages_with_workers_matches_sequential():
+    """
+    Test that chunking pages in a process pool returns the same chunks and validator counts as a single process.
+
+    Raises:
+        AssertionError: If chunk order, content or merged validator counts differ.
+    """
+    pages = [
+        {
+            "markdown": f"# Page {n}\n\nIntro for page {n}.\n\n## Details\n\n{SAMPLE_SECTION}",
+            "metadata": {"sourceURL": f"https://example.com/{n}", "title": f"Page {n}"},
+        }
+        for n in range(4)
+    ]
+
+    sequential = MarkdownChunker(input_filename="test_input.json")
+    parallel = MarkdownChunker(input_filename="test_input.json", workers=2)
+    sequential_chunks = sequential.process_pages({"data": pages})
+    parallel_chunks = parallel.process_pages({"data": pages})
+
+    assert parallel_chunks == sequential_chunks
+    assert parallel.validator.total_headings == sequential.validator.total_headings
+    assert parallel.validator.headings_preserved == sequential.validator.headings_preserved
+    assert parallel.validator.chunk_token_counts == sequential.validator.chunk_token_counts
+    assert parallel.validator.validation_errors == sequential.validator.validation_errors
+
+
+def test_chunk_files_reports_throughput_and_isolates_failures(tmp_path, monkeypatch):
+    """
+    Test that the batch driver chunks valid files, reports throughput and records broken files without aborting.
+
+    Raises:
+        AssertionError: If the per-file or aggregate stats are wrong.
+    """
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    page = {"markdown": f"# Guide\n\n{SAMPLE_SECTION}", "metadata": {"sourceURL": "https://example.com", "title": "G"}}
+    (raw_dir / "good.json").write_text(json.dumps({"data": [page, page]}))
+    (raw_dir / "broken.json").write_text("{not json")
+    monkeypatch.setattr(chunking, "RAW_DATA_DIR", str(raw_dir))
+
+    report = chunk_files(["good.json", "broken.json"], max_workers=2, output_dir=str(tmp_path))
+
+    stats = {file_stats["filename"]: file_stats for file_stats in report["files"]}
+    assert stats["good.json"]["status"] == "ok"
+    assert stats["good.json"]["pages"] == 2
+    assert stats["good.json"]["tokens_per_second"] > 0
+    assert stats["broken.json"]["status"] == "failed"
+    assert report["total"]["files"] == 1
+    assert report["total"]["failed_files"] == 1
+    assert report["total"]["chunks"] == stats["good.json"]["chunks"]
+    assert (tmp_path / "good-chunked.jsonl").exists()
+
+
+def test_chunking_cli_resolves_globs_skips_up_to_date_files_and_reports_stages(tmp_path, monkeypatch):
+    """
+    Test that the chunking CLI expands globs, writes a stats report with stage timings and skips unchanged files.
+
+    Raises:
+        AssertionError: If the resolved files, the stats report or the incremental skip are wrong.
+    """
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    page = {"markdown": f"# Guide\n\n{SAMPLE_SECTION}", "metadata": {"sourceURL": "https://example.com", "title": "G"}}
+    for name in ["a.json", "b.json"]:
+        (raw_dir / name).write_text(json.dumps({"data": [page]}))
+    other_file = tmp_path / "other.json"
+    other_file.write_text(json.dumps({"data": [page]}))
+    monkeypatch.setattr(chunking, "RAW_DATA_DIR", str(raw_dir))
+
+    assert chunking.resolve_input_files(["*.json", "a.json", str(other_file)]) == ["a.json", "b.json", str(other_file)]
+    stats_file = tmp_path / "stats.json"
+    output_dir = tmp_path / "chunks"
+    output_dir.mkdir()
+    argv = ["*.json", str(other_file), "--jobs", "2", "--output-dir", str(output_dir), "--stats", str(stats_file)]
+
+    report = chunking.main([*argv, "--incremental"])
+    assert json.loads(stats_file.read_text()) == report
+    assert report["total"]["files"] == 3
+    assert set(report["total"]["stages"]) == set(StageTimings.STAGES)
+    assert report["total"]["stages"]["splitting"] > 0
+    assert (output_dir / "other-chunked.jsonl").exists()
+
+    os.utime(raw_dir / "b.json")
+    report = chunking.main([*argv, "--incremental"])
+    statuses = {stats["filename"]: stats["status"] for stats in report["files"]}
+    assert statuses == {"a.json": "skipped", "b.json": "ok", str(other_file): "skipped"}
+    assert report["total"]["skipped_files"] == 2
+
+    report = chunking.main(argv)
+    assert report["total"]["files"] == 3
+
+
+def test_iter_pages_streams_data_array(tmp_path, monkeypatch):
+    """
+    Test that streaming pages from a raw crawl file yields the same pages as loading the whole file.
+
+    Raises:
+        AssertionError: If the streamed pages or the resulting chunks differ from the fully loaded ones.
+    """
+    pages = [
+        {
+            "markdown": f'# Page {n}\n\n{{"braces": [1, 2]}} \\ \u00e9t\u00e9 {n}\n\n{SAMPLE_SECTION}',
+            "metadata": {"sourceURL": f"https://example.com/{n}", "title": f"Page {n}", "statusCode": 200},
+        }
+        for n in range(3)
+    ]
+    raw = {"job_failed": False, "input_url": "https://example.com", "unique_links": ["a", "b"], "data": pages}
+    (tmp_path / "crawl.json").write_text(json.dumps(raw, indent=2), encoding="utf-8")
+    monkeypatch.setattr(chunking, "RAW_DATA_DIR", str(tmp_path))
+
+    chunker = MarkdownChunker(input_filename="crawl.json")
+    assert list(chunker.iter_pages(read_size=7)) == pages
+    assert list(chunker.iter_pages()) == chunker.load_data()["data"]
+
+    streamed_chunks = chunker.process_pages(chunker.iter_pages(read_size=64))
+    loaded_chunks = MarkdownChunker(input_filename="crawl.json").process_pages(chunker.load_data())
+    assert [c["data"] for c in streamed_chunks] == [c["data"] for c in loaded_chunks]
+
+
+def test_raw_crawl_index_reads_single_pages_and_rebuilds_when_stale(tmp_path, monkeypatch):
+    """
+    Test that the byte-offset page index decodes single pages and is rebuilt after the raw file changes.
+
+    Raises:
+        AssertionError: If an indexed page differs from the parsed file or a stale index is reused.
+    """
+    pages = [
+        {
+            "markdown": f'# Page {n}\n\n"quoted" \\ \u00e9t\u00e9 \U0001f600 {n}\n\n{SAMPLE_SECTION}',
+            "metadata": {"sourceURL": f"https://example.com/{n}", "title": f"Page {n}", "tags": [{"a": []}]},
+        }
+        for n in range(3)
+    ]
+    raw = {"unique_links": ["a", {"b": [1]}], "data": pages, "job_failed": False}
+    raw_file = tmp_path / "crawl.json"
+    raw_file.write_text(json.dumps(raw, indent=2, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(chunking, "RAW_DATA_DIR", str(tmp_path))
+
+    with RawCrawlIndex(str(raw_file)) as page_index:
+        assert len(page_index) == 3
+        assert [page_index.page(n) for n in range(3)] == pages
+        assert page_index.markdown(1) == pages[1]["markdown"]
+        assert page_index.metadata(2) == pages[2]["metadata"]
+        assert page_index.position("https://example.com/2") == 2
+        assert page_index.position("https://example.com/missing") is None
+    assert (tmp_path / ".page_index" / "crawl.json.pages.json").exists()
+
+    chunker = MarkdownChunker(input_filename="crawl.json")
+    page_chunks = chunker.process_pages([chunker.load_page("https://example.com/1")])
+    assert page_chunks == MarkdownChunker(input_filename="crawl.json").process_pages([pages[1]])
+
+    raw["data"] = [pages[2]]
+    raw_file.write_text(json.dumps(raw), encoding="utf-8")
+    with RawCrawlIndex(str(raw_file)) as page_index:
+        assert len(page_index) == 1
+        assert page_index.position("https://example.com/2") == 0
+    assert chunking.resolve_input_files([]) == ["crawl.json"]
+
+
+def test_save_chunks_writes_jsonl_readable_by_document_processor(tmp_path, monkeypatch):
+    """
+    Test that streamed chunks are written as JSONL and load back, alongside legacy JSON chunk files.
+
+    Raises:
+        AssertionError: If the saved chunks differ from the processed ones.
+    """
+    pages = [{"markdown": f"# Guide\n\n{SAMPLE_SECTION}", "metadata": {"sourceURL": "https://a.com", "title": "G"}}]
+    chunker = MarkdownChunker(input_filename="crawl.json", output_dir=str(tmp_path))
+    chunks = chunker.process_pages({"data": pages})
+    output_filepath = chunker.save_chunks(chunker.iter_chunks({"data": pages}))
+    (tmp_path / "legacy-chunked.json").write_text(json.dumps(chunks, indent=2))
+
+    processor = DocumentProcessor()
+    monkeypatch.setattr(processor, "processed_dir", str(tmp_path))
+    assert output_filepath == str(tmp_path / "crawl-chunked.jsonl")
+    assert [c["data"] for c in processor.load_json("crawl-chunked.jsonl")] == [c["data"] for c in chunks]
+    assert processor.load_json("legacy-chunked.json") == chunks
+
+
+def test_clean_page_matches_sequential_regex_passes():
+    """
+    Test that `clean_page` produces exactly the output of the original regex passes.
+
+    Raises:
+        AssertionError: If the outputs differ for any generated page.
+    """
+    chunker = MarkdownChunker(input_filename="test_file.json")
+    fragments = [
+        "![",
+        "[",
+        "]",
+        "(",
+        ")",
+        "]:",
+        " ",
+        "\n",
+        "a",
+        ".png",
+        ".JPG",
+        "http",
+        "<img",
+        ">",
+        "/",
+        "data:image/",
+    ]
+    fragments += [";base64,", "Navigation", "\n\n\n", "](/", "[Anthropic home page", "English", "Search", "* * *"]
+    rng = random.Random(7)
+    for _ in range(5000):
+        content = "".join(rng.choice(fragments) for _ in range(rng.randint(0, 40)))
+        assert chunker.clean_page(content) == original_clean_page(content), content
+
+    page = "# Docs\n\n![logo](data:image/png;base64,AAAA) Intro ![a](b.png) [ref]: img/c.webp\n[home](/)\nText"
+    assert chunker.clean_page(page) == "# Docs\n\n Intro  \n\nText"
+
+
+def test_lex_blocks_types_offsets_and_shared_fences():
+    """
+    Test that the lexer emits typed blocks with offsets and that both chunking stages agree on indented fences.
+
+    Raises:
+        AssertionError: If block kinds, offsets or chunk contents are wrong.
+    """
+    chunker = MarkdownChunker(input_filename="test_file.json")
+    content = "# Title\nIntro `x`\n\n- item\n  ```py\n  # comment `y`\n  ```\n## Next\n~~~\nopen"
+    blocks = chunker.lex_blocks(content)
+
+    assert [block.kind for block in blocks] == ["heading", "paragraph", "blank", "list", "fence", "heading", "fence"]
+    assert all(isinstance(block, MarkdownBlock) for block in blocks)
+    assert all(content[block.start : block.end] == block.text for block in blocks)
+    assert (blocks[0].level, blocks[0].title, blocks[5].title) == (1, "Title", "Next")
+    assert (blocks[4].fence, blocks[4].closed, blocks[6].closed) == ("```", True, False)
+
+    sections = chunker.identify_sections(content, {})
+    assert [section.headers for section in sections] == [("Title", "", ""), ("Title", "Next", "")]
+    chunks = chunker.create_chunks(sections, {"sourceURL": "https://a.com"})
+    assert "# comment `y`" in chunks[0].text
+    assert "Intro <code>x</code>" in chunks[0].text
+    assert chunker.validator.validation_errors == ["Unclosed code block detected."] * 2
+
+
+def test_chunk_ids_are_stable_across_runs_and_follow_content():
+    """
+    Test that chunk IDs are derived from the source URL, headers and text rather than generated randomly.
+
+    Raises:
+        AssertionError: If IDs change for unchanged pages or stay the same for changed ones.
+    """
+    pages = [
+        {"markdown": f"# Guide\n\n## Part {n}\n\n{SAMPLE_SECTION}", "metadata": {"sourceURL": f"https://a.com/{n}"}}
+        for n in range(2)
+    ]
+    first_ids = [c["chunk_id"] for c in MarkdownChunker(input_filename="a.json").process_pages({"data": pages})]
+    second_ids = [c["chunk_id"] for c in MarkdownChunker(input_filename="b.json").process_pages({"data": pages})]
+    assert first_ids == second_ids
+    assert len(set(first_ids)) == len(first_ids)
+
+    pages[1]["markdown"] = pages[1]["markdown"].replace("## Part 1", "## Part one")
+    changed = MarkdownChunker(input_filename="a.json").process_pages({"data": pages})
+    page_0_ids = [c["chunk_id"] for c in changed if c["metadata"]["source_url"] == "https://a.com/0"]
+    page_1_ids = [c["chunk_id"] for c in changed if c["metadata"]["source_url"] == "https://a.com/1"]
+    assert page_0_ids == first_ids[: len(page_0_ids)]
+    assert not set(page_1_ids) & set(first_ids)
+
+
+def test_incremental_chunking_reuses_unchanged_pages(tmp_path):
+    """
+    Test that a re-run with the chunk manifest only chunks new or modified pages and reuses the others.
+
+    Raises:
+        AssertionError: If unchanged pages are chunked again or the output differs from a full run.
+    """
+    pages = [
+        {
+            "markdown": f"# Page {n}\n\nPage {n}. {SAMPLE_SECTION}",
+            "metadata": {"sourceURL": f"https://a.com/{n}", "title": "P"},
+        }
+        for n in range(3)
+    ]
+    MarkdownChunker(input_filename="crawl-0.json", output_dir=str(tmp_path), incremental=True).process_pages(pages)
+    assert not (tmp_path / chunking.MANIFEST_FILENAME).exists()
+
+    first_run = MarkdownChunker(input_filename="crawl-1.json", output_dir=str(tmp_path), incremental=True)
+    first_run.save_chunks(first_run.iter_chunks(pages))
+    assert first_run.pages_skipped == 0
+    assert (tmp_path / chunking.MANIFEST_FILENAME).exists()
+
+    # Reused pages are read from their own byte range, so the lines of the changed page are never parsed
+    entry = chunking.ChunkManifest(str(tmp_path / chunking.MANIFEST_FILENAME)).pages["https://a.com/2"]
+    assert entry["length"] > 0
+    with open(tmp_path / entry["chunks_file"], "r+b") as f:
+        f.seek(entry["offset"])
+        f.write(b"{" * (entry["length"] - 1) + b"\n")
+
+    pages[2] = {"markdown": "# Page 2\n\nRewritten page.", "metadata": {"sourceURL": "https://a.com/2", "title": "P"}}
+    second_run = MarkdownChunker(input_filename="crawl-2.json", output_dir=str(tmp_path), incremental=True)
+    second_run.save_chunks(second_run.iter_chunks(pages))
+    incremental_chunks = DocumentProcessor().load_json(str(tmp_path / "crawl-2-chunked.jsonl"))
+    full_chunks = MarkdownChunker(input_filename="crawl-2.json", output_dir=str(tmp_path)).process_pages(pages)
+
+    assert second_run.pages_skipped == 2
+    assert incremental_chunks == full_chunks
+    manifest = chunking.ChunkManifest(str(tmp_path / chunking.MANIFEST_FILENAME))
+    assert {entry["chunks_file"] for entry in manifest.pages.values()} == {"crawl-2-chunked.jsonl"}
+    assert (
+        sum(entry["length"] for entry in manifest.pages.values()) == (tmp_path / "crawl-2-chunked.jsonl").stat().st_size
+    )
+
+
+def test_save_token_ids_sidecar_matches_chunk_text(tmp_path):
+    """
+    Test that the token ID sidecar holds one record per saved chunk whose IDs decode to the chunk text.
+
+    Raises:
+        AssertionError: If records are missing, out of order or do not match the chunks.
+    """
+    pages = [
+        {"markdown": f"# Guide {n}\n\n{SAMPLE_SECTION}", "metadata": {"sourceURL": f"https://a.com/{n}"}}
+        for n in range(2)
+    ]
+    chunker = MarkdownChunker(input_filename="crawl.json", output_dir=str(tmp_path), save_token_ids=True)
+    chunker.save_chunks(chunker.iter_chunks(pages))
+
+    chunks = DocumentProcessor().load_json(str(tmp_path / "crawl-chunked.jsonl"))
+    records = list(iter_token_ids(str(tmp_path / "crawl-chunked.tokens.bin")))
+    assert [chunk_id for chunk_id, _ in records] == [chunk["chunk_id"] for chunk in chunks]
+    for chunk, (_, token_ids) in zip(chunks, records, strict=True):
+        assert "token_ids" not in chunk
+        assert chunker.tokenizer.decode(token_ids) == chunk["data"]["text"]
+        assert len(token_ids) == chunk["metadata"]["token_count"]
+
+
+def test_chunking_benchmark_corpora_are_deterministic_and_measured():
+    """
+    Test that the benchmark corpora are reproducible from their seed and that a run reports every compared metric.
+
+    Raises:
+        AssertionError: If a corpus changes between generations or a metric is missing.
+    """
+    from benchmarks import chunking_benchmark
+
+    for name, generate in chunking_benchmark.CORPORA.items():
+        assert generate(random.Random(1), 2) == generate(random.Random(1), 2), name
+
+    metrics = chunking_benchmark.run_corpus("deep_headers", pages=1)
+    assert metrics["pages"] == 1 and metrics["chunks"] > 0 and metrics["tokens"] > 0
+    assert set(chunking_benchmark.COMPARED_METRICS) <= set(metrics)
+    assert metrics["token_count_calls_per_page"] > 0
+    assert "encode_ordinary" not in vars(MarkdownChunker(input_filename="test.json").tokenizer)
+
+    memory = chunking_benchmark.measure_chunk_memory(chunk_count=1000)
+    assert 0 < memory["chunk_objects_mb"] < memory["chunk_dicts_mb"]
+
+
+def test_near_duplicate_chunks_are_clustered_and_removed():
+    """
+    Test that chunks differing by a few words from an earlier chunk are removed only when the threshold is set.
+
+    Raises:
+        AssertionError: If near-duplicates are kept, distinct chunks are removed or the clusters are wrong.
+    """
+    rng = random.Random(3)
+    words = [f"word{i}" for i in range(2000)]
+    texts = [" ".join(rng.choice(words) for _ in range(300)) for _ in range(3)]
+    versioned = texts[0].replace(texts[0].split()[150], "v2", 1)
+    chunks = [Chunk(("Doc", "", ""), text, token_count=10, chunk_id=str(n)) for n, text in enumerate(texts)]
+    chunks.append(Chunk(("Doc v2", "", ""), versioned, token_count=7, chunk_id="3"))
+
+    index = NearDuplicateIndex(threshold=0.8)
+    assert index.similarity(index.signature(texts[0]), index.signature(versioned)) >= 0.8
+    assert index.similarity(index.signature(texts[0]), index.signature(texts[1])) < 0.2
+
+    exact_only = MarkdownChunker(input_filename="test.json").validator
+    assert [chunk.chunk_id for chunk in exact_only.validate_stream(list(chunks))] == ["0", "1", "2", "3"]
+
+    validator = MarkdownChunker(input_filename="test.json", near_duplicate_threshold=0.8).validator
+    assert [chunk.chunk_id for chunk in validator.validate_stream(list(chunks))] == ["0", "1", "2"]
+    assert validator.near_duplicate_clusters == {"0": ["3"]}
+    assert validator.near_duplicate_tokens_saved == 7
+
+
+def test_dedup_index_skips_chunks_saved_from_other_files(tmp_path):
+    """
+    Test that chunks already saved from another crawl file are dropped, while a file can be re-chunked as is.
+
+    Raises:
+        AssertionError: If shared chunks are saved twice or a file loses its own chunks when re-chunked.
+    """
+    shared = {"markdown": f"# Shared\n\n{SAMPLE_SECTION}", "metadata": {"sourceURL": "https://a.com/shared"}}
+    own = {
+        "markdown": f"# Own\n\n{SAMPLE_SECTION} Only in the second crawl.",
+        "metadata": {"sourceURL": "https://b.com"},
+    }
+
+    def save(filename, pages):
+        chunker = MarkdownChunker(input_filename=filename, output_dir=str(tmp_path), dedup_index=True)
+        chunker.save_chunks(chunker.iter_chunks(pages))
+        return chunker.validator.cross_file_duplicates_removed, DocumentProcessor().load_json(
+            str(tmp_path / filename.replace(".json", "-chunked.jsonl"))
+        )
+
+    _, first_chunks = save("crawl-1.json", [shared])
+    removed, second_chunks = save("crawl-2.json", [shared, own])
+    assert removed == len(first_chunks)
+    assert {chunk["metadata"]["source_url"] for chunk in second_chunks} == {"https://b.com"}
+
+    assert save("crawl-1.json", [shared]) == (0, first_chunks)
+    index = ChunkDigestIndex(str(tmp_path / DIGEST_INDEX_FILENAME))
+    assert len(index) == len(first_chunks) + len(second_chunks)
+
+
+def test_tokenizer_registry_shares_one_encoding_across_threads():
+    """
+    Test that the tokenizer registry loads an encoding once for all threads and that batch helpers match single calls.
+
+    Raises:
+        AssertionError: If threads get different encodings or batch results differ from single calls.
+    """
+    registry = TokenizerRegistry(min_batch_size=2)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        encodings = set(map(id, executor.map(lambda _: registry.get(), range(32))))
+    assert len(encodings) == 1
+    assert MarkdownChunker(input_filename="test.json").tokenizer is get_tokenizer()
+
+    texts = [SAMPLE_SECTION, "", "Special <|endoftext|> text", "# Header"]
+    assert registry.encode_ordinary_batch(texts) == [registry.encode(text) for text in texts]
+    assert registry.count_batch(texts) == [registry.count(text) for text in texts]
+
+
+def test_size_precheck_settles_only_decisions_far_from_the_limit():
+    """
+    Test that the byte bound pre-check's bounds hold and it only settles comparisons whose outcome is certain.
+
+    Raises:
+        AssertionError: If an exact count falls outside the bounds or a settled comparison is wrong.
+    """
+    chunker = MarkdownChunker(input_filename="test.json")
+    precheck = ByteBoundPrecheck()
+    assert precheck.max_token_bytes == chunker.size_precheck.max_token_bytes
+    assert precheck.max_token_bytes == max(map(len, chunker.tokenizer.token_byte_values()))
+    rng = random.Random(0)
+    texts = [
+        SAMPLE_SECTION,
+        SAMPLE_SECTION * 20,
+        "```python\n" + "    x = compute(42)\n" * 300 + "```\n",
+        "é" * 500,
+        " ".join("".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9))) for _ in range(500)),
+        " ".join(f"get_{rng.randint(0, 999)}_user_session_handler" for _ in range(200)),
+        " " * 5000,
+    ]
+    for text in texts:
+        exact = len(chunker.tokenizer.encode_ordinary(text))
+        lower, upper = precheck.bounds(text)
+        assert lower <= exact <= upper
+        for limit in (exact // 3, exact - 1, exact, 3 * exact):
+            assert precheck.exceeds(text, limit) in (exact > limit, None)
+
+    assert precheck.exceeds(" " * 5000, 10) is True
+    assert precheck.exceeds(SAMPLE_SECTION[:100], 100) is False
+    assert precheck.exceeds(SAMPLE_SECTION, len(chunker.tokenizer.encode_ordinary(SAMPLE_SECTION))) is None
+    assert precheck.settled > 0 and precheck.unsettled > 0
+
+
+def test_adjust_chunks_matches_exact_counts_on_lowercase_and_identifier_text():
+    """
+    Test that chunk sizes stay within `2 * max_tokens` and match exact counting on text with many tokens per byte.
+
+    Raises:
+        AssertionError: If a chunk exceeds the cap or the chunks differ from those of exact counting.
+    """
+    rng = random.Random(0)
+
+    def lowercase_words(count: int) -> str:
+        return " ".join("".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9))) for _ in range(count))
+
+    identifiers = " ".join(f"load_{rng.randint(0, 99)}_chunk_{rng.randint(0, 99)}_index" for _ in range(400))
+    page = {
+        "markdown": f"# Title\n\nShort intro.\n\n## A\n\n{lowercase_words(700)}\n\n## B\n\n{lowercase_words(700)}\n\n"
+        f"## C\n\n{identifiers}\n",
+        "metadata": {"sourceURL": "https://example.com/lowercase", "title": "Lowercase"},
+    }
+    chunker = MarkdownChunker(input_filename="test.json")
+    chunks = chunker.process_pages([page])
+    exact_chunker = MarkdownChunker(input_filename="test.json")
+    exact_chunker.size_precheck.exceeds = lambda text, limit: None
+
+    token_counts = [len(chunker.tokenizer.encode_ordinary(chunk["data"]["text"])) for chunk in chunks]
+    assert max(token_counts) <= 2 * chunker.max_tokens
+    assert [chunk["data"] for chunk in exact_chunker.process_pages([page])] == [chunk["data"] for chunk in chunks]
+
+
+def test_split_by_tokens_never_exceeds_limit_and_prefers_boundaries():
+    """
+    Test that offset-based splitting keeps every piece within the limit and cuts at line and sentence ends.
+
+    Raises:
+        AssertionError: If a piece exceeds the limit, text is lost or a cut misses an available boundary.
+    """
+    chunker = MarkdownChunker(input_filename="test.json", max_tokens=50)
+    rng = random.Random(0)
+    words = "the client sends a request to the api and returns embeddings ünïcödé 数据 😀".split()
+    lines = [" ".join(rng.choices(words, k=rng.randint(1, 120))) + rng.choice([".", "!", ""]) for _ in range(200)]
+    texts = ["\n".join(lines), " ".join(lines), "x" * 5000, "".join(rng.choices(words, k=3000))]
+    for text in texts:
+        for limit in (7, 50, 100):
+            pieces = chunker._split_by_tokens(text, limit)
+            assert "".join(pieces) == text
+            assert all(len(chunker.tokenizer.encode_ordinary(piece)) <= limit for piece in pieces)
+
+    short_lines = "\n".join(line for line in lines if len(chunker.tokenizer.encode_ordinary(line)) < 40)
+    line_pieces = chunker._split_by_tokens(short_lines, 100)
+    assert len(line_pieces) > 1
+    assert all(a.endswith("\n") or b.startswith("\n") for a, b in zip(line_pieces, line_pieces[1:], strict=False))
+
+    sentences = " ".join(f"Sentence number {i} is about the api." for i in range(100))
+    for piece in chunker._split_by_tokens(sentences, 30)[:-1]:
+        assert piece.endswith(".")
+
+    chunk = Chunk(("Title", "", ""), "\n".join(lines))
+    split = chunker._split_large_chunk(chunk)
+    assert all(piece.headers == chunk.headers for piece in split)
+    assert all(len(chunker.tokenizer.encode_ordinary(piece.text)) <= 100 for piece in split)
@@ -25,23 +25,26 @@ def claude_assistant(mock_vector_db):
     Args:
         mock_vector_db: A mock of the VectorDB class used for testing.
 
-    Returns:
+    Yields:
         ClaudeAssistant: An instance of ClaudeAssistant with dependencies mocked.
     """
-    with patch("anthropic.Anthropic") as mock_anthropic, patch("tiktoken.get_encoding") as mock_encoding:
+    with (
+        patch("anthropic.Anthropic") as mock_anthropic,
+        patch("src.generation.claude_assistant.tokenizers") as mock_tokenizers,
+    ):
         mock_client = Mock()
         mock_anthropic.return_value = mock_client
 
-        mock_tokenizer = Mock()
-        mock_tokenizer.encode.side_effect = lambda x: list(range(len(x)))
-        mock_encoding.return_value = mock_tokenizer
+        mock_tokenizers.count.side_effect = lambda text, name: len(text)
+        mock_tokenizers.count_batch.side_effect = lambda texts, name: [len(text) for text in texts]
 
         # Create a real VectorDB instance instead of a mock
         real_vector_db = VectorDB()
 
         assistant = ClaudeAssistant(vector_db=real_vector_db)
         assistant.client = mock_client
-        return assistant
+        # Yield inside the patch, so the mocked token counts are used by the tests as well
+        yield assistant
 
 
 def test_streaming_response(claude_assistant):
@@ -167,3 +170,5 @@ def test_conversation_history_handling(claude_assistant):
     assert history[1]["content"] == "Hi there!"
     assert history[2]["role"] == "user"
     assert history[2]["content"] == "How are you?"
+    # Only user messages are estimated, with the mocked one token per character
+    assert claude_assistant.conversation_history.total_tokens == len("Hello") + len("How are you?")
@@ -1,4 +1,16 @@
-from src.vector_storage.vector_db import DocumentProcessor, VectorDB
+import threading
+import time
+import uuid
+from unittest.mock import MagicMock
+
+import chromadb
+import pytest
+
+from src.utils.digest_index import ChunkDigestIndex
+from src.vector_storage.embedding_backends import HashedNgramEmbeddingFunction, create_embedding_function
+from src.vector_storage.embedding_cache import CachedEmbeddingFunction, EmbeddingCache, QueryEmbeddingCache
+from src.vector_storage.id_manifest import IndexedIdManifest
+from src.vector_storage.vector_db import DocumentProcessor, EmbeddingPipeline, VectorDB
 
 
 def test_vector_db_initialization():
@@ -35,3 +47,233 @@ def test_document_processor_initialization():
     """
     processor = DocumentProcessor()
     assert processor is not None
+
+
+def test_embedding_pipeline_batches_by_tokens_and_isolates_failed_batches():
+    """
+    Test that the embedding pipeline respects the batch budgets, retries failed requests and adds the other batches.
+
+    Raises:
+        AssertionError: If a batch exceeds its budget, a retried batch is lost or a failing batch aborts the run.
+    """
+    calls = []
+    lock = threading.Lock()
+
+    def embed(documents: list[str]) -> list[list[float]]:
+        with lock:
+            calls.append(documents)
+            attempts = sum(call == documents for call in calls)
+        if "doc 0" in documents and attempts == 1:
+            raise RuntimeError("rate limited")
+        if "doc 7" in documents:
+            raise RuntimeError("bad request")
+        return [[float(len(document)), 1.0] for document in documents]
+
+    pipeline = EmbeddingPipeline(embed, batch_tokens=20, batch_size=3, workers=2, retries=1, retry_delay=0.01)
+    assert pipeline.batches([5, 5, 5, 5, 30, 1, 19, 1]) == [
+        slice(0, 3),
+        slice(3, 4),
+        slice(4, 5),
+        slice(5, 7),
+        slice(7, 8),
+    ]
+
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"test-{uuid.uuid4()}")
+    ids = [f"id-{n}" for n in range(10)]
+    documents = [f"doc {n}" for n in range(10)]
+    stats = pipeline.add(collection, ids, documents, [{"n": n} for n in range(10)])
+
+    assert all(len(call) <= 3 for call in calls)
+    assert stats["failed_ids"] == ["id-6", "id-7", "id-8"]
+    assert stats["chunks"] == collection.count() == 7
+    assert stats["embedding_tokens"] > 0 and stats["chunks_per_second"] > 0
+    assert collection.get(ids=["id-0"], include=["embeddings"])["embeddings"][0].tolist() == [5.0, 1.0]
+    assert set(EmbeddingPipeline.empty_stats()) == set(stats)
+    assert EmbeddingPipeline.empty_stats()["chunks"] == 0 and EmbeddingPipeline.empty_stats()["failed_ids"] == []
+
+
+def test_embedding_cache_serves_repeated_documents_and_evicts_least_recently_used(tmp_path):
+    """
+    Test that cached embeddings are reused across cache instances, keyed by model, and evicted by size.
+
+    Raises:
+        AssertionError: If a cached document is embedded again or the cache grows past its limit.
+    """
+    embedded = []
+
+    def embed(documents: list[str]) -> list[list[float]]:
+        embedded.extend(documents)
+        return [[float(len(document)), 0.5] for document in documents]
+
+    cache_file = str(tmp_path / "embedding_cache.sqlite")
+    cached_embed = CachedEmbeddingFunction(embed, EmbeddingCache(cache_file), "model-a")
+    first = cached_embed(["a", "bb", "a"])
+    assert embedded == ["a", "bb"]
+    assert [vector.tolist() for vector in first] == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+
+    cache = EmbeddingCache(cache_file, max_bytes=3 * 8)
+    second = CachedEmbeddingFunction(embed, cache, "model-a")(["bb", "ccc"])
+    assert embedded == ["a", "bb", "ccc"]
+    assert second[0].tolist() == [2.0, 0.5] and cache.hit_rate == 0.5
+    CachedEmbeddingFunction(embed, cache, "model-b")(["bb"])
+    assert embedded[-1] == "bb"
+
+    assert len(cache) <= 2 and cache.evictions >= 2
+    assert cache.get_many("model-b", ["bb"])[0] is not None
+    assert cache.get_many("model-a", ["a"]) == [None]
+
+    sized_cache = EmbeddingCache(str(tmp_path / "sized_cache.sqlite"))
+    sized_cache.put_many("model-a", ["a", "b", "a"], [[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]])
+    sized_cache.put_many("model-a", ["a"], [[5.0, 6.0]])
+    assert len(sized_cache) == 2 and sized_cache._total_bytes == 2 * 2 * 4
+    assert sized_cache.get_many("model-a", ["a"])[0].tolist() == [5.0, 6.0]
+
+
+def test_query_embedding_cache_evicts_least_recently_used_and_expires_entries():
+    """
+    Test that the query embedding cache keeps the most recently used queries and drops expired ones.
+
+    Raises:
+        AssertionError: If an evicted or expired query is served or a fresh one is missed.
+    """
+    cache = QueryEmbeddingCache(max_size=2, ttl=60)
+    cache.put_many(["a", "b"], [[1.0], [2.0]])
+    assert cache.get_many(["a"])[0].tolist() == [1.0]
+    cache.put_many(["c"], [[3.0]])
+    assert [embedding is not None for embedding in cache.get_many(["a", "b", "c"])] == [True, False, True]
+    assert cache.hits == 3 and cache.misses == 1
+
+    expiring_cache = QueryEmbeddingCache(ttl=0.01)
+    expiring_cache.put_many(["a"], [[1.0]])
+    time.sleep(0.02)
+    assert expiring_cache.get_many(["a"]) == [None]
+    assert len(expiring_cache) == 0
+
+
+def test_query_embeds_misses_with_the_backend_and_bypasses_the_document_cache(tmp_path):
+    """
+    Test that `VectorDB.query` embeds only queries missing from the query cache and never fills the document cache.
+
+    Raises:
+        AssertionError: If a cached query is embedded again or a query is written to the document embedding cache.
+    """
+    embedded = []
+
+    def embed(documents: list[str]) -> list[list[float]]:
+        embedded.extend(documents)
+        return [[float(len(document)), 1.0] for document in documents]
+
+    # VectorDB.__init__ connects to the summary service, so only the attributes used by query are set up
+    vector_db = VectorDB.__new__(VectorDB)
+    vector_db.query_cache = QueryEmbeddingCache()
+    vector_db.query_embedding_function = embed
+    document_cache = EmbeddingCache(str(tmp_path / "embedding_cache.sqlite"))
+    vector_db.embedding_function = CachedEmbeddingFunction(embed, document_cache, "model")
+    vector_db.collection = chromadb.EphemeralClient().create_collection(f"query-{uuid.uuid4().hex}")
+    vector_db.collection.add(ids=["a", "b"], embeddings=[[1.0, 1.0], [5.0, 1.0]], documents=["a", "bbbbb"])
+
+    assert vector_db.query("x", n_results=1)["ids"] == [["a"]]
+    assert vector_db.query(["x", "yyyyy"], n_results=1)["ids"] == [["a"], ["b"]]
+    assert embedded == ["x", "yyyyy"]
+    assert len(document_cache) == 0
+
+
+def test_local_embedding_backend_is_deterministic_and_supports_offline_ingestion_and_query():
+    """
+    Test that the local hashed n-gram backend embeds deterministically and retrieves related documents offline.
+
+    Raises:
+        AssertionError: If embeddings differ between calls, are not unit length or the related document is missed.
+    """
+    embedding_function, model_name = create_embedding_function("local", "text-embedding-3-small")
+    assert isinstance(embedding_function, HashedNgramEmbeddingFunction) and model_name == "hashed-ngram-384"
+    with pytest.raises(ValueError):
+        create_embedding_function("unknown", model_name)
+
+    documents = [
+        "Install the package with pip and configure the API key.",
+        "The vector database stores chunk embeddings in a collection.",
+        "Crawl the documentation site and save the raw markdown pages.",
+    ]
+    first, second = embedding_function(documents), HashedNgramEmbeddingFunction()(documents)
+    assert all((a == b).all() for a, b in zip(first, second, strict=True))
+    assert all(abs(float((vector**2).sum()) - 1.0) < 1e-5 for vector in first)
+
+    collection = chromadb.EphemeralClient().create_collection(
+        f"local-{uuid.uuid4().hex}", embedding_function=embedding_function
+    )
+    stats = EmbeddingPipeline(embedding_function, batch_size=2).add(
+        collection, ["install", "vector", "crawl"], documents, [{"n": i} for i in range(len(documents))]
+    )
+    assert stats["chunks"] == 3 and stats["failed_chunks"] == 0
+    results = collection.query(query_embeddings=embedding_function(["how to store embeddings in the vector database"]))
+    assert results["ids"][0][0] == "vector"
+
+
+def test_indexed_id_manifest_persists_ids_and_rebuilds_from_the_collection(tmp_path):
+    """
+    Test that the chunk ID manifest reports missing IDs, persists added ones and resyncs with its collection.
+
+    Raises:
+        AssertionError: If an ID is reported missing or present wrongly, or the manifest is not rebuilt.
+    """
+    manifest_file = str(tmp_path / "collection-ids.bin")
+    manifest = IndexedIdManifest(manifest_file)
+    assert manifest.missing(["a", "b", "a"]) == ["a", "b"]
+    manifest.add(["a"])
+    manifest.save()
+    manifest.add(["b"])
+    manifest.save()
+
+    reloaded = IndexedIdManifest(manifest_file)
+    assert len(reloaded) == 2 and "a" in reloaded
+    assert reloaded.missing(["c", "b", "a", "d"]) == ["c", "d"]
+
+    collection = chromadb.EphemeralClient().create_collection(f"ids-{uuid.uuid4().hex}")
+    collection.add(ids=["a", "b"], embeddings=[[1.0, 0.0], [0.0, 1.0]])
+    assert not reloaded.sync(collection)
+
+    collection.add(ids=["c"], embeddings=[[1.0, 1.0]])
+    reloaded.sync_batch_size = 2
+    assert reloaded.sync(collection)
+    assert reloaded.missing(["a", "b", "c", "d"]) == ["d"]
+    assert len(IndexedIdManifest(manifest_file)) == 3
+
+    reloaded.clear()
+    assert len(reloaded) == 0 and len(IndexedIdManifest(manifest_file)) == 0
+
+
+def test_digest_index_is_scoped_to_the_collection_of_each_backend(tmp_path, monkeypatch):
+    """
+    Test that a chunk text added through one embedding backend is still added to the collection of another backend.
+
+    Raises:
+        AssertionError: If the chunk is skipped for the second collection or a reset clears the other backend's index.
+    """
+    from src.vector_storage import vector_db as vector_db_module
+
+    # Both backends embed locally here, the OpenAI one only needs its own collection name
+    monkeypatch.setattr(vector_db_module, "VECTOR_STORAGE_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_db_module, "CHROMA_DB_DIR", str(tmp_path / "chroma"))
+    monkeypatch.setattr(vector_db_module, "SummaryManager", MagicMock)
+    monkeypatch.setattr(
+        vector_db_module, "create_embedding_function", lambda *_: create_embedding_function("local", "model")
+    )
+
+    chunk = {
+        "chunk_id": "chunk-1",
+        "data": {"headers": {"h1": "Install"}, "text": "Install the package with pip."},
+        "metadata": {"source_url": "https://example.com/install", "page_title": "Install"},
+    }
+    openai_db = VectorDB(embedding_backend="openai")
+    local_db = VectorDB(embedding_backend="local")
+    assert openai_db.digest_index.filepath != local_db.digest_index.filepath
+
+    assert openai_db.add_documents([chunk], "docs.json")["chunks"] == 1
+    assert local_db.add_documents([dict(chunk, chunk_id="chunk-2")], "other.json")["chunks"] == 1
+    assert local_db.collection.count() == 1
+
+    local_db.reset_database()
+    assert ChunkDigestIndex(openai_db.digest_index.filepath).owned_elsewhere(
+        ChunkDigestIndex.digest(chunk["data"]["text"]), "other.json"
+    )